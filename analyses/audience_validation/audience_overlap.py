@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+Audience Overlap
+================
+Measures how much the audiences in audiences.yml overlap with each other and
+with each brand's actual holdout shoppers, without pairwise joins in the
+warehouse.
+
+Each ID set (an audience version, or the brand shoppers of a keyword set in a
+holdout window) is pulled from Snowflake once, as 64-bit HASH(AKKIO_ID)
+values. Hashes are mapped to dense integer IDs through a local dictionary and
+stored as a compressed bitmap in output/cache/overlap/, keyed by audience
+version (shopper sets by keywords, window and fact-table fingerprint). The
+full intersection and Jaccard matrices are then computed locally with bitmap
+operations: Roaring bitmaps when pyroaring is installed, otherwise packed
+numpy bitsets with a vectorised popcount.
+
+Usage:
+    python analyses/audience_validation/audience_overlap.py
+    python audience_overlap.py --no-shoppers        # audiences only
+    python audience_overlap.py --refresh            # re-pull every ID set
+    python audience_overlap.py --max-in-flight 4    # pull 4 ID sets at once
+
+Writes audience_overlap_intersection.csv and audience_overlap_jaccard.csv
+next to audience_validation_results.csv in output/.
+
+Requirements:
+    - numpy, pandas (as for audience_validation.py)
+    - pyroaring (optional, recommended): pip install pyroaring
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from audience_validation import (
+    AUDIENCE_VERSIONS_SQL,
+    CONFIG_PATH,
+    OUTPUT_DIR,
+    AudienceConfig,
+    ConnectionPool,
+    _brand_filter,
+    _keyword_set_key,
+    _render_sql,
+    _run_query,
+    _stream_query,
+    fact_fingerprint,
+    load_audiences,
+    log,
+    resolve_brand_match,
+)
+
+try:
+    from pyroaring import BitMap
+except ImportError:  # numpy bitsets instead
+    BitMap = None
+
+OVERLAP_CACHE_DIR = OUTPUT_DIR / "cache" / "overlap"
+ID_DICTIONARY_PATH = OVERLAP_CACHE_DIR / "id_dictionary.npy"
+
+AUDIENCE_IDS_SQL = """
+SELECT DISTINCT HASH(AKKIO_ID) AS ID_HASH
+FROM __DB__.__SCHEMA__.AUDIENCE_LOOKUP
+WHERE audience_id = %(audience_id)s
+  AND ver = %(ver)s;
+"""
+
+SHOPPER_IDS_SQL = """
+SELECT DISTINCT HASH(F.AKKIO_ID) AS ID_HASH
+FROM __FACT_DB__.__FACT_SCHEMA__.FACT_TRANSACTION_ENRICHED AS F
+WHERE F.TRANS_DATE >= %(date_start)s
+  AND F.TRANS_DATE <  %(date_end)s
+  AND F.AKKIO_ID IS NOT NULL
+  AND (__BRAND_FILTER__);
+"""
+
+
+# Dense ID dictionary
+class IdDictionary:
+    """Append-only map from HASH(AKKIO_ID) to dense uint32 IDs, persisted as one .npy array.
+
+    An ID's dense value is its position in the array, so bitmaps stay small
+    and comparable across audiences. Cached bitmaps are only valid against
+    the dictionary they were encoded with: starting a new dictionary clears
+    them.
+    """
+
+    def __init__(self, path: Path = ID_DICTIONARY_PATH):
+        self.path = Path(path)
+        if self.path.exists():
+            self._hashes = np.load(self.path)
+        else:
+            self._hashes = np.empty(0, dtype=np.int64)
+            for stale in self.path.parent.glob("*.bitmap*"):
+                stale.unlink()
+        self._index()
+        self._dirty = False
+
+    def _index(self) -> None:
+        self._order = np.argsort(self._hashes, kind="stable").astype(np.uint32)
+        self._sorted = self._hashes[self._order]
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def encode(self, hashes: np.ndarray) -> np.ndarray:
+        """Sorted unique dense IDs for hashes, assigning new IDs to unseen hashes."""
+        hashes = np.unique(np.asarray(hashes, dtype=np.int64))
+        pos = np.searchsorted(self._sorted, hashes)
+        known = pos < len(self._sorted)
+        known[known] = self._sorted[pos[known]] == hashes[known]
+        dense = np.empty(len(hashes), dtype=np.uint32)
+        dense[known] = self._order[pos[known]]
+        new = hashes[~known]
+        if len(new):
+            if len(self._hashes) + len(new) > np.iinfo(np.uint32).max:
+                raise OverflowError("ID dictionary exceeds 2^32 entries")
+            dense[~known] = np.arange(len(self._hashes), len(self._hashes) + len(new), dtype=np.uint32)
+            self._hashes = np.concatenate([self._hashes, new])
+            self._index()
+            self._dirty = True
+        dense.sort()
+        return dense
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, self._hashes)
+        os.replace(tmp, self.path)
+        self._dirty = False
+
+
+# Bitmaps
+def to_bitmap(dense: np.ndarray):
+    """Roaring bitmap of sorted dense IDs (or the sorted array itself without pyroaring)."""
+    return BitMap(dense) if BitMap is not None else dense
+
+
+def bitmap_path(key: str) -> Path:
+    # Roaring and numpy caches are kept apart so either backend can read its own
+    return OVERLAP_CACHE_DIR / f"{key}.bitmap{'.roaring' if BitMap is not None else '.npz'}"
+
+
+def load_bitmap(key: str):
+    path = bitmap_path(key)
+    if not path.exists():
+        return None
+    if BitMap is not None:
+        return BitMap.deserialize(path.read_bytes())
+    with np.load(path) as data:
+        return data["ids"]
+
+
+def save_bitmap(key: str, bitmap) -> None:
+    path = bitmap_path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    if BitMap is not None:
+        tmp.write_bytes(bitmap.serialize())
+    else:
+        with open(tmp, "wb") as f:
+            np.savez_compressed(f, ids=bitmap)
+    os.replace(tmp, path)
+
+
+_POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _popcount_rows(words: np.ndarray) -> np.ndarray:
+    """Set bits per row of a 2-D uint64 array."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words).sum(axis=1, dtype=np.int64)
+    return _POPCOUNT8[words.view(np.uint8)].sum(axis=1, dtype=np.int64)
+
+
+def intersection_matrix(bitmaps: list) -> np.ndarray:
+    """Symmetric matrix of pairwise intersection sizes (set sizes on the diagonal)."""
+    n = len(bitmaps)
+    inter = np.zeros((n, n), dtype=np.int64)
+    if BitMap is not None:
+        for i in range(n):
+            inter[i, i] = len(bitmaps[i])
+            for j in range(i + 1, n):
+                inter[i, j] = inter[j, i] = bitmaps[i].intersection_cardinality(bitmaps[j])
+        return inter
+
+    # Packed bitsets over the dense ID space, one row per set; each row is
+    # ANDed against every later row at once
+    universe = max((int(b[-1]) + 1 for b in bitmaps if len(b)), default=1)
+    words = (universe + 63) // 64
+    packed = np.zeros((n, words), dtype=np.uint64)
+    for i, ids in enumerate(bitmaps):
+        bits = np.zeros(words * 64, dtype=bool)
+        bits[ids] = True
+        packed[i] = np.packbits(bits, bitorder="little").view(np.uint64)
+    for i in range(n):
+        inter[i, i:] = _popcount_rows(packed[i] & packed[i:])
+        inter[i:, i] = inter[i, i:]
+    return inter
+
+
+def jaccard_matrix(inter: np.ndarray) -> np.ndarray:
+    sizes = np.diag(inter)
+    union = sizes[:, None] + sizes[None, :] - inter
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(union > 0, inter / union, np.nan)
+
+
+# ID sets
+@dataclass
+class IdSet:
+    """One set of AKKIO_IDs to compare: an audience version or a brand's holdout shoppers."""
+
+    label: str
+    key: str                     # bitmap cache key
+    sql: str
+    bind_params: dict
+    kind: str                    # "audience" or "shoppers"
+
+
+def _cache_key(parts: dict) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", parts["name"]).strip("_")[:40]
+    digest = hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()[:16]
+    return f"{parts['kind']}_{slug}_{digest}"
+
+
+def plan_id_sets(conn, audiences: list[AudienceConfig], shoppers: bool = True) -> list[IdSet]:
+    """One IdSet per distinct audience (at its latest version) and, optionally, per brand shopper set."""
+    sets: list[IdSet] = []
+    versions: dict[tuple[str, str], dict] = {}
+    seen = set()
+    for aud in audiences:
+        source = (aud.database, aud.schema)
+        if source not in versions:
+            ids = sorted({a.audience_id for a in audiences if (a.database, a.schema) == source})
+            placeholders = ", ".join(f"%(aud_{i})s" for i in range(len(ids)))
+            df = _run_query(
+                conn,
+                _render_sql(AUDIENCE_VERSIONS_SQL, aud).replace("__AUDIENCE_IDS__", placeholders),
+                {f"aud_{i}": audience_id for i, audience_id in enumerate(ids)},
+            )
+            versions[source] = {row["AUDIENCE_ID"]: str(row["VER"]) for _, row in df.iterrows()}
+        ver = versions[source].get(aud.audience_id)
+        if ver is None:
+            log.warning("No version of audience '%s' in %s.%s.AUDIENCE_METADATA; skipped", aud.name, *source)
+            continue
+        if (source, aud.audience_id) in seen:
+            continue
+        seen.add((source, aud.audience_id))
+        parts = {"kind": "audience", "name": aud.name, "source": source, "audience_id": aud.audience_id, "ver": ver}
+        sets.append(IdSet(
+            label=aud.name,
+            key=_cache_key(parts),
+            sql=_render_sql(AUDIENCE_IDS_SQL, aud),
+            bind_params={"audience_id": aud.audience_id, "ver": ver},
+            kind="audience",
+        ))
+
+    if not shoppers:
+        return sets
+    if any(aud.brand_match != "like" for aud in audiences):
+        audiences = resolve_brand_match(conn, audiences)
+    seen = set()
+    for aud in audiences:
+        keywords = _keyword_set_key(aud.brand_keywords)
+        scope = (aud.fact_database, aud.fact_schema, aud.date_start, aud.date_end, keywords)
+        if scope in seen:
+            continue
+        seen.add(scope)
+        name = f"Shoppers: {', '.join(keywords)} ({aud.date_start} to {aud.date_end})"
+        # The brand_match mode only changes how the filter is evaluated, not which rows match
+        parts = {"kind": "shoppers", "name": name, "scope": scope, "fact_watermark": fact_fingerprint(conn, aud)}
+        sets.append(IdSet(
+            label=name,
+            key=_cache_key(parts),
+            sql=_render_sql(SHOPPER_IDS_SQL.replace("__BRAND_FILTER__", _brand_filter(aud)), aud),
+            bind_params={"date_start": aud.date_start, "date_end": aud.date_end},
+            kind="shoppers",
+        ))
+    return sets
+
+
+def fetch_hashes(conn, id_set: IdSet) -> np.ndarray:
+    """Pull one set's HASH(AKKIO_ID) values as an int64 array, streamed in batches."""
+    chunks = [
+        batch.column("ID_HASH").to_numpy().astype(np.int64)
+        for batch in _stream_query(conn, id_set.sql, id_set.bind_params,
+                                   kind="overlap", audiences=[id_set.label])
+    ]
+    return np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int64)
+
+
+def load_bitmaps(
+    id_sets: list[IdSet],
+    dictionary: IdDictionary,
+    refresh: bool = False,
+    max_in_flight: int = 1,
+) -> list:
+    """Bitmap per IdSet, from the cache or pulled from Snowflake (up to max_in_flight at once)."""
+    bitmaps: dict[str, object] = {}
+    todo = []
+    for id_set in id_sets:
+        cached = None if refresh else load_bitmap(id_set.key)
+        if cached is not None:
+            log.info("Using cached IDs for %s (%d)", id_set.label, len(cached))
+            bitmaps[id_set.key] = cached
+        else:
+            todo.append(id_set)
+
+    if todo:
+        pool = ConnectionPool(max_in_flight)
+
+        def _fetch(id_set: IdSet) -> np.ndarray:
+            with pool.connection() as conn:
+                return fetch_hashes(conn, id_set)
+
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, max_in_flight)) as executor:
+                futures = {executor.submit(_fetch, id_set): id_set for id_set in todo}
+                for fut in as_completed(futures):
+                    id_set = futures[fut]
+                    started = time.perf_counter()
+                    # Encoding stays on this thread: the dictionary is not thread-safe
+                    bitmap = to_bitmap(dictionary.encode(fut.result()))
+                    bitmaps[id_set.key] = bitmap
+                    log.info("Pulled %d ID(s) for %s (encoded in %.2fs)",
+                             len(bitmap), id_set.label, time.perf_counter() - started)
+        finally:
+            pool.close()
+        # Dictionary first: cached bitmaps must never reference IDs it doesn't hold
+        dictionary.save()
+        for id_set in todo:
+            save_bitmap(id_set.key, bitmaps[id_set.key])
+
+    return [bitmaps[id_set.key] for id_set in id_sets]
+
+
+# Output
+def print_overlap(labels: list[str], inter: np.ndarray, jaccard: np.ndarray) -> None:
+    """Per set: size, then the other sets it overlaps most, by Jaccard."""
+    print(f"\n{'=' * 100}")
+    print("  AUDIENCE OVERLAP")
+    print(f"{'=' * 100}")
+    for i, label in enumerate(labels):
+        print(f"\n  {label}  ({inter[i, i]:,} IDs)")
+        others = sorted((j for j in range(len(labels)) if j != i and inter[i, j] > 0),
+                        key=lambda j: -jaccard[i, j])
+        for j in others[:5]:
+            share = inter[i, j] / inter[i, i] if inter[i, i] else float("nan")
+            print(f"    {jaccard[i, j]:7.2%} Jaccard  {inter[i, j]:>12,} shared ({share:6.1%} of this set)  {labels[j]}")
+        if not others:
+            print("    no overlap")
+    print()
+
+
+def export_overlap(labels: list[str], inter: np.ndarray, jaccard: np.ndarray, output_dir: Path) -> tuple[Path, Path]:
+    """Write the intersection and Jaccard matrices as labelled CSVs."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    inter_path = output_dir / "audience_overlap_intersection.csv"
+    jaccard_path = output_dir / "audience_overlap_jaccard.csv"
+    pd.DataFrame(inter, index=labels, columns=labels).to_csv(inter_path, index_label="SET")
+    pd.DataFrame(jaccard, index=labels, columns=labels).to_csv(jaccard_path, index_label="SET")
+    log.info("Overlap matrices exported to %s and %s", inter_path, jaccard_path)
+    return inter_path, jaccard_path
+
+
+# Main
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Overlap matrix of audiences and brand holdout shoppers.")
+    parser.add_argument("--config", type=Path, default=CONFIG_PATH, help="Audience config file.")
+    parser.add_argument("--no-shoppers", action="store_true",
+                        help="Only compare audiences, not the brand shoppers of their holdout windows.")
+    parser.add_argument("--refresh", action="store_true", help="Re-pull every ID set instead of using cached bitmaps.")
+    parser.add_argument("--max-in-flight", type=int, default=1,
+                        help="ID sets pulled from Snowflake concurrently (default: %(default)s).")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None):
+    args = parse_args(argv)
+    audiences = load_audiences(args.config)
+    if BitMap is None:
+        log.info("pyroaring not installed; using numpy bitsets")
+
+    pool = ConnectionPool(1)
+    try:
+        with pool.connection() as conn:
+            id_sets = plan_id_sets(conn, audiences, shoppers=not args.no_shoppers)
+    finally:
+        pool.close()
+    if not id_sets:
+        log.error("No ID sets to compare")
+        return None
+
+    dictionary = IdDictionary()
+    bitmaps = load_bitmaps(id_sets, dictionary, refresh=args.refresh, max_in_flight=args.max_in_flight)
+
+    started = time.perf_counter()
+    inter = intersection_matrix(bitmaps)
+    jaccard = jaccard_matrix(inter)
+    log.info("Overlap of %d set(s) over %d dense ID(s) computed in %.2fs",
+             len(id_sets), len(dictionary), time.perf_counter() - started)
+
+    labels = [id_set.label for id_set in id_sets]
+    print_overlap(labels, inter, jaccard)
+    export_overlap(labels, inter, jaccard, OUTPUT_DIR)
+    return pd.DataFrame(jaccard, index=labels, columns=labels)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() is not None else 1)
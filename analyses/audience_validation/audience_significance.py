@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Audience Significance
+=====================
+Confidence intervals and p-values for the lift metrics from a Poisson
+bootstrap run inside Snowflake: every active ID gets a hashed Poisson(1)
+weight per replicate, so one query per audience returns only the replicate
+aggregates, and the percentile intervals are computed locally with numpy.
+
+Run through the validator:
+    python audience_validation.py --significance --replicates 500 --confidence 0.9
+
+The interval and p-value columns are joined onto
+output/audience_validation_results.csv.
+"""
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from audience_validation import (
+    AudienceConfig,
+    _job_pool,
+    _keyword_flags,
+    _keyword_join,
+    _keyword_set_key,
+    _render_sql,
+    _run_jobs,
+    _run_query,
+    log,
+    resolve_brand_match,
+)
+
+BOOTSTRAP_REPLICATES = 200
+BOOTSTRAP_CONFIDENCE = 0.95
+BOOTSTRAP_SEED = 20250901
+
+# Upper CDF bounds of Poisson(1) for k = 0..7; a hashed uniform above the last
+# bound maps to weight 8 (P(k > 8) < 1e-6)
+POISSON_1_CDF = (0.367879, 0.735759, 0.919699, 0.981012, 0.996340, 0.999406, 0.999917, 0.999990)
+
+# Per-replicate aggregates for a Poisson bootstrap of the lift metrics. Every
+# active ID gets an independent Poisson(1) weight per replicate from a hash of
+# (AKKIO_ID, replicate, seed), so the resampling happens in the warehouse and
+# only REPLICATES rows come back. Audience members keep the same weight in the
+# baseline, preserving the overlap between the two.
+BOOTSTRAP_SQL_TEMPLATE = """
+WITH AUDIENCE AS (
+  SELECT DISTINCT AKKIO_ID
+  FROM __DB__.__SCHEMA__.AUDIENCE_LOOKUP
+  WHERE audience_id = %(audience_id)s
+    AND ver = (
+      SELECT MAX(ver)
+      FROM __DB__.__SCHEMA__.AUDIENCE_METADATA
+      WHERE audience_id = %(audience_id)s
+    )
+),
+WINDOW_FACTS AS (
+  SELECT
+    F.AKKIO_ID,
+    F.TRANS_AMOUNT,
+    CASE WHEN A.AKKIO_ID IS NOT NULL THEN 1 ELSE 0 END AS IN_AUDIENCE,
+    __KEYWORD_FLAGS__
+  FROM __FACT_DB__.__FACT_SCHEMA__.FACT_TRANSACTION_ENRICHED AS F
+  LEFT JOIN AUDIENCE AS A
+    ON A.AKKIO_ID = F.AKKIO_ID
+  __KEYWORD_JOIN__
+  WHERE F.TRANS_DATE >= %(date_start)s
+    AND F.TRANS_DATE <  %(date_end)s
+),
+-- One row per active ID: the unit being resampled
+ID_METRICS AS (
+  SELECT
+    AKKIO_ID,
+    MAX(IN_AUDIENCE)                                         AS IN_AUDIENCE,
+    MAX(KS_0)                                                AS IS_SHOPPER,
+    COALESCE(SUM(CASE WHEN KS_0 = 1 THEN TRANS_AMOUNT END), 0) AS BRAND_SPEND
+  FROM WINDOW_FACTS
+  GROUP BY AKKIO_ID
+),
+REPLICATES AS (
+  SELECT REPLICATE
+  FROM (VALUES __REPLICATE_ROWS__) AS R(REPLICATE)
+),
+DRAWS AS (
+  SELECT
+    R.REPLICATE,
+    M.IN_AUDIENCE,
+    M.IS_SHOPPER,
+    M.BRAND_SPEND,
+    ABS(MOD(HASH(M.AKKIO_ID, R.REPLICATE, %(seed)s), 1000000)) / 1000000.0 AS U
+  FROM ID_METRICS AS M
+  CROSS JOIN REPLICATES AS R
+),
+WEIGHTED AS (
+  SELECT
+    REPLICATE,
+    IN_AUDIENCE,
+    IS_SHOPPER,
+    BRAND_SPEND,
+    __POISSON_WEIGHT__ AS W
+  FROM DRAWS
+)
+SELECT
+  REPLICATE,
+  SUM(W * IN_AUDIENCE)               AS ACTIVE_MATCHED_IDS,
+  SUM(W * IN_AUDIENCE * IS_SHOPPER)  AS BRAND_SHOPPERS,
+  SUM(W * IN_AUDIENCE * BRAND_SPEND) AS BRAND_SPEND,
+  SUM(W)                             AS BASELINE_ACTIVE_IDS,
+  SUM(W * IS_SHOPPER)                AS BASELINE_BRAND_SHOPPERS,
+  SUM(W * BRAND_SPEND)               AS BASELINE_BRAND_SPEND
+FROM WEIGHTED
+GROUP BY REPLICATE
+ORDER BY REPLICATE;
+"""
+
+
+def _poisson_weight_sql(uniform: str = "U") -> str:
+    """CASE expression inverting the Poisson(1) CDF at a uniform draw."""
+    branches = " ".join(f"WHEN {uniform} < {bound} THEN {k}" for k, bound in enumerate(POISSON_1_CDF))
+    return f"CASE {branches} ELSE {len(POISSON_1_CDF)} END"
+
+
+def _bootstrap_sql(audience: AudienceConfig, replicates: int) -> str:
+    """Render BOOTSTRAP_SQL_TEMPLATE for one audience and replicate count."""
+    keyword_sets = {_keyword_set_key(audience.brand_keywords): 0}
+    template = (
+        BOOTSTRAP_SQL_TEMPLATE
+        .replace("__REPLICATE_ROWS__", ", ".join(f"({r})" for r in range(replicates)))
+        .replace("__POISSON_WEIGHT__", _poisson_weight_sql())
+        .replace("__KEYWORD_FLAGS__", _keyword_flags(keyword_sets, audience))
+        .replace("__KEYWORD_JOIN__", _keyword_join(keyword_sets, audience))
+    )
+    return _render_sql(template, audience)
+
+
+def bootstrap_replicates(
+    conn,
+    audience: AudienceConfig,
+    replicates: int = BOOTSTRAP_REPLICATES,
+    seed: int = BOOTSTRAP_SEED,
+    timeout: Optional[int] = None,
+) -> pd.DataFrame:
+    """Run the in-warehouse Poisson bootstrap for one audience; one row per replicate."""
+    bind_params = {
+        "audience_id": audience.audience_id,
+        "date_start": audience.date_start,
+        "date_end": audience.date_end,
+        "seed": seed,
+    }
+    log.info("Bootstrapping audience: %s  [%s] (%d replicates)", audience.name, audience.audience_id, replicates)
+    df = _run_query(conn, _bootstrap_sql(audience, replicates), bind_params, timeout=timeout,
+                    kind="bootstrap", audiences=[audience.name])
+    df.insert(0, "AUDIENCE_NAME", audience.name)
+    return df
+
+
+def bootstrap_intervals(replicates: pd.DataFrame, confidence: float = BOOTSTRAP_CONFIDENCE) -> pd.DataFrame:
+    """Percentile CIs and two-sided p-values (H0: lift = 1) for SHOP_RATE_LIFT and SPEND_RATE_LIFT.
+
+    replicates holds bootstrap_replicates() rows for any number of audiences,
+    tagged with an AUDIENCE_INDEX column (names need not be unique); all of
+    them are evaluated together on (audience x replicate) arrays. Replicates
+    with an undefined lift (no weighted audience or baseline shoppers) are
+    ignored.
+    """
+    first = replicates.drop_duplicates("AUDIENCE_INDEX").sort_values("AUDIENCE_INDEX")
+    positions, names = list(first["AUDIENCE_INDEX"]), list(first["AUDIENCE_NAME"])
+
+    def grid(col: str) -> np.ndarray:
+        wide = replicates.pivot(index="AUDIENCE_INDEX", columns="REPLICATE", values=col)
+        return wide.reindex(positions).to_numpy(dtype=float)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        active, baseline_active = grid("ACTIVE_MATCHED_IDS"), grid("BASELINE_ACTIVE_IDS")
+        lifts = {
+            "SHOP_RATE_LIFT": (grid("BRAND_SHOPPERS") / active)
+                              / (grid("BASELINE_BRAND_SHOPPERS") / baseline_active),
+            "SPEND_RATE_LIFT": (grid("BRAND_SPEND") / active)
+                               / (grid("BASELINE_BRAND_SPEND") / baseline_active),
+        }
+
+    tail = (1 - confidence) / 2 * 100
+    out = pd.DataFrame({"AUDIENCE_INDEX": positions, "AUDIENCE_NAME": names})
+    for col, lift in lifts.items():
+        lift = np.where(np.isfinite(lift), lift, np.nan)
+        valid = np.isfinite(lift).sum(axis=1)
+        low = np.full(len(names), np.nan)
+        high = np.full(len(names), np.nan)
+        if valid.any():
+            low[valid > 0], high[valid > 0] = np.nanpercentile(lift[valid > 0], [tail, 100 - tail], axis=1)
+        # Share of replicates on the far side of 1, with the +1 correction so
+        # p is never reported as exactly 0 from a finite number of replicates
+        below = np.sum(lift <= 1, axis=1)
+        above = np.sum(lift >= 1, axis=1)
+        p_value = np.minimum(1.0, 2 * (np.minimum(below, above) + 1) / (valid + 1))
+        out[f"{col}_CI_LOW"] = low
+        out[f"{col}_CI_HIGH"] = high
+        out[f"{col}_P_VALUE"] = np.where(valid > 0, p_value, np.nan)
+    return out
+
+
+def run_significance(
+    audiences: list[AudienceConfig],
+    replicates: int = BOOTSTRAP_REPLICATES,
+    confidence: float = BOOTSTRAP_CONFIDENCE,
+    seed: int = BOOTSTRAP_SEED,
+    max_in_flight: int = 1,
+    query_timeout: Optional[int] = None,
+    positions: Optional[list[int]] = None,
+) -> pd.DataFrame:
+    """Bootstrap lift CIs and p-values for every audience, keyed on AUDIENCE_INDEX.
+
+    AUDIENCE_INDEX is the audience's entry in positions (its config position,
+    to match validate_all's index), or its position in audiences by default.
+    Failures are logged and skipped, like validate_all.
+    """
+    frames: list[pd.DataFrame] = []
+    if positions is None:
+        positions = list(range(len(audiences)))
+
+    def _bootstrap(pos: int, aud: AudienceConfig):
+        def run(conn) -> None:
+            df = bootstrap_replicates(conn, aud, replicates, seed, timeout=query_timeout)
+            df.insert(0, "AUDIENCE_INDEX", pos)
+            frames.append(df)
+        return aud.name, run
+
+    with _job_pool(max_in_flight) as pool:
+        if any(aud.brand_match != "like" for aud in audiences):
+            with pool.connection() as conn:
+                audiences = resolve_brand_match(conn, audiences)
+        _run_jobs(pool, [_bootstrap(pos, aud) for pos, aud in zip(positions, audiences)],
+                  max_in_flight, "Bootstrap")
+
+    if not frames:
+        return pd.DataFrame(columns=["AUDIENCE_INDEX", "AUDIENCE_NAME"])
+    return bootstrap_intervals(pd.concat(frames, ignore_index=True), confidence)
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Audience Holdout Sweeps
+=======================
+Tracks how an audience's lift decays over time: a series of holdout windows
+anchored at the audience's date_start (rolling back-to-back windows, or one
+expanding window), all computed from a single scan of
+FACT_TRANSACTION_ENRICHED per audience.
+
+Run through the validator (or set `sweep:` in audiences.yml):
+    python audience_validation.py --sweep rolling --sweep-step-days 7 --sweep-count 12
+
+The tidy (audience, window, metric) table is written to
+output/audience_validation_sweep.csv.
+"""
+
+from dataclasses import replace
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from audience_validation import (
+    AudienceConfig,
+    _job_pool,
+    _keyword_flags,
+    _keyword_join,
+    _keyword_set_key,
+    _render_sql,
+    _run_jobs,
+    _run_query,
+    log,
+    resolve_brand_match,
+)
+
+# Every window of an audience's sweep in one query. The union of the windows
+# is scanned once (SWEEP_FACTS) and each fact row joins the windows covering
+# its date (exactly one for back-to-back rolling windows), so audience and
+# baseline metrics for all windows come out of a single GROUP BY. Metric
+# formulas match VALIDATION_SQL_TEMPLATE.
+SWEEP_SQL_TEMPLATE = """
+WITH AUDIENCE AS (
+  SELECT DISTINCT AKKIO_ID
+  FROM __DB__.__SCHEMA__.AUDIENCE_LOOKUP
+  WHERE audience_id = %(audience_id)s
+    AND ver = (
+      SELECT MAX(ver)
+      FROM __DB__.__SCHEMA__.AUDIENCE_METADATA
+      WHERE audience_id = %(audience_id)s
+    )
+),
+SWEEP_WINDOWS AS (
+  SELECT WINDOW_ID, WINDOW_START::DATE AS WINDOW_START, WINDOW_END::DATE AS WINDOW_END
+  FROM (VALUES __WINDOW_ROWS__) AS W(WINDOW_ID, WINDOW_START, WINDOW_END)
+),
+SWEEP_FACTS AS (
+  SELECT
+    F.TRANS_DATE,
+    F.AKKIO_ID,
+    F.TXID,
+    F.TRANS_AMOUNT,
+    CASE WHEN A.AKKIO_ID IS NOT NULL THEN 1 ELSE 0 END AS IN_AUDIENCE,
+    __KEYWORD_FLAGS__
+  FROM __FACT_DB__.__FACT_SCHEMA__.FACT_TRANSACTION_ENRICHED AS F
+  LEFT JOIN AUDIENCE AS A
+    ON A.AKKIO_ID = F.AKKIO_ID
+  __KEYWORD_JOIN__
+  WHERE F.TRANS_DATE >= %(date_start)s
+    AND F.TRANS_DATE <  %(date_end)s
+),
+WINDOW_METRICS AS (
+  SELECT
+    W.WINDOW_ID,
+    W.WINDOW_START,
+    W.WINDOW_END,
+    COUNT(DISTINCT CASE WHEN S.IN_AUDIENCE = 1 THEN S.AKKIO_ID END)                  AS ACTIVE_MATCHED_IDS,
+    COUNT(DISTINCT CASE WHEN S.IN_AUDIENCE = 1 AND S.KS_0 = 1 THEN S.AKKIO_ID END)   AS BRAND_SHOPPERS,
+    COUNT(CASE WHEN S.IN_AUDIENCE = 1 AND S.KS_0 = 1 THEN S.TXID END)                AS BRAND_TRANSACTIONS,
+    COALESCE(SUM(CASE WHEN S.IN_AUDIENCE = 1 AND S.KS_0 = 1 THEN S.TRANS_AMOUNT END), 0) AS BRAND_SPEND,
+    COUNT(DISTINCT S.AKKIO_ID)                                                       AS BASELINE_ACTIVE_IDS,
+    COUNT(DISTINCT CASE WHEN S.KS_0 = 1 THEN S.AKKIO_ID END)                         AS BASELINE_BRAND_SHOPPERS,
+    COALESCE(SUM(CASE WHEN S.KS_0 = 1 THEN S.TRANS_AMOUNT END), 0)                   AS BASELINE_BRAND_SPEND
+  FROM SWEEP_FACTS AS S
+  INNER JOIN SWEEP_WINDOWS AS W
+    ON S.TRANS_DATE >= W.WINDOW_START
+   AND S.TRANS_DATE <  W.WINDOW_END
+  GROUP BY W.WINDOW_ID, W.WINDOW_START, W.WINDOW_END
+)
+SELECT
+  WINDOW_ID,
+  WINDOW_START,
+  WINDOW_END,
+  ACTIVE_MATCHED_IDS,
+  BRAND_SHOPPERS,
+  BRAND_TRANSACTIONS,
+  BRAND_SPEND,
+  CASE WHEN ACTIVE_MATCHED_IDS > 0
+       THEN CAST(BRAND_SHOPPERS AS FLOAT) / ACTIVE_MATCHED_IDS
+       ELSE 0 END               AS SHOP_RATE,
+  CASE WHEN ACTIVE_MATCHED_IDS > 0
+       THEN CAST(BRAND_SPEND AS FLOAT) / ACTIVE_MATCHED_IDS
+       ELSE 0 END               AS SPEND_RATE,
+  CASE WHEN BRAND_TRANSACTIONS > 0
+       THEN CAST(BRAND_SPEND AS FLOAT) / BRAND_TRANSACTIONS
+       ELSE 0 END               AS AVERAGE_TICKET,
+  CASE WHEN BRAND_SHOPPERS > 0
+       THEN CAST(BRAND_TRANSACTIONS AS FLOAT) / BRAND_SHOPPERS
+       ELSE 0 END               AS AVG_TRANSACTIONS_PER_SHOPPER,
+  BASELINE_ACTIVE_IDS,
+  BASELINE_BRAND_SHOPPERS,
+  CASE WHEN BASELINE_ACTIVE_IDS > 0
+       THEN CAST(BASELINE_BRAND_SHOPPERS AS FLOAT) / BASELINE_ACTIVE_IDS
+       ELSE 0 END               AS BASELINE_SHOP_RATE,
+  CASE WHEN BASELINE_ACTIVE_IDS > 0
+       THEN CAST(BASELINE_BRAND_SPEND AS FLOAT) / BASELINE_ACTIVE_IDS
+       ELSE 0 END               AS BASELINE_SPEND_RATE,
+  CASE WHEN ACTIVE_MATCHED_IDS > 0 AND BASELINE_BRAND_SHOPPERS > 0
+       THEN (CAST(BRAND_SHOPPERS AS FLOAT) / ACTIVE_MATCHED_IDS)
+          / (CAST(BASELINE_BRAND_SHOPPERS AS FLOAT) / BASELINE_ACTIVE_IDS)
+       ELSE NULL END            AS SHOP_RATE_LIFT,
+  CASE WHEN ACTIVE_MATCHED_IDS > 0 AND BASELINE_BRAND_SPEND > 0
+       THEN (CAST(BRAND_SPEND AS FLOAT) / ACTIVE_MATCHED_IDS)
+          / (CAST(BASELINE_BRAND_SPEND AS FLOAT) / BASELINE_ACTIVE_IDS)
+       ELSE NULL END            AS SPEND_RATE_LIFT
+FROM WINDOW_METRICS
+ORDER BY WINDOW_ID;
+"""
+
+SWEEP_ID_COLS = ["AUDIENCE_NAME", "AUDIENCE_ID", "WINDOW_ID", "WINDOW_START", "WINDOW_END"]
+
+
+def _sweep_span(audience: AudienceConfig) -> AudienceConfig:
+    """The audience with date_start / date_end widened to the union of its sweep windows."""
+    windows = audience.sweep.windows(audience.date_start)
+    return replace(audience, date_start=windows[0][0], date_end=max(end for _, end in windows))
+
+
+def _sweep_sql(audience: AudienceConfig) -> str:
+    """Render SWEEP_SQL_TEMPLATE for one audience's sweep windows."""
+    keyword_sets = {_keyword_set_key(audience.brand_keywords): 0}
+    rows = ", ".join(
+        f"({i}, '{start}', '{end}')"
+        for i, (start, end) in enumerate(audience.sweep.windows(audience.date_start))
+    )
+    template = (
+        SWEEP_SQL_TEMPLATE
+        .replace("__WINDOW_ROWS__", rows)
+        .replace("__KEYWORD_FLAGS__", _keyword_flags(keyword_sets, audience))
+        .replace("__KEYWORD_JOIN__", _keyword_join(keyword_sets, audience))
+    )
+    return _render_sql(template, audience)
+
+
+def sweep_audience(
+    conn,
+    audience: AudienceConfig,
+    timeout: Optional[int] = None,
+) -> pd.DataFrame:
+    """Run one audience's sweep; one row per window with data, metrics as columns."""
+    span = _sweep_span(audience)
+    bind_params = {
+        "audience_id": audience.audience_id,
+        "date_start": span.date_start,
+        "date_end": span.date_end,
+    }
+    sweep = audience.sweep
+    log.info("Sweeping audience: %s  [%s] (%d %s window(s) every %d day(s), %s to %s)",
+             audience.name, audience.audience_id, sweep.count, sweep.mode, sweep.step_days,
+             span.date_start, span.date_end)
+    df = _run_query(conn, _sweep_sql(audience), bind_params, timeout=timeout,
+                    kind="sweep", audiences=[audience.name])
+    df.insert(0, "AUDIENCE_ID", audience.audience_id)
+    df.insert(0, "AUDIENCE_NAME", audience.name)
+    if len(df) < sweep.count:
+        log.warning("  -> %d of %d window(s) have no transactions", sweep.count - len(df), sweep.count)
+    return df
+
+
+def tidy_sweep(wide: pd.DataFrame) -> pd.DataFrame:
+    """Reshape sweep_audience() rows to one row per (audience, window, metric)."""
+    tidy = wide.melt(id_vars=SWEEP_ID_COLS, var_name="METRIC", value_name="VALUE")
+    return tidy.sort_values(["AUDIENCE_NAME", "WINDOW_ID"], kind="stable").reset_index(drop=True)
+
+
+def run_sweeps(
+    audiences: list[AudienceConfig],
+    max_in_flight: int = 1,
+    query_timeout: Optional[int] = None,
+) -> pd.DataFrame:
+    """Sweep every audience with sweep settings configured; returns the tidy table.
+
+    Failures are logged and skipped, like validate_all.
+    """
+    audiences = [aud for aud in audiences if aud.sweep]
+    if not audiences:
+        return pd.DataFrame()
+
+    frames: list[pd.DataFrame] = []
+
+    def _sweep(aud: AudienceConfig):
+        def run(conn) -> None:
+            frames.append(sweep_audience(conn, aud, timeout=query_timeout))
+        return aud.name, run
+
+    with _job_pool(max_in_flight) as pool:
+        if any(aud.brand_match != "like" for aud in audiences):
+            # Resolve over the whole sweep span, then restore each audience's anchor
+            with pool.connection() as conn:
+                resolved = resolve_brand_match(conn, [_sweep_span(aud) for aud in audiences])
+            audiences = [
+                replace(res, date_start=aud.date_start, date_end=aud.date_end)
+                for aud, res in zip(audiences, resolved)
+            ]
+        _run_jobs(pool, [_sweep(aud) for aud in audiences], max_in_flight, "Sweep")
+
+    if not frames:
+        return pd.DataFrame()
+    return tidy_sweep(pd.concat(frames, ignore_index=True))
+
+
+def export_sweep(tidy: pd.DataFrame, output_dir: Path) -> Path:
+    """Export the tidy sweep table to CSV in the output directory."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    csv_path = output_dir / "audience_validation_sweep.csv"
+    tidy.to_csv(csv_path, index=False)
+    log.info("Sweep results exported to %s", csv_path)
+    return csv_path
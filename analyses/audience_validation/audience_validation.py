@@ -11,6 +11,70 @@ Usage:
     Or from the analyses/audience_validation directory:
     python audience_validation.py
 
+    Validate audiences that share a fact schema and holdout window in a
+    single query per group (one scan of FACT_TRANSACTION_ENRICHED):
+    python audience_validation.py --batched
+
+    Baseline (general-population) metrics are cached in output/cache/ and
+    reused across audiences and runs until FACT_TRANSACTION_ENRICHED changes.
+    Disable with --no-baseline-cache.
+
+    Estimate those baselines for any window from the daily HLL sketches in
+    FACT_BRAND_DAY_SKETCH instead of scanning the window (keywords that do not
+    resolve to whole brands are still computed exactly):
+    python audience_validation.py --sketch-baselines
+
+    Audiences whose version, keywords, window and fact data are unchanged
+    since the last run are served from output/cache/results.sqlite instead of
+    being re-run. Re-run everything with --force.
+
+    Run up to 8 validation queries side by side, cancelling any that exceed
+    15 minutes (Ctrl-C aborts everything still running):
+    python audience_validation.py --max-in-flight 8 --query-timeout 900
+
+    Profile every query (query ID, client / server time, bytes and partitions
+    scanned, spill) from query history, flagging audiences whose scans prune
+    poorly; written to output/audience_validation_profile.csv / .json:
+    python audience_validation.py --profile
+
+    Also slice each audience by week and experiment group, streamed to
+    partitioned Parquet under output/breakdowns/ (or set `breakdown:` in
+    audiences.yml):
+    python audience_validation.py --breakdown week experiment_group
+
+    Audiences whose window starts and ends on month boundaries, and whose
+    keywords resolve to whole brands, are read from the monthly pre-aggregate
+    FACT_BRAND_MONTH_SUMMARY instead of the detail table (the path taken is
+    logged per audience). Disable with --no-rollup.
+
+    Fast preview: HLL distinct counts on a 5% sample of AKKIO_IDs, every
+    metric carrying an estimated ~95% error bound (the ID sample is unbiased
+    but still scans every micro-partition; --sample-blocks 10 reads ~10% of
+    them instead, cutting bytes scanned at the cost of inflated ID counts):
+    python audience_validation.py --approx --sample-pct 5
+
+    Track lift decay: sweep each audience over 12 back-to-back weekly windows
+    from its date_start, every window computed in one scan, written as a
+    tidy (audience, window, metric) table to output/audience_validation_sweep.csv
+    (or set `sweep:` in audiences.yml; --sweep expanding grows the window
+    instead):
+    python audience_validation.py --sweep rolling --sweep-step-days 7 --sweep-count 12
+
+    Check every validation query's scan with EXPLAIN before anything runs:
+    print the estimated partitions and bytes per audience and exit, writing
+    output/audience_validation_plan.csv:
+    python audience_validation.py --plan-only
+
+    Refuse queries estimated to scan more than 50 GB each or 200 GB in total
+    (--over-budget approx downgrades them to an approx preview reading ~10% of
+    their micro-partitions instead, when that fits). Breakdowns, sweeps and
+    significance are skipped for those audiences:
+    python audience_validation.py --max-query-gb 50 --max-run-gb 200
+
+    Add bootstrap confidence intervals and p-values for the lift metrics
+    (Poisson bootstrap run inside the warehouse, 500 replicates, 90% CIs):
+    python audience_validation.py --significance --replicates 500 --confidence 0.9
+
 Configuration:
     Edit audiences.yml (in the same directory as this script) to add/remove
     audiences. Snowflake credentials are read from environment variables or
@@ -21,14 +85,28 @@ Environment variables (if not using dbt profiles):
     SNOWFLAKE_DATABASE, SNOWFLAKE_SCHEMA, SNOWFLAKE_WAREHOUSE, SNOWFLAKE_ROLE
 """
 
+import argparse
+import hashlib
+import json
+import math
 import os
+import queue
+import sqlite3
 import sys
+import threading
+import time
 import yaml
 import logging
-from dataclasses import dataclass
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from datetime import date, timedelta
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
 
+import numpy as np
 import snowflake.connector
 import pandas as pd
 
@@ -47,6 +125,44 @@ log = logging.getLogger(__name__)
 
 
 # Data classes
+SWEEP_MODES = {"rolling", "expanding"}
+
+
+@dataclass(frozen=True)
+class SweepSettings:
+    """A series of holdout windows anchored at the audience's date_start (see audience_sweep.run_sweeps)."""
+
+    mode: str = "rolling"                # "rolling" = fixed-length windows stepping forward,
+                                         # "expanding" = windows growing from date_start
+    step_days: int = 7                   # Days between consecutive window starts (rolling) / ends (expanding)
+    count: int = 12                      # Number of windows
+    length_days: Optional[int] = None    # Rolling window length; None = step_days (back-to-back windows)
+
+    def windows(self, date_start: str) -> list[tuple[str, str]]:
+        """(inclusive start, exclusive end) ISO dates of every window, in order."""
+        first = date.fromisoformat(str(date_start))
+        step = timedelta(days=self.step_days)
+        if self.mode == "expanding":
+            bounds = [(first, first + step * (k + 1)) for k in range(self.count)]
+        else:
+            length = timedelta(days=self.length_days or self.step_days)
+            bounds = [(first + step * k, first + step * k + length) for k in range(self.count)]
+        return [(start.isoformat(), end.isoformat()) for start, end in bounds]
+
+
+def sweep_from_dict(entry: dict) -> SweepSettings:
+    """Build SweepSettings from an audiences.yml `sweep:` mapping."""
+    try:
+        sweep = SweepSettings(**entry)
+    except TypeError as exc:
+        raise ValueError(f"Invalid sweep settings {entry}: {exc}") from None
+    if sweep.mode not in SWEEP_MODES:
+        raise ValueError(f"Invalid sweep mode '{sweep.mode}' (expected one of {sorted(SWEEP_MODES)})")
+    if sweep.step_days < 1 or sweep.count < 1 or (sweep.length_days is not None and sweep.length_days < 1):
+        raise ValueError("sweep step_days, count and length_days must be positive")
+    return sweep
+
+
 @dataclass
 class AudienceConfig:
     """One audience + brand combination to validate."""
@@ -60,9 +176,34 @@ class AudienceConfig:
     schema: str = "AFS_POC"              # Snowflake schema for AUDIENCE_LOOKUP / AUDIENCE_METADATA
     fact_database: str = "DEMO"          # Snowflake database for FACT_TRANSACTION_ENRICHED
     fact_schema: str = "AFS_POC"         # Snowflake schema for FACT_TRANSACTION_ENRICHED
+    brand_match: str = "like"            # "like" = substring scan, "dim" = semi-join on DIM_BRAND_KEYWORD_MATCH,
+                                         # "ids" = IN-list of merchant keys from keyword_preview.py --emit-ids
+    breakdown: list[str] = field(default_factory=list)  # BREAKDOWN_DIMENSIONS to slice metrics by (see run_breakdowns)
+    sweep: Optional[SweepSettings] = None  # Holdout windows to sweep in one scan (see audience_sweep)
 
 
 # Config loader
+BRAND_MATCH_MODES = {"like", "dim", "ids"}
+
+# Breakdown dimension -> SQL expression. F = FACT_TRANSACTION_ENRICHED,
+# D = V_AKKIO_ATTRIBUTES_LATEST (joined only when a D.* dimension is requested).
+BREAKDOWN_DIMENSIONS = {
+    "week": "DATE_TRUNC('WEEK', F.TRANS_DATE)",
+    "transaction_channel": "F.TRANSACTION_CHANNEL",
+    "experiment_group": "F.EXPERIMENT_GROUP",
+    "merchant_state": "F.MERCHANT_STATE",
+    "gender": "D.GENDER",
+    "age_bucket": "D.AGE_BUCKET",
+    "income_bucket": "D.INCOME_BUCKET",
+    "net_worth_bucket": "D.NET_WORTH_BUCKET",
+    "education_level": "D.EDUCATION_LEVEL",
+    "marital_status": "D.MARITAL_STATUS",
+    "homeowner_status": "D.HOMEOWNER_STATUS",
+    "presence_of_children": "D.PRESENCE_OF_CHILDREN",
+    "home_state": "D.STATE",
+}
+
+
 def load_audiences(config_path: Path = CONFIG_PATH) -> list[AudienceConfig]:
     """Load audience definitions from the YAML config file."""
     if not config_path.exists():
@@ -80,23 +221,38 @@ def load_audiences(config_path: Path = CONFIG_PATH) -> list[AudienceConfig]:
     if not audiences_raw:
         raise ValueError(f"No audiences defined in {config_path}")
 
-    audiences: list[AudienceConfig] = []
-    for entry in audiences_raw:
-        # Merge defaults with per-audience overrides
-        merged = {**defaults, **entry}
-        audiences.append(AudienceConfig(
-            audience_id=merged["audience_id"],
-            name=merged["name"],
-            brand_keywords=merged["brand_keywords"],
-            date_start=merged.get("date_start", "2025-08-01"),
-            date_end=merged.get("date_end", "2025-10-01"),
-            database=merged.get("database", "DEMO"),
-            schema=merged.get("schema", "AFS_POC"),
-            fact_database=merged.get("fact_database", "DEMO"),
-            fact_schema=merged.get("fact_schema", "AFS_POC"),
-        ))
-
-    return audiences
+    return [audience_from_dict(entry, defaults) for entry in audiences_raw]
+
+
+def audience_from_dict(entry: dict, defaults: Optional[dict] = None) -> AudienceConfig:
+    """Build an AudienceConfig from one audiences.yml entry (or API payload) merged over defaults."""
+    merged = {**(defaults or {}), **entry}
+    audience = AudienceConfig(
+        audience_id=merged["audience_id"],
+        name=merged["name"],
+        brand_keywords=merged["brand_keywords"],
+        date_start=merged.get("date_start", "2025-08-01"),
+        date_end=merged.get("date_end", "2025-10-01"),
+        database=merged.get("database", "DEMO"),
+        schema=merged.get("schema", "AFS_POC"),
+        fact_database=merged.get("fact_database", "DEMO"),
+        fact_schema=merged.get("fact_schema", "AFS_POC"),
+        brand_match=merged.get("brand_match", "like"),
+        breakdown=merged.get("breakdown", []),
+        sweep=sweep_from_dict(merged["sweep"]) if merged.get("sweep") else None,
+    )
+    if audience.brand_match not in BRAND_MATCH_MODES:
+        raise ValueError(
+            f"Invalid brand_match '{audience.brand_match}' for audience "
+            f"'{audience.name}' (expected one of {sorted(BRAND_MATCH_MODES)})"
+        )
+    unknown = set(audience.breakdown) - set(BREAKDOWN_DIMENSIONS)
+    if unknown:
+        raise ValueError(
+            f"Invalid breakdown dimension(s) {sorted(unknown)} for audience "
+            f"'{audience.name}' (expected any of {sorted(BREAKDOWN_DIMENSIONS)})"
+        )
+    return audience
 
 
 # SQL Template — now includes a general-population baseline for lift calculation
@@ -137,22 +293,7 @@ BRAND_METRICS AS (
 ),
 -- Baseline: general-population metrics over the same holdout window
 -- Counts ALL active transactors and brand shoppers in the full universe
-BASELINE_ACTIVE AS (
-  SELECT COUNT(DISTINCT F.AKKIO_ID) AS BASELINE_ACTIVE_IDS
-  FROM __FACT_DB__.__FACT_SCHEMA__.FACT_TRANSACTION_ENRICHED AS F
-  WHERE F.TRANS_DATE >= %(date_start)s
-    AND F.TRANS_DATE <  %(date_end)s
-),
-BASELINE_BRAND AS (
-  SELECT
-    COUNT(DISTINCT F.AKKIO_ID)           AS BASELINE_BRAND_SHOPPERS,
-    COUNT(F.TXID)                        AS BASELINE_BRAND_TRANSACTIONS,
-    COALESCE(SUM(F.TRANS_AMOUNT), 0)     AS BASELINE_BRAND_SPEND
-  FROM __FACT_DB__.__FACT_SCHEMA__.FACT_TRANSACTION_ENRICHED AS F
-  WHERE F.TRANS_DATE >= %(date_start)s
-    AND F.TRANS_DATE <  %(date_end)s
-    AND (__BRAND_FILTER__)
-)
+__BASELINE_CTES__
 SELECT
   %(audience_name)s              AS AUDIENCE_NAME,
   %(audience_id)s                AS AUDIENCE_ID,
@@ -204,6 +345,212 @@ CROSS JOIN BASELINE_BRAND   AS BB;
 """
 
 
+BASELINE_CTES_SQL = """BASELINE_ACTIVE AS (
+  SELECT COUNT(DISTINCT F.AKKIO_ID) AS BASELINE_ACTIVE_IDS
+  FROM __FACT_DB__.__FACT_SCHEMA__.FACT_TRANSACTION_ENRICHED AS F
+  WHERE F.TRANS_DATE >= %(date_start)s
+    AND F.TRANS_DATE <  %(date_end)s
+),
+BASELINE_BRAND AS (
+  SELECT
+    COUNT(DISTINCT F.AKKIO_ID)           AS BASELINE_BRAND_SHOPPERS,
+    COUNT(F.TXID)                        AS BASELINE_BRAND_TRANSACTIONS,
+    COALESCE(SUM(F.TRANS_AMOUNT), 0)     AS BASELINE_BRAND_SPEND
+  FROM __FACT_DB__.__FACT_SCHEMA__.FACT_TRANSACTION_ENRICHED AS F
+  WHERE F.TRANS_DATE >= %(date_start)s
+    AND F.TRANS_DATE <  %(date_end)s
+    AND (__BRAND_FILTER__)
+)"""
+
+# Used instead of BASELINE_CTES_SQL when the baseline comes from BaselineCache
+CACHED_BASELINE_CTES_SQL = """BASELINE_ACTIVE AS (
+  SELECT %(baseline_active_ids)s AS BASELINE_ACTIVE_IDS
+),
+BASELINE_BRAND AS (
+  SELECT
+    %(baseline_brand_shoppers)s      AS BASELINE_BRAND_SHOPPERS,
+    %(baseline_brand_transactions)s  AS BASELINE_BRAND_TRANSACTIONS,
+    %(baseline_brand_spend)s         AS BASELINE_BRAND_SPEND
+)"""
+
+
+# Batched variant — validates every audience that shares a fact schema and
+# holdout window in one query. The window is scanned once (WINDOW_FACTS) and each
+# distinct keyword set becomes a 0/1 flag column, so brand and baseline metrics
+# for all audiences fall out of the same pass. Output columns and formulas match
+# VALIDATION_SQL_TEMPLATE exactly.
+BATCH_VALIDATION_SQL_TEMPLATE = """
+WITH AUDIENCE_LIST AS (
+  __AUDIENCE_ROWS__
+),
+LATEST_VER AS (
+  SELECT audience_id, MAX(ver) AS ver
+  FROM __DB__.__SCHEMA__.AUDIENCE_METADATA
+  WHERE audience_id IN (SELECT AUDIENCE_ID FROM AUDIENCE_LIST)
+  GROUP BY audience_id
+),
+AUDIENCE AS (
+  SELECT L.AUDIENCE_ORDINAL, L.KEYWORD_SET, AL.AKKIO_ID
+  FROM AUDIENCE_LIST AS L
+  INNER JOIN LATEST_VER AS V
+    ON V.audience_id = L.AUDIENCE_ID
+  INNER JOIN __DB__.__SCHEMA__.AUDIENCE_LOOKUP AS AL
+    ON AL.audience_id = L.AUDIENCE_ID
+   AND AL.ver = V.ver
+),
+-- Single scan of the holdout window, one brand flag per keyword set
+WINDOW_FACTS AS (
+  SELECT
+    F.AKKIO_ID,
+    F.TXID,
+    F.TRANS_AMOUNT,
+    __KEYWORD_FLAGS__
+  FROM __FACT_DB__.__FACT_SCHEMA__.FACT_TRANSACTION_ENRICHED AS F
+  __KEYWORD_JOIN__
+  WHERE F.TRANS_DATE >= %(date_start)s
+    AND F.TRANS_DATE <  %(date_end)s
+),
+TOTAL_LAL AS (
+  SELECT AUDIENCE_ORDINAL, COUNT(DISTINCT AKKIO_ID) AS TOTAL_LAL_IDS
+  FROM AUDIENCE
+  GROUP BY AUDIENCE_ORDINAL
+),
+AUDIENCE_METRICS AS (
+  SELECT
+    A.AUDIENCE_ORDINAL,
+    COUNT(DISTINCT A.AKKIO_ID)                                   AS ACTIVE_MATCHED_IDS,
+    COUNT(DISTINCT CASE WHEN __BRAND_FLAG__ = 1 THEN A.AKKIO_ID END) AS BRAND_SHOPPERS,
+    COUNT(CASE WHEN __BRAND_FLAG__ = 1 THEN F.TXID END)           AS BRAND_TRANSACTIONS,
+    COALESCE(SUM(CASE WHEN __BRAND_FLAG__ = 1 THEN F.TRANS_AMOUNT END), 0) AS BRAND_SPEND
+  FROM AUDIENCE AS A
+  INNER JOIN WINDOW_FACTS AS F
+    ON A.AKKIO_ID = F.AKKIO_ID
+  GROUP BY A.AUDIENCE_ORDINAL
+),
+__BASELINE_CTES__,
+BATCH AS (
+  SELECT
+    L.AUDIENCE_ORDINAL,
+    L.AUDIENCE_NAME,
+    L.AUDIENCE_ID,
+    COALESCE(T.TOTAL_LAL_IDS, 0)      AS TOTAL_LAL_IDS,
+    COALESCE(M.ACTIVE_MATCHED_IDS, 0) AS ACTIVE_MATCHED_IDS,
+    COALESCE(M.BRAND_SHOPPERS, 0)     AS BRAND_SHOPPERS,
+    COALESCE(M.BRAND_TRANSACTIONS, 0) AS BRAND_TRANSACTIONS,
+    COALESCE(M.BRAND_SPEND, 0)        AS BRAND_SPEND,
+    BA.BASELINE_ACTIVE_IDS,
+    BB.BASELINE_BRAND_SHOPPERS,
+    BB.BASELINE_BRAND_SPEND
+  FROM AUDIENCE_LIST AS L
+  LEFT JOIN TOTAL_LAL        AS T  ON T.AUDIENCE_ORDINAL = L.AUDIENCE_ORDINAL
+  LEFT JOIN AUDIENCE_METRICS AS M  ON M.AUDIENCE_ORDINAL = L.AUDIENCE_ORDINAL
+  CROSS JOIN BASELINE_ACTIVE AS BA
+  INNER JOIN BASELINE_BRAND  AS BB ON BB.KEYWORD_SET = L.KEYWORD_SET
+)
+SELECT
+  AUDIENCE_NAME,
+  AUDIENCE_ID,
+  TOTAL_LAL_IDS,
+  ACTIVE_MATCHED_IDS,
+  BRAND_SHOPPERS,
+  BRAND_TRANSACTIONS,
+  BRAND_SPEND,
+
+  -- Audience rates
+  CASE WHEN ACTIVE_MATCHED_IDS > 0
+       THEN CAST(BRAND_SHOPPERS AS FLOAT) / ACTIVE_MATCHED_IDS
+       ELSE 0 END               AS SHOP_RATE,
+  CASE WHEN ACTIVE_MATCHED_IDS > 0
+       THEN CAST(BRAND_SPEND AS FLOAT) / ACTIVE_MATCHED_IDS
+       ELSE 0 END               AS SPEND_RATE,
+  CASE WHEN BRAND_TRANSACTIONS > 0
+       THEN CAST(BRAND_SPEND AS FLOAT) / BRAND_TRANSACTIONS
+       ELSE 0 END               AS AVERAGE_TICKET,
+  CASE WHEN BRAND_SHOPPERS > 0
+       THEN CAST(BRAND_TRANSACTIONS AS FLOAT) / BRAND_SHOPPERS
+       ELSE 0 END               AS AVG_TRANSACTIONS_PER_SHOPPER,
+
+  -- Baseline rates (general population)
+  BASELINE_ACTIVE_IDS,
+  BASELINE_BRAND_SHOPPERS,
+  CASE WHEN BASELINE_ACTIVE_IDS > 0
+       THEN CAST(BASELINE_BRAND_SHOPPERS AS FLOAT) / BASELINE_ACTIVE_IDS
+       ELSE 0 END               AS BASELINE_SHOP_RATE,
+  CASE WHEN BASELINE_ACTIVE_IDS > 0
+       THEN CAST(BASELINE_BRAND_SPEND AS FLOAT) / BASELINE_ACTIVE_IDS
+       ELSE 0 END               AS BASELINE_SPEND_RATE,
+
+  -- Lift metrics (audience rate / baseline rate)
+  CASE WHEN BASELINE_ACTIVE_IDS > 0 AND BASELINE_BRAND_SHOPPERS > 0
+       THEN (CAST(BRAND_SHOPPERS AS FLOAT) / ACTIVE_MATCHED_IDS)
+          / (CAST(BASELINE_BRAND_SHOPPERS AS FLOAT) / BASELINE_ACTIVE_IDS)
+       ELSE NULL END            AS SHOP_RATE_LIFT,
+  CASE WHEN BASELINE_ACTIVE_IDS > 0 AND BASELINE_BRAND_SPEND > 0
+       THEN (CAST(BRAND_SPEND AS FLOAT) / ACTIVE_MATCHED_IDS)
+          / (CAST(BASELINE_BRAND_SPEND AS FLOAT) / BASELINE_ACTIVE_IDS)
+       ELSE NULL END            AS SPEND_RATE_LIFT
+
+FROM BATCH
+ORDER BY AUDIENCE_ORDINAL;
+"""
+
+BATCH_BASELINE_CTES_SQL = """BASELINE_ACTIVE AS (
+  SELECT COUNT(DISTINCT AKKIO_ID) AS BASELINE_ACTIVE_IDS
+  FROM WINDOW_FACTS
+),
+BASELINE_BRAND AS (
+  __BASELINE_BRAND_SELECTS__
+)"""
+
+BATCH_CACHED_BASELINE_CTES_SQL = """BASELINE_ACTIVE AS (
+  SELECT %(baseline_active_ids)s AS BASELINE_ACTIVE_IDS
+),
+BASELINE_BRAND AS (
+  __BASELINE_BRAND_ROWS__
+)"""
+
+# Baseline-only query: active universe plus brand metrics for several keyword
+# sets from a single scan of the window. Feeds BaselineCache.
+BASELINE_SQL_TEMPLATE = """
+WITH WINDOW_FACTS AS (
+  SELECT
+    F.AKKIO_ID,
+    F.TXID,
+    F.TRANS_AMOUNT,
+    __KEYWORD_FLAGS__
+  FROM __FACT_DB__.__FACT_SCHEMA__.FACT_TRANSACTION_ENRICHED AS F
+  __KEYWORD_JOIN__
+  WHERE F.TRANS_DATE >= %(date_start)s
+    AND F.TRANS_DATE <  %(date_end)s
+),
+__BASELINE_CTES__
+SELECT
+  BB.KEYWORD_SET,
+  BA.BASELINE_ACTIVE_IDS,
+  BB.BASELINE_BRAND_SHOPPERS,
+  BB.BASELINE_BRAND_TRANSACTIONS,
+  BB.BASELINE_BRAND_SPEND
+FROM BASELINE_BRAND AS BB
+CROSS JOIN BASELINE_ACTIVE AS BA
+ORDER BY BB.KEYWORD_SET;
+"""
+
+# Cheap change detector for FACT_TRANSACTION_ENRICHED (served from metadata)
+FACT_FINGERPRINT_SQL = """
+SELECT
+  MAX(TRANS_DATE) AS MAX_TRANS_DATE,
+  COUNT(*)        AS ROW_COUNT
+FROM __FACT_DB__.__FACT_SCHEMA__.FACT_TRANSACTION_ENRICHED;
+"""
+
+BASELINE_BRAND_SELECT_TEMPLATE = """SELECT
+    __KEYWORD_SET__                                           AS KEYWORD_SET,
+    COUNT(DISTINCT CASE WHEN KS___KEYWORD_SET__ = 1 THEN AKKIO_ID END) AS BASELINE_BRAND_SHOPPERS,
+    COUNT(CASE WHEN KS___KEYWORD_SET__ = 1 THEN TXID END)           AS BASELINE_BRAND_TRANSACTIONS,
+    COALESCE(SUM(CASE WHEN KS___KEYWORD_SET__ = 1 THEN TRANS_AMOUNT END), 0) AS BASELINE_BRAND_SPEND
+  FROM WINDOW_FACTS"""
+
+
 def _build_brand_filter(keywords: list[str]) -> str:
     """Build a SQL OR-clause matching brand keywords against three columns.
 
@@ -220,6 +567,84 @@ def _build_brand_filter(keywords: list[str]) -> str:
     return "\n      OR ".join(clauses)
 
 
+def _sql_string_list(values) -> str:
+    """Render values as a comma-separated list of SQL string literals (pyformat-safe)."""
+    return ", ".join("'" + v.replace("'", "''").replace("%", "%%") + "'" for v in values)
+
+
+def _brand_dim_name(audience: AudienceConfig) -> str:
+    return f"{audience.fact_database}.{audience.fact_schema}.DIM_BRAND_KEYWORD_MATCH"
+
+
+def _build_brand_dim_filter(audience: AudienceConfig) -> str:
+    """Semi-join equivalent of _build_brand_filter against DIM_BRAND_KEYWORD_MATCH.
+
+    The dimension (models/afs/dim_brand_keyword_match.sql) pre-resolves each
+    keyword to the merchant keys carried on FACT_TRANSACTION_ENRICHED, so the
+    fact scan only does an equality lookup.
+    """
+    keywords = _sql_string_list(sorted({kw.upper() for kw in audience.brand_keywords}))
+    return (
+        "(F.MTID, COALESCE(F.STORE_ID, -1), COALESCE(F.BRAND_ID, -1)) IN (\n"
+        "      SELECT K.MTID, K.STORE_ID_KEY, K.BRAND_ID_KEY\n"
+        f"      FROM {_brand_dim_name(audience)} AS K\n"
+        f"      WHERE K.KEYWORD IN ({keywords})\n"
+        "    )"
+    )
+
+
+# Merchant keys resolved offline by keyword_preview.py --emit-ids
+BRAND_KEYWORD_IDS_PATH = OUTPUT_DIR / "brand_keyword_ids.json"
+
+
+@lru_cache(maxsize=8)
+def _read_brand_keyword_ids(path: Path, mtime_ns: int) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_brand_keyword_ids(path: Path = BRAND_KEYWORD_IDS_PATH) -> Optional[dict]:
+    """Load the resolved keyword -> merchant keys file, or None if it hasn't been generated.
+
+    Parsed files are cached by modification time, so a long-running process
+    (validation_service.py) picks up a regenerated file on its next call.
+    """
+    try:
+        mtime_ns = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    return _read_brand_keyword_ids(path, mtime_ns)
+
+
+def _build_brand_ids_filter(keywords) -> str:
+    """IN-list equivalent of _build_brand_filter using pre-resolved merchant keys.
+
+    Keys are (mtid, store_id, brand_id) as emitted by keyword_preview.py, with
+    NULL ids compared as -1 like the dimension's *_KEY columns.
+    """
+    resolved = load_brand_keyword_ids()["keywords"]
+    keys = sorted({
+        (mtid, -1 if store_id is None else store_id, -1 if brand_id is None else brand_id)
+        for kw in {k.upper() for k in keywords}
+        for mtid, store_id, brand_id in resolved[kw]
+    })
+    if not keys:
+        return "1 = 0"
+    values = ",\n      ".join(
+        f"({_sql_string_list([mtid])}, {int(store_id)}, {int(brand_id)})" for mtid, store_id, brand_id in keys
+    )
+    return f"(F.MTID, COALESCE(F.STORE_ID, -1), COALESCE(F.BRAND_ID, -1)) IN (\n      {values}\n    )"
+
+
+def _brand_filter(audience: AudienceConfig) -> str:
+    """Brand predicate on alias F for the audience's brand_match mode."""
+    if audience.brand_match == "dim":
+        return _build_brand_dim_filter(audience)
+    if audience.brand_match == "ids":
+        return _build_brand_ids_filter(audience.brand_keywords)
+    return _build_brand_filter(audience.brand_keywords)
+
+
 # Snowflake connection helpers
 def _get_snowflake_conn_from_env() -> dict:
     """Try to build connection params from environment variables."""
@@ -265,8 +690,11 @@ def _get_snowflake_conn_from_dbt() -> dict:
         return {}
 
 
-def get_snowflake_connection() -> snowflake.connector.SnowflakeConnection:
-    """Return a live Snowflake connection (env vars take precedence over dbt profiles)."""
+def get_snowflake_connection(**overrides) -> snowflake.connector.SnowflakeConnection:
+    """Return a live Snowflake connection (env vars take precedence over dbt profiles).
+
+    overrides are extra connector arguments, e.g. client_session_keep_alive=True.
+    """
     params = _get_snowflake_conn_from_env() or _get_snowflake_conn_from_dbt()
     if not params:
         raise RuntimeError(
@@ -278,165 +706,2519 @@ def get_snowflake_connection() -> snowflake.connector.SnowflakeConnection:
     params = {k: v for k, v in params.items() if v}
     log.info("Connecting to Snowflake account=%s, database=%s, schema=%s",
              params.get("account"), params.get("database"), params.get("schema"))
-    return snowflake.connector.connect(**params)
+    return snowflake.connector.connect(**params, **overrides)
 
 
 # Core validation logic
-def validate_audience(
-    conn: snowflake.connector.SnowflakeConnection,
-    audience: AudienceConfig,
-) -> pd.DataFrame:
-    """Run the validation query for a single audience and return a one-row DataFrame."""
-    brand_filter = _build_brand_filter(audience.brand_keywords)
-    sql = (
-        VALIDATION_SQL_TEMPLATE
+def _render_sql(template: str, audience: AudienceConfig) -> str:
+    """Substitute the database / schema placeholders for an audience into a SQL template."""
+    return (
+        template
         .replace("__DB__", audience.database)
         .replace("__SCHEMA__", audience.schema)
         .replace("__FACT_DB__", audience.fact_database)
         .replace("__FACT_SCHEMA__", audience.fact_schema)
-        .replace("__BRAND_FILTER__", brand_filter)
     )
-    bind_params = {
-        "audience_id": audience.audience_id,
-        "audience_name": audience.name,
-        "date_start": audience.date_start,
-        "date_end": audience.date_end,
-    }
 
-    log.info("Validating audience: %s  [%s]", audience.name, audience.audience_id)
-    log.info("  Brand keywords: %s | Date range: %s to %s",
-             audience.brand_keywords, audience.date_start, audience.date_end)
 
+# Cursors currently executing, so Ctrl-C can abort them server-side
+_IN_FLIGHT: set = set()
+_IN_FLIGHT_LOCK = threading.Lock()
+
+# Client-side record of every fact-scanning query (see profile_queries)
+QUERY_LOG_MAX_ENTRIES = 10_000
+_QUERY_LOG: deque = deque(maxlen=QUERY_LOG_MAX_ENTRIES)
+_QUERY_LOG_LOCK = threading.Lock()
+
+
+def _record_query(kind: str, audiences, cur, started: float, rows: int, status: str) -> None:
+    with _QUERY_LOG_LOCK:
+        _QUERY_LOG.append({
+            "KIND": kind,
+            "AUDIENCES": "; ".join(audiences),
+            "QUERY_ID": getattr(cur, "sfqid", None),
+            "STATUS": status,
+            "STARTED_AT": started,
+            "CLIENT_ELAPSED_S": round(time.time() - started, 3),
+            "ROWS_RETURNED": rows,
+        })
+
+
+def query_log(since: float = 0.0) -> list[dict]:
+    """Snapshot of recorded queries started at or after since (epoch seconds)."""
+    with _QUERY_LOG_LOCK:
+        return [dict(entry) for entry in _QUERY_LOG if entry["STARTED_AT"] >= since]
+
+
+def _run_query(
+    conn: snowflake.connector.SnowflakeConnection,
+    sql: str,
+    bind_params: dict,
+    timeout: Optional[int] = None,
+    kind: Optional[str] = None,
+    audiences: tuple = (),
+) -> pd.DataFrame:
+    """Execute a query and return its full result as a DataFrame.
+
+    timeout (seconds) is passed to the connector, which cancels the query
+    server-side once it is exceeded. Queries given a kind are recorded in the
+    query log with the audiences they serve.
+    """
     cur = conn.cursor()
+    with _IN_FLIGHT_LOCK:
+        _IN_FLIGHT.add(cur)
+    started = time.time()
+    rows = []
+    status = "failed"
     try:
-        cur.execute(sql, bind_params)
+        if timeout:
+            cur.execute(sql, bind_params, timeout=timeout)
+        else:
+            cur.execute(sql, bind_params)
         columns = [desc[0] for desc in cur.description]
         rows = cur.fetchall()
-        df = pd.DataFrame(rows, columns=columns)
+        status = "ok"
+        return pd.DataFrame(rows, columns=columns)
     finally:
+        if kind:
+            _record_query(kind, audiences, cur, started, len(rows), status)
+        with _IN_FLIGHT_LOCK:
+            _IN_FLIGHT.discard(cur)
         cur.close()
 
-    log.info("  -> %d row(s) returned", len(df))
-    return df
-
 
-def validate_all(audiences: list[AudienceConfig]) -> pd.DataFrame:
-    """Run validation for every audience and return the combined DataFrame."""
-    conn = get_snowflake_connection()
-    results: list[pd.DataFrame] = []
+def _stream_query(
+    conn: snowflake.connector.SnowflakeConnection,
+    sql: str,
+    bind_params: dict,
+    timeout: Optional[int] = None,
+    batch_rows: int = 100_000,
+    kind: Optional[str] = None,
+    audiences: tuple = (),
+):
+    """Execute a query and yield its result as pyarrow Tables, one batch at a time.
+
+    Uses the connector's Arrow result batches when available; otherwise falls
+    back to fetchmany() in batch_rows chunks. Only one batch is held in memory.
+    """
+    import pyarrow as pa
 
+    cur = conn.cursor()
+    with _IN_FLIGHT_LOCK:
+        _IN_FLIGHT.add(cur)
+    started = time.time()
+    rows = 0
+    status = "failed"
     try:
-        for aud in audiences:
-            try:
-                df = validate_audience(conn, aud)
-                results.append(df)
-            except Exception as exc:
-                log.error("FAILED for audience '%s': %s", aud.name, exc)
+        if timeout:
+            cur.execute(sql, bind_params, timeout=timeout)
+        else:
+            cur.execute(sql, bind_params)
+        if hasattr(cur, "fetch_arrow_batches"):
+            for batch in cur.fetch_arrow_batches():
+                rows += batch.num_rows
+                yield batch
+        else:
+            columns = [desc[0] for desc in cur.description]
+            while True:
+                chunk = cur.fetchmany(batch_rows)
+                if not chunk:
+                    break
+                rows += len(chunk)
+                yield pa.Table.from_pandas(pd.DataFrame(chunk, columns=columns), preserve_index=False)
+        status = "ok"
     finally:
-        conn.close()
-
-    if not results:
-        log.warning("No results collected.")
-        return pd.DataFrame()
+        if kind:
+            _record_query(kind, audiences, cur, started, rows, status)
+        with _IN_FLIGHT_LOCK:
+            _IN_FLIGHT.discard(cur)
+        cur.close()
 
-    combined = pd.concat(results, ignore_index=True)
-    return combined
 
+def cancel_in_flight() -> int:
+    """Abort every query still executing through _run_query / _stream_query. Returns the number aborted."""
+    with _IN_FLIGHT_LOCK:
+        cursors = list(_IN_FLIGHT)
+    cancelled = 0
+    for cur in cursors:
+        qid = getattr(cur, "sfqid", None)
+        try:
+            if qid and hasattr(cur, "abort_query"):
+                cur.abort_query(qid)
+            else:
+                cur.close()
+            cancelled += 1
+        except Exception as exc:
+            log.warning("Could not cancel query %s: %s", qid, exc)
+    return cancelled
+
+
+class ConnectionPool:
+    """Fixed-size pool of connections shared by validation worker threads.
+
+    Connections are opened lazily (via get_snowflake_connection unless a
+    factory is given), so a pool of 8 used by 2 workers only opens 2.
+    warm() opens the rest up front.
+    """
 
-# Display / export helpers
-CURRENCY_COLS = {"BRAND_SPEND", "SPEND_RATE", "AVERAGE_TICKET", "BASELINE_SPEND_RATE"}
-PERCENT_COLS = {"SHOP_RATE", "BASELINE_SHOP_RATE"}
-INT_COLS = {
-    "TOTAL_LAL_IDS", "ACTIVE_MATCHED_IDS", "BRAND_SHOPPERS",
-    "BRAND_TRANSACTIONS", "BASELINE_ACTIVE_IDS", "BASELINE_BRAND_SHOPPERS",
-}
-LIFT_COLS = {"SHOP_RATE_LIFT", "SPEND_RATE_LIFT"}
+    def __init__(self, size: int = 1, factory=None):
+        self.size = max(1, size)
+        self._factory = factory
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._opened: list = []
+        self._lock = threading.Lock()
 
+    def acquire(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if not self._is_closed(conn):
+                return conn
+            self._discard(conn)
+        with self._lock:
+            if len(self._opened) < self.size:
+                conn = (self._factory or get_snowflake_connection)()
+                self._opened.append(conn)
+                return conn
+        conn = self._idle.get()
+        if self._is_closed(conn):
+            self._discard(conn)
+            return self.acquire()
+        return conn
+
+    def warm(self) -> int:
+        """Open connections until size are open, leaving them idle; returns how many were opened."""
+        opened = []
+        with self._lock:
+            while len(self._opened) < self.size:
+                conn = (self._factory or get_snowflake_connection)()
+                self._opened.append(conn)
+                opened.append(conn)
+        for conn in opened:
+            self._idle.put(conn)
+        return len(opened)
+
+    @staticmethod
+    def _is_closed(conn) -> bool:
+        is_closed = getattr(conn, "is_closed", None)
+        return bool(is_closed and is_closed())
+
+    def _discard(self, conn) -> None:
+        """Forget a dead connection (e.g. an expired session) so a fresh one is opened in its place."""
+        with self._lock:
+            if conn in self._opened:
+                self._opened.remove(conn)
+
+    def release(self, conn) -> None:
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": self.size, "open": len(self._opened), "idle": self._idle.qsize()}
+
+    def close(self) -> None:
+        with self._lock:
+            for conn in self._opened:
+                try:
+                    conn.close()
+                except Exception as exc:
+                    log.warning("Error closing connection: %s", exc)
+            self._opened.clear()
+
+
+@contextmanager
+def _job_pool(max_in_flight: int, pool: Optional[ConnectionPool] = None):
+    """Yield pool, or a new pool of max_in_flight closed on exit; Ctrl-C aborts running queries."""
+    owns_pool = pool is None
+    if owns_pool:
+        pool = ConnectionPool(max_in_flight)
+    try:
+        yield pool
+    except KeyboardInterrupt:
+        log.warning("Interrupted — cancelling %d running quer(ies)", cancel_in_flight())
+        raise
+    finally:
+        if owns_pool:
+            pool.close()
 
-def _fmt(val, col: str) -> str:
-    """Format a single value for display."""
-    if pd.isna(val):
-        return "—"
-    if col in INT_COLS:
-        return f"{int(val):,}"
-    if col in CURRENCY_COLS:
-        return f"${val:,.2f}"
-    if col in PERCENT_COLS:
-        return f"{val:.4%}"
-    if col in LIFT_COLS:
-        return f"{val:,.2f}x"
-    if isinstance(val, float):
-        return f"{val:,.2f}"
-    return str(val)
 
+def _run_jobs(pool: ConnectionPool, jobs: list, max_in_flight: int, kind: str = "") -> None:
+    """Run (label, run) jobs, up to max_in_flight at once, each run(conn) on its own pooled connection.
 
-def print_summary(df: pd.DataFrame) -> None:
-    """Pretty-print the validation results in two panels: audience metrics + baseline/lift."""
-    if df.empty:
-        print("\n(no results)\n")
+    A failing job is logged against its label (an audience name) and skipped,
+    so one audience never stops the rest.
+    """
+    def _execute(label: str, run) -> None:
+        try:
+            with pool.connection() as conn:
+                run(conn)
+        except Exception as exc:
+            log.error("%sFAILED for audience '%s': %s", f"{kind} " if kind else "", label, exc)
+
+    if max_in_flight <= 1:
+        for label, run in jobs:
+            _execute(label, run)
         return
+    executor = ThreadPoolExecutor(max_workers=max_in_flight)
+    futures = [executor.submit(_execute, label, run) for label, run in jobs]
+    try:
+        for fut in as_completed(futures):
+            fut.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
 
-    # Panel 1: Core audience metrics
-    core_cols = [
-        "AUDIENCE_NAME", "TOTAL_LAL_IDS", "ACTIVE_MATCHED_IDS",
-        "BRAND_SHOPPERS", "BRAND_TRANSACTIONS", "BRAND_SPEND",
-        "SHOP_RATE", "SPEND_RATE", "AVERAGE_TICKET", "AVG_TRANSACTIONS_PER_SHOPPER",
-    ]
-    core_cols = [c for c in core_cols if c in df.columns]
 
-    # Panel 2: Baseline and lift
-    lift_cols = [
-        "AUDIENCE_NAME",
-        "BASELINE_ACTIVE_IDS", "BASELINE_BRAND_SHOPPERS",
-        "BASELINE_SHOP_RATE", "BASELINE_SPEND_RATE",
-        "SHOP_RATE_LIFT", "SPEND_RATE_LIFT",
-    ]
-    lift_cols = [c for c in lift_cols if c in df.columns]
+def _batch_key(audience: AudienceConfig) -> tuple[str, ...]:
+    """Audiences sharing this key can be validated in a single batched query."""
+    return (
+        audience.database, audience.schema,
+        audience.fact_database, audience.fact_schema,
+        audience.date_start, audience.date_end,
+        audience.brand_match,
+    )
 
-    def _print_table(title: str, cols: list[str]) -> None:
-        header = [c.replace("_", " ") for c in cols]
-        rows = []
-        for _, row in df.iterrows():
-            rows.append([_fmt(row[c], c) for c in cols])
 
-        widths = [max(len(h), *(len(r[i]) for r in rows)) for i, h in enumerate(header)]
-        sep = "+-" + "-+-".join("-" * w for w in widths) + "-+"
-        hdr_line = "| " + " | ".join(h.rjust(w) for h, w in zip(header, widths)) + " |"
+def _keyword_set_key(keywords: list[str]) -> tuple[str, ...]:
+    """Normalise a keyword list so audiences with equivalent filters share a flag column."""
+    return tuple(sorted({kw.upper() for kw in keywords}))
 
-        print("\n" + "=" * len(sep))
-        print(f"  {title}")
-        print("=" * len(sep))
-        print(sep)
-        print(hdr_line)
-        print(sep)
-        for r in rows:
-            print("| " + " | ".join(v.rjust(w) for v, w in zip(r, widths)) + " |")
-        print(sep)
-        print()
 
-    _print_table("AUDIENCE METRICS", core_cols)
+def _keyword_flags(keyword_sets: dict[tuple[str, ...], int], audience: AudienceConfig) -> str:
+    """One 0/1 KS_<n> column per keyword set, for the WINDOW_FACTS CTE."""
+    if audience.brand_match == "dim":
+        return ",\n    ".join(f"COALESCE(KM.KS_{ks}, 0) AS KS_{ks}" for ks in keyword_sets.values())
+    build = _build_brand_ids_filter if audience.brand_match == "ids" else _build_brand_filter
+    return ",\n    ".join(
+        f"CASE WHEN ({build(list(keywords))}) THEN 1 ELSE 0 END AS KS_{ks}"
+        for keywords, ks in keyword_sets.items()
+    )
 
-    if lift_cols and len(lift_cols) > 1:
-        _print_table("BASELINE COMPARISON & LIFT", lift_cols)
 
+def _keyword_join(keyword_sets: dict[tuple[str, ...], int], audience: AudienceConfig) -> str:
+    """LEFT JOIN supplying KM.KS_<n> flags from DIM_BRAND_KEYWORD_MATCH (dim mode only).
 
-def export_csv(df: pd.DataFrame, output_dir: Path) -> Path:
-    """Export the raw results to CSV in the output directory."""
-    output_dir.mkdir(parents=True, exist_ok=True)
-    csv_path = output_dir / "audience_validation_results.csv"
-    df.to_csv(csv_path, index=False)
-    log.info("Results exported to %s", csv_path)
-    return csv_path
+    The dimension is collapsed to one row per merchant key first, so the join
+    never fans out fact rows.
+    """
+    if audience.brand_match != "dim":
+        return ""
+    all_keywords = sorted({kw for keywords in keyword_sets for kw in keywords})
+    flags = ",\n      ".join(
+        f"MAX(CASE WHEN K.KEYWORD IN ({_sql_string_list(keywords)}) THEN 1 ELSE 0 END) AS KS_{ks}"
+        for keywords, ks in keyword_sets.items()
+    )
+    return f"""LEFT JOIN (
+    SELECT
+      K.MTID, K.STORE_ID_KEY, K.BRAND_ID_KEY,
+      {flags}
+    FROM {_brand_dim_name(audience)} AS K
+    WHERE K.KEYWORD IN ({_sql_string_list(all_keywords)})
+    GROUP BY K.MTID, K.STORE_ID_KEY, K.BRAND_ID_KEY
+  ) AS KM
+    ON KM.MTID = F.MTID
+   AND KM.STORE_ID_KEY = COALESCE(F.STORE_ID, -1)
+   AND KM.BRAND_ID_KEY = COALESCE(F.BRAND_ID, -1)"""
+
+
+# Keywords the DIM_BRAND_KEYWORD_MATCH build has seen (dbt seed brand_keywords)
+BRAND_KEYWORD_SEED_SQL = """
+SELECT DISTINCT UPPER(TRIM(KEYWORD)) AS KEYWORD
+FROM __FACT_DB__.__FACT_SCHEMA__.BRAND_KEYWORDS;
+"""
 
 
-# Main
-def main():
-    log.info("Loading config from %s", CONFIG_PATH)
-    audiences = load_audiences()
-    log.info("Starting validation for %d audience(s)...", len(audiences))
+def _ids_cover(audience: AudienceConfig, resolved: Optional[dict], fingerprint: Optional[list]) -> Optional[str]:
+    """Reason the brand_keyword_ids.json file can't serve the audience, or None if it can.
+
+    fingerprint is the fact table's current fact_fingerprint() (None if it
+    couldn't be read).
+    """
+    if resolved is None:
+        return f"{BRAND_KEYWORD_IDS_PATH.name} not found (run keyword_preview.py --emit-ids)"
+    if (resolved["fact_database"], resolved["fact_schema"]) != (audience.fact_database, audience.fact_schema):
+        return f"merchant keys were resolved from {resolved['fact_database']}.{resolved['fact_schema']}"
+    # Merchants loaded since the snapshot would be silently dropped
+    if resolved.get("fact_fingerprint") is None:
+        return "no fact fingerprint recorded (run keyword_preview.py --refresh --emit-ids)"
+    if fingerprint is None:
+        return "the fact table's fingerprint could not be read"
+    if resolved["fact_fingerprint"] != fingerprint:
+        return (f"fact table changed since the snapshot, {resolved['fact_fingerprint']} -> {fingerprint}; "
+                "run keyword_preview.py --refresh --emit-ids")
+    # Merchants first seen outside the snapshot window would be silently dropped
+    if audience.date_start < resolved["date_start"] or audience.date_end > resolved["date_end"]:
+        return (f"snapshot window {resolved['date_start']} to {resolved['date_end']} "
+                f"does not cover {audience.date_start} to {audience.date_end}")
+    missing = {kw.upper() for kw in audience.brand_keywords} - set(resolved["keywords"])
+    if missing:
+        return f"keywords {sorted(missing)} were not resolved"
+    return None
+
+
+def resolve_brand_match(
+    conn: snowflake.connector.SnowflakeConnection,
+    audiences: list[AudienceConfig],
+) -> list[AudienceConfig]:
+    """Downgrade brand_match='dim' / 'ids' audiences to 'like' when they can't be served.
+
+    'dim' needs every keyword in the brand_keywords seed the dimension was
+    built from; 'ids' needs every keyword in brand_keyword_ids.json, resolved
+    from the same fact table, unchanged since (fact_fingerprint), over a
+    window covering the audience's.
+    """
+    seeded: dict[tuple[str, str], set[str]] = {}
+    resolved = []
+    for aud in audiences:
+        if aud.brand_match == "ids":
+            try:
+                fingerprint = fact_fingerprint(conn, aud)
+            except Exception as exc:
+                log.warning("Fact fingerprint unavailable in %s.%s (%s)", aud.fact_database, aud.fact_schema, exc)
+                fingerprint = None
+            reason = _ids_cover(aud, load_brand_keyword_ids(), fingerprint)
+            if reason:
+                log.warning("Resolved merchant keys unusable for '%s' (%s); using LIKE filters",
+                            aud.name, reason)
+                aud = replace(aud, brand_match="like")
+            resolved.append(aud)
+            continue
+        if aud.brand_match != "dim":
+            resolved.append(aud)
+            continue
+        fact = (aud.fact_database, aud.fact_schema)
+        if fact not in seeded:
+            try:
+                df = _run_query(conn, _render_sql(BRAND_KEYWORD_SEED_SQL, aud), {})
+                seeded[fact] = set(df["KEYWORD"])
+            except Exception as exc:
+                log.warning("Brand keyword dimension unavailable in %s.%s (%s); using LIKE filters",
+                            *fact, exc)
+                seeded[fact] = set()
+        missing = {kw.upper() for kw in aud.brand_keywords} - seeded[fact]
+        if missing:
+            if seeded[fact]:
+                log.warning("Keywords %s are not in the brand_keywords seed; '%s' uses LIKE filters",
+                            sorted(missing), aud.name)
+            aud = replace(aud, brand_match="like")
+        resolved.append(aud)
+    return resolved
+
+
+def baseline_key(audience: AudienceConfig) -> tuple[str, ...]:
+    """Everything the BASELINE_ACTIVE / BASELINE_BRAND CTEs depend on."""
+    return (
+        audience.fact_database, audience.fact_schema,
+        audience.date_start, audience.date_end,
+        *_keyword_set_key(audience.brand_keywords),
+    )
+
+
+# Fact table fingerprint: MAX(TRANS_DATE) + row count, both answered from
+# Snowflake table metadata, so checking it never scans facts
+FACT_FINGERPRINT_TTL_SECONDS = 300
+_FACT_FINGERPRINTS: dict[tuple[str, str], tuple[float, list]] = {}
+_FACT_FINGERPRINTS_LOCK = threading.Lock()
+
+
+def fact_fingerprint(
+    conn: snowflake.connector.SnowflakeConnection,
+    audience: AudienceConfig,
+) -> list:
+    """Return [MAX(TRANS_DATE), row count] for the audience's fact table (memoised briefly)."""
+    fact = (audience.fact_database, audience.fact_schema)
+    with _FACT_FINGERPRINTS_LOCK:
+        cached = _FACT_FINGERPRINTS.get(fact)
+        if cached and time.time() - cached[0] < FACT_FINGERPRINT_TTL_SECONDS:
+            return cached[1]
+    df = _run_query(conn, _render_sql(FACT_FINGERPRINT_SQL, audience), {})
+    fingerprint = [str(df.iloc[0]["MAX_TRANS_DATE"]), int(df.iloc[0]["ROW_COUNT"])]
+    with _FACT_FINGERPRINTS_LOCK:
+        _FACT_FINGERPRINTS[fact] = (time.time(), fingerprint)
+    return fingerprint
+
+
+# Baseline cache
+BASELINE_CACHE_PATH = OUTPUT_DIR / "cache" / "baselines.json"
+BASELINE_CACHE_TTL_HOURS = 24 * 7
+BASELINE_CACHE_MAX_ENTRIES = 500
+
+
+class BaselineCache:
+    """Memo + on-disk store of general-population baseline metrics.
+
+    Entries are keyed on baseline_key() and stamped with the fact table's
+    fingerprint (MAX(TRANS_DATE), row count); an entry is only served while the
+    fingerprint still matches. Entries older than ttl_hours are dropped, and the
+    least recently used entries are evicted beyond max_entries.
+
+    With sketches=True, misses are first estimated from FACT_BRAND_DAY_SKETCH
+    (see sketch_baselines) and only the rest are computed from the detail
+    table. Estimated entries are marked approximate and are never served to a
+    cache opened without sketches.
+    """
+
+    def __init__(
+        self,
+        path: Path = BASELINE_CACHE_PATH,
+        ttl_hours: float = BASELINE_CACHE_TTL_HOURS,
+        max_entries: int = BASELINE_CACHE_MAX_ENTRIES,
+        sketches: bool = False,
+    ):
+        self.path = path
+        self.sketches = sketches
+        self.ttl_seconds = ttl_hours * 3600
+        self.max_entries = max_entries
+        self._memo: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._store = self._load()
+
+    @staticmethod
+    def _entry_key(key: tuple[str, ...]) -> str:
+        return json.dumps(list(key))
+
+    def _load(self) -> dict[str, dict]:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path) as f:
+                return json.load(f).get("entries", {})
+        except (OSError, ValueError) as exc:
+            log.warning("Ignoring unreadable baseline cache %s: %s", self.path, exc)
+            return {}
+
+    def _save(self) -> None:
+        now = time.time()
+        entries = {
+            k: v for k, v in self._store.items()
+            if now - v["created_at"] <= self.ttl_seconds
+        }
+        if len(entries) > self.max_entries:
+            keep = sorted(entries, key=lambda k: entries[k]["last_used"], reverse=True)
+            entries = {k: entries[k] for k in keep[:self.max_entries]}
+        self._store = entries
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"version": 1, "entries": entries}, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def _lookup(self, key: tuple[str, ...], fingerprint: list) -> Optional[dict]:
+        entry_key = self._entry_key(key)
+        source = "memory" if entry_key in self._memo else "disk"
+        entry = self._memo.get(entry_key) or self._store.get(entry_key)
+        if entry is None:
+            return None
+        if entry.get("approximate") and not self.sketches:
+            log.info("Baseline cache holds only a sketch estimate for %s; computing exactly", key)
+            return None
+        reason = None
+        if entry["fingerprint"] != fingerprint:
+            reason = "stale (fact data changed)"
+        elif time.time() - entry["created_at"] > self.ttl_seconds:
+            reason = "expired"
+        if reason:
+            log.info("Baseline cache %s for %s", reason, key)
+            self._memo.pop(entry_key, None)
+            self._store.pop(entry_key, None)
+            return None
+        entry["last_used"] = time.time()
+        self._memo[entry_key] = entry
+        log.info("Baseline cache hit (%s) for %s", source, key)
+        return entry["metrics"]
+
+    def resolve(
+        self,
+        conn: snowflake.connector.SnowflakeConnection,
+        audiences: list[AudienceConfig],
+        compute: bool = True,
+    ) -> dict[tuple[str, ...], dict]:
+        """Return baseline metrics for every audience, computing only the misses.
+
+        Misses that share a fact schema and window are computed together in one
+        BASELINE_SQL_TEMPLATE query (after sketch estimates, with sketches=True).
+        With compute=False only cache hits are returned and nothing is scanned.
+        """
+        with self._lock:
+            resolved: dict[tuple[str, ...], dict] = {}
+            missing: dict[tuple[str, ...], list[AudienceConfig]] = {}
+            fingerprints: dict[tuple[str, ...], list] = {}
+            seen: set[tuple[str, ...]] = set()
+
+            for aud in audiences:
+                key = baseline_key(aud)
+                if key in seen:
+                    continue
+                seen.add(key)
+                fingerprint = fact_fingerprint(conn, aud)
+                metrics = self._lookup(key, fingerprint)
+                if metrics is not None:
+                    resolved[key] = metrics
+                    continue
+                log.info("Baseline cache miss for %s", key)
+                missing.setdefault(key[:4], []).append(aud)
+                fingerprints[key[:4]] = fingerprint
+            if not compute:
+                return resolved
+
+            def _remember(key: tuple[str, ...], metrics: dict, approximate: bool) -> None:
+                now = time.time()
+                entry = {
+                    "fingerprint": fingerprints[key[:4]],
+                    "created_at": now,
+                    "last_used": now,
+                    "metrics": metrics,
+                }
+                if approximate:
+                    entry["approximate"] = True
+                self._memo[self._entry_key(key)] = entry
+                self._store[self._entry_key(key)] = entry
+                resolved[key] = metrics
+
+            if self.sketches and missing:
+                try:
+                    estimated = sketch_baselines(conn, [aud for auds in missing.values() for aud in auds])
+                except Exception as exc:
+                    log.warning("Sketch baselines failed (%s); computing from %s", exc, DETAIL_TABLE)
+                    estimated = {}
+                for key, metrics in estimated.items():
+                    _remember(key, metrics, approximate=True)
+                for window_key in list(missing):
+                    missing[window_key] = [aud for aud in missing[window_key] if baseline_key(aud) not in estimated]
+                    if not missing[window_key]:
+                        del missing[window_key]
+
+            for window_key, window_audiences in missing.items():
+                for key, metrics in compute_baselines(conn, window_audiences).items():
+                    _remember(key, metrics, approximate=False)
+
+            if missing or resolved:
+                try:
+                    self._save()
+                except OSError as exc:
+                    log.warning("Could not write baseline cache %s: %s", self.path, exc)
+            return resolved
+
+
+def compute_baselines(
+    conn: snowflake.connector.SnowflakeConnection,
+    audiences: list[AudienceConfig],
+) -> dict[tuple[str, ...], dict]:
+    """Compute baseline metrics for audiences sharing a fact schema and window in one scan."""
+    first = audiences[0]
+    if any(aud.brand_match != first.brand_match for aud in audiences):
+        first = replace(first, brand_match="like")
+    keyword_sets: dict[tuple[str, ...], int] = {}
+    for aud in audiences:
+        keyword_sets.setdefault(_keyword_set_key(aud.brand_keywords), len(keyword_sets))
+
+    baseline_selects = "\n  UNION ALL\n  ".join(
+        BASELINE_BRAND_SELECT_TEMPLATE.replace("__KEYWORD_SET__", str(ks))
+        for ks in keyword_sets.values()
+    )
+    sql = (
+        _render_sql(BASELINE_SQL_TEMPLATE, first)
+        .replace("__BASELINE_CTES__", BATCH_BASELINE_CTES_SQL)
+        .replace("__BASELINE_BRAND_SELECTS__", baseline_selects)
+        .replace("__KEYWORD_FLAGS__", _keyword_flags(keyword_sets, first))
+        .replace("__KEYWORD_JOIN__", _keyword_join(keyword_sets, first))
+    )
+    log.info("Computing baselines for %d keyword set(s) over %s to %s",
+             len(keyword_sets), first.date_start, first.date_end)
+    df = _run_query(conn, sql, {"date_start": first.date_start, "date_end": first.date_end},
+                    kind="baseline", audiences=[aud.name for aud in audiences])
+
+    by_set = {int(row["KEYWORD_SET"]): row for _, row in df.iterrows()}
+    baselines: dict[tuple[str, ...], dict] = {}
+    for keywords, ks in keyword_sets.items():
+        row = by_set[ks]
+        key = (first.fact_database, first.fact_schema, first.date_start, first.date_end, *keywords)
+        baselines[key] = {
+            "baseline_active_ids": int(row["BASELINE_ACTIVE_IDS"]),
+            "baseline_brand_shoppers": int(row["BASELINE_BRAND_SHOPPERS"]),
+            "baseline_brand_transactions": int(row["BASELINE_BRAND_TRANSACTIONS"]),
+            "baseline_brand_spend": float(row["BASELINE_BRAND_SPEND"]),
+        }
+    return baselines
+
+
+# Result store
+RESULT_STORE_PATH = OUTPUT_DIR / "cache" / "results.sqlite"
+
+AUDIENCE_VERSIONS_SQL = """
+SELECT audience_id AS AUDIENCE_ID, MAX(ver) AS VER
+FROM __DB__.__SCHEMA__.AUDIENCE_METADATA
+WHERE audience_id IN (__AUDIENCE_IDS__)
+GROUP BY audience_id;
+"""
+
+
+def _json_scalar(value):
+    """json.dumps default= hook for numpy / Decimal values in result rows."""
+    if hasattr(value, "item"):
+        return value.item()
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+class ResultStore:
+    """SQLite store (plus in-memory memo) of validation result rows, so unchanged audiences aren't re-run.
+
+    A stored row is reused only while its result key matches: audience_id,
+    MAX(ver) from AUDIENCE_METADATA, a hash of the brand keywords / match mode
+    and source tables, the holdout window, and the fact table fingerprint.
+    Only the latest row per audience / keywords / window is kept.
+    """
+
+    def __init__(self, path: Path = RESULT_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._memo: dict[str, tuple[dict, pd.DataFrame]] = {}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as db:
+            db.execute(
+                """CREATE TABLE IF NOT EXISTS results (
+                    result_key     TEXT PRIMARY KEY,
+                    audience_id    TEXT NOT NULL,
+                    ver            TEXT,
+                    keyword_hash   TEXT NOT NULL,
+                    date_start     TEXT NOT NULL,
+                    date_end       TEXT NOT NULL,
+                    fact_watermark TEXT NOT NULL,
+                    computed_at    REAL NOT NULL,
+                    result_row     TEXT NOT NULL
+                )"""
+            )
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    @staticmethod
+    def keyword_hash(audience: AudienceConfig) -> str:
+        spec = [
+            list(_keyword_set_key(audience.brand_keywords)), audience.brand_match,
+            audience.database, audience.schema, audience.fact_database, audience.fact_schema,
+        ]
+        return hashlib.sha1(json.dumps(spec).encode()).hexdigest()
+
+    def result_keys(
+        self,
+        conn: snowflake.connector.SnowflakeConnection,
+        audiences: list[AudienceConfig],
+    ) -> list[Optional[dict]]:
+        """Build each audience's result key from metadata only (versions + fact fingerprint).
+
+        Audiences missing from AUDIENCE_METADATA get None and are always re-run.
+        """
+        versions: dict[tuple[str, str], dict[str, str]] = {}
+        for aud in audiences:
+            source = (aud.database, aud.schema)
+            if source in versions:
+                continue
+            ids = sorted({a.audience_id for a in audiences if (a.database, a.schema) == source})
+            placeholders = ", ".join(f"%(aud_{i})s" for i in range(len(ids)))
+            df = _run_query(
+                conn,
+                _render_sql(AUDIENCE_VERSIONS_SQL, aud).replace("__AUDIENCE_IDS__", placeholders),
+                {f"aud_{i}": audience_id for i, audience_id in enumerate(ids)},
+            )
+            versions[source] = {row["AUDIENCE_ID"]: str(row["VER"]) for _, row in df.iterrows()}
+
+        keys: list[Optional[dict]] = []
+        for aud in audiences:
+            ver = versions[(aud.database, aud.schema)].get(aud.audience_id)
+            if ver is None:
+                keys.append(None)
+                continue
+            parts = {
+                "audience_id": aud.audience_id,
+                "ver": ver,
+                "keyword_hash": self.keyword_hash(aud),
+                "date_start": aud.date_start,
+                "date_end": aud.date_end,
+                "fact_watermark": json.dumps(fact_fingerprint(conn, aud)),
+            }
+            parts["result_key"] = hashlib.sha1(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+            keys.append(parts)
+        return keys
+
+    def get(self, key: dict, audience: AudienceConfig) -> Optional[pd.DataFrame]:
+        """Return the stored one-row result for key, relabelled with the audience's current name."""
+        with self._lock:
+            memo = self._memo.get(key["result_key"])
+            if memo is not None:
+                df = memo[1].copy()
+            else:
+                with self._connect() as db:
+                    row = db.execute(
+                        "SELECT result_row FROM results WHERE result_key = ?", (key["result_key"],)
+                    ).fetchone()
+                if row is None:
+                    return None
+                stored = json.loads(row[0])
+                df = pd.DataFrame([stored["values"]], columns=stored["columns"])
+                self._memo[key["result_key"]] = (key, df.copy())
+        if "AUDIENCE_NAME" in df.columns:
+            df["AUDIENCE_NAME"] = audience.name
+        return df
+
+    def put(self, key: dict, df: pd.DataFrame) -> None:
+        """Store a one-row result, replacing older results for the same audience / keywords / window."""
+        payload = json.dumps(
+            {"columns": list(df.columns), "values": df.iloc[0].tolist()}, default=_json_scalar
+        )
+        with self._lock, self._connect() as db:
+            db.execute(
+                "DELETE FROM results WHERE audience_id = ? AND keyword_hash = ? "
+                "AND date_start = ? AND date_end = ?",
+                (key["audience_id"], key["keyword_hash"], key["date_start"], key["date_end"]),
+            )
+            db.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key["result_key"], key["audience_id"], key["ver"], key["keyword_hash"],
+                 key["date_start"], key["date_end"], key["fact_watermark"], time.time(), payload),
+            )
+            same_slot = ("audience_id", "keyword_hash", "date_start", "date_end")
+            for result_key, (memo_key, _) in list(self._memo.items()):
+                if all(memo_key[k] == key[k] for k in same_slot):
+                    del self._memo[result_key]
+            self._memo[key["result_key"]] = (key, df.iloc[[0]].reset_index(drop=True).copy())
+
+
+# Approximate preview
+HLL_RELATIVE_ERROR = 0.0162338   # Snowflake APPROX_COUNT_DISTINCT average relative error
+ERROR_Z = 1.96                   # *_ERR columns are ~95% relative bounds
+SAMPLE_BUCKETS = 10_000          # AKKIO_ID hash buckets for --sample-pct
+
+# Metrics measured on the sampled fact rows, scaled back up by 100 / sample_pct
+SAMPLED_COLS = [
+    "ACTIVE_MATCHED_IDS", "BRAND_SHOPPERS", "BRAND_TRANSACTIONS", "BRAND_SPEND",
+    "BASELINE_ACTIVE_IDS", "BASELINE_BRAND_SHOPPERS",
+]
+
+SAMPLED_FACT_SQL = """(
+    SELECT *
+    FROM __FACT_DB__.__FACT_SCHEMA__.FACT_TRANSACTION_ENRICHED__BLOCK_SAMPLE__
+    WHERE ABS(MOD(HASH(AKKIO_ID), __SAMPLE_BUCKETS__)) < %(sample_buckets)s
+  ) AS F"""
+
+
+@dataclass(frozen=True)
+class ApproxSettings:
+    """Fast-preview mode: HLL distinct counts, optionally on a sample of AKKIO_IDs and/or micro-partitions."""
+
+    sample_pct: Optional[float] = None   # percent of AKKIO_IDs kept; None = every ID
+    block_pct: Optional[float] = None    # percent of micro-partitions read (SAMPLE BLOCK); None = all
+
+    @property
+    def fraction(self) -> float:
+        return (self.sample_pct or 100.0) / 100 * (self.block_pct or 100.0) / 100
+
+
+def _approximate_sql(template: str, approx: ApproxSettings) -> str:
+    """Rewrite a validation template for approx mode (before _render_sql).
+
+    Every COUNT(DISTINCT ...) becomes APPROX_COUNT_DISTINCT. With a sample,
+    fact scans keep only AKKIO_IDs in the first sample_pct of hash buckets, so
+    an ID is either fully in (all its transactions) or out. Thinning IDs rather
+    than blocks of rows keeps distinct counts, sums and rates unbiased after
+    scaling, and the filter drops rows before the audience join and the
+    distinct aggregation. It cannot prune micro-partitions, though: every
+    partition of the window is still read, so it saves aggregation work, not I/O.
+
+    block_pct adds SAMPLE BLOCK to every fact scan, which reads only about
+    that percent of micro-partitions and so does cut bytes scanned. Sums
+    and transaction counts stay unbiased after scaling; distinct counts do
+    not, since an ID with transactions in several partitions is more likely
+    to be seen than block_pct, so scaled ID and shopper counts run high.
+    """
+    sql = template.replace("COUNT(DISTINCT ", "APPROX_COUNT_DISTINCT(")
+    block_sample = f" SAMPLE BLOCK ({approx.block_pct:g})" if approx.block_pct else ""
+    if approx.sample_pct:
+        sql = sql.replace(
+            "__FACT_DB__.__FACT_SCHEMA__.FACT_TRANSACTION_ENRICHED AS F",
+            SAMPLED_FACT_SQL.replace("__SAMPLE_BUCKETS__", str(SAMPLE_BUCKETS))
+            .replace("__BLOCK_SAMPLE__", block_sample),
+        )
+    elif block_sample:
+        sql = sql.replace(
+            "__FACT_DB__.__FACT_SCHEMA__.FACT_TRANSACTION_ENRICHED AS F",
+            "__FACT_DB__.__FACT_SCHEMA__.FACT_TRANSACTION_ENRICHED AS F" + block_sample,
+        )
+    return sql
+
+
+def _approx_params(approx: ApproxSettings) -> dict:
+    if not approx.sample_pct:
+        return {}
+    return {"sample_buckets": max(1, round(approx.sample_pct / 100 * SAMPLE_BUCKETS))}
+
+
+def approx_error_bounds(df: pd.DataFrame, approx: ApproxSettings) -> pd.DataFrame:
+    """Scale sampled metrics back to the full population and add <METRIC>_ERR columns.
+
+    *_ERR is an estimated ~95% relative error bound (0.05 = ±5%), combining the
+    HLL error of every approximate distinct count with the sampling error of
+    the IDs behind the metric (binomial, with finite-population correction).
+    Components are combined in quadrature, ignoring covariance, so ratio
+    bounds are conservative. Block samples (block_pct) are treated as if they
+    thinned IDs, so their bounds understate the error of distinct counts (see
+    _approximate_sql).
+    """
+    df = df.copy()
+    p = approx.fraction
+    for col in SAMPLED_COLS:
+        df[col] = df[col].astype(float) / p
+
+    def sampling_var(ids: pd.Series) -> np.ndarray:
+        """Relative variance from sampling, driven by the sampled IDs behind a metric."""
+        sampled = ids.astype(float).to_numpy() * p
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(sampled > 0, (1 - p) / sampled, np.nan) if p < 1 else np.zeros(len(ids))
+
+    h2 = HLL_RELATIVE_ERROR ** 2
+    shoppers = sampling_var(df["BRAND_SHOPPERS"])
+    active = sampling_var(df["ACTIVE_MATCHED_IDS"])
+    baseline_shoppers = sampling_var(df["BASELINE_BRAND_SHOPPERS"])
+    baseline_active = sampling_var(df["BASELINE_ACTIVE_IDS"])
+    shop_rate = df["SHOP_RATE"].astype(float).to_numpy()
+    baseline_shop_rate = df["BASELINE_SHOP_RATE"].astype(float).to_numpy()
+
+    variances = {
+        "TOTAL_LAL_IDS": np.full(len(df), h2),
+        "ACTIVE_MATCHED_IDS": h2 + active,
+        "BRAND_SHOPPERS": h2 + shoppers,
+        "BRAND_TRANSACTIONS": shoppers,
+        "BRAND_SPEND": shoppers,
+        "SHOP_RATE": 2 * h2 + (1 - shop_rate) * shoppers,
+        "SPEND_RATE": h2 + shoppers,
+        "AVERAGE_TICKET": shoppers,
+        "AVG_TRANSACTIONS_PER_SHOPPER": h2 + shoppers,
+        "BASELINE_ACTIVE_IDS": h2 + baseline_active,
+        "BASELINE_BRAND_SHOPPERS": h2 + baseline_shoppers,
+        "BASELINE_SHOP_RATE": 2 * h2 + (1 - baseline_shop_rate) * baseline_shoppers,
+        "BASELINE_SPEND_RATE": h2 + baseline_shoppers,
+    }
+    variances["SHOP_RATE_LIFT"] = variances["SHOP_RATE"] + variances["BASELINE_SHOP_RATE"]
+    variances["SPEND_RATE_LIFT"] = variances["SPEND_RATE"] + variances["BASELINE_SPEND_RATE"]
+
+    for col, var in variances.items():
+        if col in df.columns:
+            df[f"{col}_ERR"] = ERROR_Z * np.sqrt(var)
+    return df
+
+
+def _validation_query(
+    audience: AudienceConfig,
+    baseline: Optional[dict] = None,
+    approx: Optional[ApproxSettings] = None,
+) -> tuple[str, dict]:
+    """Rendered VALIDATION_SQL_TEMPLATE and bind parameters for validate_audience."""
+    if approx:
+        baseline = None
+    brand_filter = _brand_filter(audience)
+    template = VALIDATION_SQL_TEMPLATE.replace(
+        "__BASELINE_CTES__", CACHED_BASELINE_CTES_SQL if baseline else BASELINE_CTES_SQL
+    )
+    if approx:
+        template = _approximate_sql(template, approx)
+    sql = (
+        _render_sql(template, audience)
+        .replace("__BRAND_FILTER__", brand_filter)
+    )
+    bind_params = {
+        "audience_id": audience.audience_id,
+        "audience_name": audience.name,
+        "date_start": audience.date_start,
+        "date_end": audience.date_end,
+        **(baseline or {}),
+        **(_approx_params(approx) if approx else {}),
+    }
+    return sql, bind_params
+
+
+def validate_audience(
+    conn: snowflake.connector.SnowflakeConnection,
+    audience: AudienceConfig,
+    baseline: Optional[dict] = None,
+    timeout: Optional[int] = None,
+    approx: Optional[ApproxSettings] = None,
+) -> pd.DataFrame:
+    """Run the validation query for a single audience and return a one-row DataFrame.
+
+    If baseline metrics are supplied (see BaselineCache), they are bound into
+    the query instead of being recomputed from the fact table. With approx,
+    the query is rewritten by _approximate_sql (baseline included, so any
+    supplied baseline is ignored) and *_ERR columns are added.
+    """
+    sql, bind_params = _validation_query(audience, baseline, approx)
+
+    log.info("Validating audience: %s  [%s]", audience.name, audience.audience_id)
+    log.info("  Brand keywords: %s (%s) | Date range: %s to %s",
+             audience.brand_keywords, audience.brand_match, audience.date_start, audience.date_end)
+
+    df = _run_query(conn, sql, bind_params, timeout=timeout, kind="validation", audiences=[audience.name])
+    if approx:
+        df = approx_error_bounds(df, approx)
+
+    log.info("  -> %d row(s) returned", len(df))
+    return df
+
+
+def group_audiences(
+    indexed: list[tuple[int, AudienceConfig]],
+) -> dict[tuple[str, ...], list[tuple[int, AudienceConfig]]]:
+    """Group (config position, audience) pairs by batch key."""
+    groups: dict[tuple[str, ...], list[tuple[int, AudienceConfig]]] = {}
+    for idx, aud in indexed:
+        groups.setdefault(_batch_key(aud), []).append((idx, aud))
+    return groups
+
+
+def _batch_query(
+    audiences: list[AudienceConfig],
+    baselines: Optional[dict[tuple[str, ...], dict]] = None,
+    approx: Optional[ApproxSettings] = None,
+) -> tuple[str, dict, int]:
+    """Rendered BATCH_VALIDATION_SQL_TEMPLATE, bind parameters and keyword set count for validate_batch."""
+    if approx:
+        baselines = None
+    first = audiences[0]
+    if any(_batch_key(aud) != _batch_key(first) for aud in audiences):
+        raise ValueError("validate_batch requires audiences with a common fact schema and date window")
+
+    keyword_sets: dict[tuple[str, ...], int] = {}
+    for aud in audiences:
+        keyword_sets.setdefault(_keyword_set_key(aud.brand_keywords), len(keyword_sets))
+
+    bind_params: dict = {
+        "date_start": first.date_start,
+        "date_end": first.date_end,
+    }
+    audience_rows = []
+    for i, aud in enumerate(audiences):
+        ks = keyword_sets[_keyword_set_key(aud.brand_keywords)]
+        bind_params[f"aud_{i}_id"] = aud.audience_id
+        bind_params[f"aud_{i}_name"] = aud.name
+        audience_rows.append(
+            f"SELECT {i} AS AUDIENCE_ORDINAL, %(aud_{i}_id)s AS AUDIENCE_ID, "
+            f"%(aud_{i}_name)s AS AUDIENCE_NAME, {ks} AS KEYWORD_SET"
+        )
+
+    brand_flag_cases = " ".join(f"WHEN {ks} THEN F.KS_{ks}" for ks in keyword_sets.values())
+
+    cached = {}
+    if baselines:
+        for aud in audiences:
+            if baseline_key(aud) in baselines:
+                cached[keyword_sets[_keyword_set_key(aud.brand_keywords)]] = baselines[baseline_key(aud)]
+    if len(cached) == len(keyword_sets):
+        brand_rows = []
+        for ks, metrics in cached.items():
+            brand_rows.append(
+                f"SELECT {ks} AS KEYWORD_SET, "
+                f"%(ks_{ks}_shoppers)s AS BASELINE_BRAND_SHOPPERS, "
+                f"%(ks_{ks}_transactions)s AS BASELINE_BRAND_TRANSACTIONS, "
+                f"%(ks_{ks}_spend)s AS BASELINE_BRAND_SPEND"
+            )
+            bind_params[f"ks_{ks}_shoppers"] = metrics["baseline_brand_shoppers"]
+            bind_params[f"ks_{ks}_transactions"] = metrics["baseline_brand_transactions"]
+            bind_params[f"ks_{ks}_spend"] = metrics["baseline_brand_spend"]
+        bind_params["baseline_active_ids"] = next(iter(cached.values()))["baseline_active_ids"]
+        baseline_ctes = BATCH_CACHED_BASELINE_CTES_SQL.replace(
+            "__BASELINE_BRAND_ROWS__", "\n  UNION ALL\n  ".join(brand_rows)
+        )
+    else:
+        baseline_ctes = BATCH_BASELINE_CTES_SQL.replace(
+            "__BASELINE_BRAND_SELECTS__",
+            "\n  UNION ALL\n  ".join(
+                BASELINE_BRAND_SELECT_TEMPLATE.replace("__KEYWORD_SET__", str(ks))
+                for ks in keyword_sets.values()
+            ),
+        )
+
+    template = BATCH_VALIDATION_SQL_TEMPLATE
+    if approx:
+        template = _approximate_sql(template.replace("__BASELINE_CTES__", baseline_ctes), approx)
+        bind_params.update(_approx_params(approx))
+    sql = (
+        _render_sql(template, first)
+        .replace("__AUDIENCE_ROWS__", "\n  UNION ALL\n  ".join(audience_rows))
+        .replace("__KEYWORD_FLAGS__", _keyword_flags(keyword_sets, first))
+        .replace("__KEYWORD_JOIN__", _keyword_join(keyword_sets, first))
+        .replace("__BASELINE_CTES__", baseline_ctes)
+        .replace("__BRAND_FLAG__", f"(CASE A.KEYWORD_SET {brand_flag_cases} END)")
+    )
+    return sql, bind_params, len(keyword_sets)
+
+
+def validate_batch(
+    conn: snowflake.connector.SnowflakeConnection,
+    audiences: list[AudienceConfig],
+    baselines: Optional[dict[tuple[str, ...], dict]] = None,
+    timeout: Optional[int] = None,
+    approx: Optional[ApproxSettings] = None,
+) -> pd.DataFrame:
+    """Validate audiences that share a batch key in one query.
+
+    Returns one row per audience, in input order, with the same columns as
+    validate_audience. Baselines are bound from `baselines` when every keyword
+    set in the batch is present there (never with approx, as in validate_audience).
+    """
+    first = audiences[0]
+    sql, bind_params, keyword_set_count = _batch_query(audiences, baselines, approx)
+
+    log.info("Validating batch of %d audience(s) over %s to %s (%d keyword set(s))",
+             len(audiences), first.date_start, first.date_end, keyword_set_count)
+    for aud in audiences:
+        log.info("  - %s  [%s]", aud.name, aud.audience_id)
+
+    df = _run_query(conn, sql, bind_params, timeout=timeout,
+                    kind="batch", audiences=[aud.name for aud in audiences])
+
+    if len(df) != len(audiences):
+        raise RuntimeError(f"Batch returned {len(df)} row(s) for {len(audiences)} audience(s)")
+    if approx:
+        df = approx_error_bounds(df, approx)
+
+    log.info("  -> %d row(s) returned", len(df))
+    return df
+
+
+# Monthly pre-aggregate routing (models/afs/fact_brand_month_summary.sql)
+DETAIL_TABLE = "FACT_TRANSACTION_ENRICHED"
+MONTHLY_TABLE = "FACT_BRAND_MONTH_SUMMARY"
+
+# Brands each keyword resolves to; BRAND_LEVEL = 1 when every match of the
+# keyword on that brand is on the brand name (so all of the brand's rows match)
+BRAND_ROUTE_SQL = """
+SELECT
+  KEYWORD,
+  BRAND_ID,
+  MIN(CASE WHEN MATCHED_BRAND_NAME THEN 1 ELSE 0 END) AS BRAND_LEVEL
+FROM __FACT_DB__.__FACT_SCHEMA__.DIM_BRAND_KEYWORD_MATCH
+WHERE KEYWORD IN (__KEYWORDS__)
+GROUP BY KEYWORD, BRAND_ID;
+"""
+
+MONTHLY_WATERMARK_SQL = """
+SELECT
+  MAX(LAST_TRANS_DATE)   AS LAST_TRANS_DATE,
+  SUM(TRANSACTION_COUNT) AS ROW_COUNT
+FROM __FACT_DB__.__FACT_SCHEMA__.FACT_BRAND_MONTH_SUMMARY;
+"""
+
+# Same CTE names as VALIDATION_SQL_TEMPLATE, read from the monthly
+# pre-aggregate; the baseline placeholder and final SELECT are shared with it,
+# so output columns and formulas match exactly.
+MONTHLY_VALIDATION_SQL_TEMPLATE = """
+WITH AUDIENCE AS (
+  SELECT AKKIO_ID
+  FROM __DB__.__SCHEMA__.AUDIENCE_LOOKUP
+  WHERE audience_id = %(audience_id)s
+    AND ver = (
+      SELECT MAX(ver)
+      FROM __DB__.__SCHEMA__.AUDIENCE_METADATA
+      WHERE audience_id = %(audience_id)s
+    )
+),
+TOTAL_LAL AS (
+  SELECT COUNT(DISTINCT AKKIO_ID) AS TOTAL_LAL_IDS
+  FROM AUDIENCE
+),
+WINDOW_MONTHS AS (
+  SELECT
+    S.AKKIO_ID,
+    S.TRANSACTION_COUNT,
+    S.TOTAL_SPEND,
+    CASE WHEN S.BRAND_ID_KEY IN (__BRAND_IDS__) THEN 1 ELSE 0 END AS IS_BRAND
+  FROM __FACT_DB__.__FACT_SCHEMA__.FACT_BRAND_MONTH_SUMMARY AS S
+  WHERE S.TRANS_MONTH >= %(date_start)s
+    AND S.TRANS_MONTH <  %(date_end)s
+),
+ACTIVE_MATCHED AS (
+  SELECT COUNT(DISTINCT A.AKKIO_ID) AS ACTIVE_MATCHED_IDS
+  FROM AUDIENCE AS A
+  INNER JOIN WINDOW_MONTHS AS F
+    ON A.AKKIO_ID = F.AKKIO_ID
+),
+BRAND_METRICS AS (
+  SELECT
+    COUNT(DISTINCT A.AKKIO_ID)            AS BRAND_SHOPPERS,
+    COALESCE(SUM(F.TRANSACTION_COUNT), 0) AS BRAND_TRANSACTIONS,
+    COALESCE(SUM(F.TOTAL_SPEND), 0)       AS BRAND_SPEND
+  FROM AUDIENCE AS A
+  INNER JOIN WINDOW_MONTHS AS F
+    ON A.AKKIO_ID = F.AKKIO_ID
+  WHERE F.IS_BRAND = 1
+),
+""" + VALIDATION_SQL_TEMPLATE[VALIDATION_SQL_TEMPLATE.index("__BASELINE_CTES__"):]
+
+MONTHLY_BASELINE_CTES_SQL = """BASELINE_ACTIVE AS (
+  SELECT COUNT(DISTINCT AKKIO_ID) AS BASELINE_ACTIVE_IDS
+  FROM WINDOW_MONTHS
+),
+BASELINE_BRAND AS (
+  SELECT
+    COUNT(DISTINCT CASE WHEN IS_BRAND = 1 THEN AKKIO_ID END)          AS BASELINE_BRAND_SHOPPERS,
+    COALESCE(SUM(CASE WHEN IS_BRAND = 1 THEN TRANSACTION_COUNT END), 0) AS BASELINE_BRAND_TRANSACTIONS,
+    COALESCE(SUM(CASE WHEN IS_BRAND = 1 THEN TOTAL_SPEND END), 0)       AS BASELINE_BRAND_SPEND
+  FROM WINDOW_MONTHS
+)"""
+
+
+def _is_month_start(value) -> bool:
+    return str(value)[8:10] == "01"
+
+
+def _whole_brand_ids(
+    conn: snowflake.connector.SnowflakeConnection,
+    audience: AudienceConfig,
+    known: dict[tuple[str, str], dict[str, Optional[set]]],
+) -> tuple[Optional[list[int]], Optional[str]]:
+    """Return (brand_ids, None) if every keyword resolves to whole brands, else (None, reason).
+
+    A keyword qualifies when DIM_BRAND_KEYWORD_MATCH has it and all of its
+    matches are brand-name matches on tagged merchants, so filtering on the
+    brand_ids selects exactly the fact rows the LIKE filter would. known
+    memoises keyword lookups per fact schema across calls.
+    """
+    fact = (audience.fact_database, audience.fact_schema)
+    keywords = sorted({kw.upper() for kw in audience.brand_keywords})
+    resolved = known.setdefault(fact, {})
+    unknown = [kw for kw in keywords if kw not in resolved]
+    if unknown:
+        sql = _render_sql(BRAND_ROUTE_SQL, audience).replace("__KEYWORDS__", _sql_string_list(unknown))
+        try:
+            df = _run_query(conn, sql, {})
+        except Exception as exc:
+            log.warning("Brand keyword dimension unavailable in %s.%s (%s)", *fact, exc)
+            df = pd.DataFrame(columns=["KEYWORD", "BRAND_ID", "BRAND_LEVEL"])
+        for kw in unknown:
+            rows = df[df["KEYWORD"] == kw]
+            whole_brands = not rows.empty and rows["BRAND_ID"].notna().all() and (rows["BRAND_LEVEL"] == 1).all()
+            resolved[kw] = {int(b) for b in rows["BRAND_ID"]} if whole_brands else None
+    partial = [kw for kw in keywords if resolved[kw] is None]
+    if partial:
+        return None, f"keyword(s) {partial} do not resolve to whole brands"
+    return sorted(set().union(*(resolved[kw] for kw in keywords))), None
+
+
+def _built_through(
+    conn: snowflake.connector.SnowflakeConnection,
+    audience: AudienceConfig,
+    watermark_sql: str,
+    table: str,
+) -> Optional[str]:
+    """Reason a pre-aggregate lags the audience's fact table, or None if it matches its fact_fingerprint.
+
+    watermark_sql returns the pre-aggregate's latest day and the detail rows
+    it counts, compared with the fact table's MAX(TRANS_DATE) and row count,
+    so a restated older day shows up even when the latest day has not moved.
+    """
+    try:
+        df = _run_query(conn, _render_sql(watermark_sql, audience), {})
+        latest = fact_fingerprint(conn, audience)
+    except Exception as exc:
+        return f"{table} unavailable ({exc})"
+    built, rows = df.iloc[0]["LAST_TRANS_DATE"], df.iloc[0]["ROW_COUNT"]
+    if pd.isna(built) or pd.isna(rows):
+        return f"{table} is empty"
+    if [str(built), int(rows)] == latest:
+        return None
+    return f"{table} is built to {built} ({int(rows)} rows), fact data to {latest[0]} ({latest[1]} rows)"
+
+
+def resolve_monthly_routes(
+    conn: snowflake.connector.SnowflakeConnection,
+    indexed: list[tuple[int, AudienceConfig]],
+) -> dict[int, list[int]]:
+    """Pick the audiences FACT_BRAND_MONTH_SUMMARY can serve exactly; returns {position: brand_ids}.
+
+    An audience is routed when its window starts and ends on the 1st of a
+    month, its keywords resolve to whole brands (see _whole_brand_ids), and
+    the pre-aggregate matches the fact table's fact_fingerprint (see
+    _built_through). The path chosen for each audience is logged.
+    """
+    routes: dict[int, list[int]] = {}
+    known: dict[tuple[str, str], dict[str, Optional[set]]] = {}
+    fresh: dict[tuple[str, str], Optional[str]] = {}
+
+    for idx, aud in indexed:
+        fact = (aud.fact_database, aud.fact_schema)
+        brand_ids, reason = None, None
+        if not (_is_month_start(aud.date_start) and _is_month_start(aud.date_end)):
+            reason = "window is not month-aligned"
+        if reason is None:
+            brand_ids, reason = _whole_brand_ids(conn, aud, known)
+        if reason is None:
+            if fact not in fresh:
+                fresh[fact] = _built_through(conn, aud, MONTHLY_WATERMARK_SQL, MONTHLY_TABLE)
+            reason = fresh[fact]
+
+        if reason:
+            log.info("Route: '%s' -> %s (%s)", aud.name, DETAIL_TABLE, reason)
+        else:
+            routes[idx] = brand_ids
+            log.info("Route: '%s' -> %s (%d brand_id(s))", aud.name, MONTHLY_TABLE, len(brand_ids))
+    return routes
+
+
+def _monthly_query(
+    audience: AudienceConfig,
+    brand_ids: list[int],
+    baseline: Optional[dict] = None,
+) -> tuple[str, dict]:
+    """Rendered MONTHLY_VALIDATION_SQL_TEMPLATE and bind parameters for validate_audience_monthly."""
+    template = MONTHLY_VALIDATION_SQL_TEMPLATE.replace(
+        "__BASELINE_CTES__", CACHED_BASELINE_CTES_SQL if baseline else MONTHLY_BASELINE_CTES_SQL
+    )
+    sql = (
+        _render_sql(template, audience)
+        .replace("__BRAND_IDS__", ", ".join(str(b) for b in brand_ids) or "NULL")
+    )
+    bind_params = {
+        "audience_id": audience.audience_id,
+        "audience_name": audience.name,
+        "date_start": audience.date_start,
+        "date_end": audience.date_end,
+        **(baseline or {}),
+    }
+    return sql, bind_params
+
+
+def validate_audience_monthly(
+    conn: snowflake.connector.SnowflakeConnection,
+    audience: AudienceConfig,
+    brand_ids: list[int],
+    baseline: Optional[dict] = None,
+    timeout: Optional[int] = None,
+) -> pd.DataFrame:
+    """validate_audience against FACT_BRAND_MONTH_SUMMARY, filtering on brand_ids instead of keywords.
+
+    Only valid for audiences resolve_monthly_routes() routed.
+    """
+    sql, bind_params = _monthly_query(audience, brand_ids, baseline)
+
+    log.info("Validating audience: %s  [%s] via %s", audience.name, audience.audience_id, MONTHLY_TABLE)
+    log.info("  Brand keywords: %s (%d brand_id(s)) | Date range: %s to %s",
+             audience.brand_keywords, len(brand_ids), audience.date_start, audience.date_end)
+
+    df = _run_query(conn, sql, bind_params, timeout=timeout, kind="validation", audiences=[audience.name])
+
+    log.info("  -> %d row(s) returned", len(df))
+    return df
+
+
+# Daily HLL sketches (models/afs/fact_brand_day_sketch.sql)
+SKETCH_TABLE = "FACT_BRAND_DAY_SKETCH"
+
+SKETCH_WATERMARK_SQL = """
+SELECT
+  MAX(TRANS_DATE)        AS LAST_TRANS_DATE,
+  SUM(TRANSACTION_COUNT) AS ROW_COUNT
+FROM __FACT_DB__.__FACT_SCHEMA__.FACT_BRAND_DAY_SKETCH
+WHERE SKETCH_SCOPE = 'ALL';
+"""
+
+# Same output columns as BASELINE_SQL_TEMPLATE; distinct counts are HLL
+# estimates merged from the daily sketches, transactions and spend are exact
+SKETCH_BASELINE_SQL_TEMPLATE = """
+WITH WINDOW_SKETCHES AS (
+  SELECT
+    SKETCH_SCOPE,
+    BRAND_ID_KEY,
+    AKKIO_ID_SKETCH,
+    TRANSACTION_COUNT,
+    TOTAL_SPEND
+  FROM __FACT_DB__.__FACT_SCHEMA__.FACT_BRAND_DAY_SKETCH
+  WHERE TRANS_DATE >= %(date_start)s
+    AND TRANS_DATE <  %(date_end)s
+),
+BASELINE_ACTIVE AS (
+  SELECT COALESCE(HLL_ESTIMATE(HLL_COMBINE(AKKIO_ID_SKETCH)), 0) AS BASELINE_ACTIVE_IDS
+  FROM WINDOW_SKETCHES
+  WHERE SKETCH_SCOPE = 'ALL'
+),
+BASELINE_BRAND AS (
+  __BASELINE_BRAND_SELECTS__
+)
+SELECT
+  BB.KEYWORD_SET,
+  BA.BASELINE_ACTIVE_IDS,
+  BB.BASELINE_BRAND_SHOPPERS,
+  BB.BASELINE_BRAND_TRANSACTIONS,
+  BB.BASELINE_BRAND_SPEND
+FROM BASELINE_BRAND AS BB
+CROSS JOIN BASELINE_ACTIVE AS BA
+ORDER BY BB.KEYWORD_SET;
+"""
+
+SKETCH_BRAND_SELECT_TEMPLATE = """SELECT
+    __KEYWORD_SET__                                           AS KEYWORD_SET,
+    COALESCE(HLL_ESTIMATE(HLL_COMBINE(AKKIO_ID_SKETCH)), 0)  AS BASELINE_BRAND_SHOPPERS,
+    COALESCE(SUM(TRANSACTION_COUNT), 0)                      AS BASELINE_BRAND_TRANSACTIONS,
+    COALESCE(SUM(TOTAL_SPEND), 0)                            AS BASELINE_BRAND_SPEND
+  FROM WINDOW_SKETCHES
+  WHERE SKETCH_SCOPE = 'BRAND'
+    AND BRAND_ID_KEY IN (__BRAND_IDS__)"""
+
+
+def sketch_baselines(
+    conn: snowflake.connector.SnowflakeConnection,
+    audiences: list[AudienceConfig],
+) -> dict[tuple[str, ...], dict]:
+    """Estimate baseline metrics from FACT_BRAND_DAY_SKETCH, one query per fact schema and window.
+
+    Only keyword sets that resolve to whole brands (see _whole_brand_ids) are
+    estimated, and only while the sketch table matches the fact table's
+    fact_fingerprint (see _built_through); the returned dict (keyed like
+    compute_baselines) omits everything else, for the caller to compute
+    exactly.
+    """
+    known: dict[tuple[str, str], dict[str, Optional[set]]] = {}
+    fresh: dict[tuple[str, str], Optional[str]] = {}
+    windows: dict[tuple[str, ...], dict[tuple[str, ...], list[int]]] = {}
+    firsts: dict[tuple[str, ...], AudienceConfig] = {}
+
+    for aud in audiences:
+        key = baseline_key(aud)
+        fact = key[:2]
+        if fact not in fresh:
+            fresh[fact] = _built_through(conn, aud, SKETCH_WATERMARK_SQL, SKETCH_TABLE)
+        reason = fresh[fact]
+        brand_ids = None
+        if reason is None:
+            brand_ids, reason = _whole_brand_ids(conn, aud, known)
+        if reason:
+            log.info("Baseline for %s not estimated from %s (%s)", key, SKETCH_TABLE, reason)
+            continue
+        windows.setdefault(key[:4], {})[key[4:]] = brand_ids
+        firsts.setdefault(key[:4], aud)
+
+    baselines: dict[tuple[str, ...], dict] = {}
+    for window_key, keyword_sets in windows.items():
+        first = firsts[window_key]
+        ordered = list(keyword_sets.items())
+        brand_selects = "\n  UNION ALL\n  ".join(
+            SKETCH_BRAND_SELECT_TEMPLATE
+            .replace("__KEYWORD_SET__", str(ks))
+            .replace("__BRAND_IDS__", ", ".join(str(b) for b in brand_ids) or "NULL")
+            for ks, (_, brand_ids) in enumerate(ordered)
+        )
+        sql = (
+            _render_sql(SKETCH_BASELINE_SQL_TEMPLATE, first)
+            .replace("__BASELINE_BRAND_SELECTS__", brand_selects)
+        )
+        log.info("Estimating baselines for %d keyword set(s) over %s to %s from %s",
+                 len(ordered), first.date_start, first.date_end, SKETCH_TABLE)
+        df = _run_query(conn, sql, {"date_start": first.date_start, "date_end": first.date_end},
+                        kind="baseline", audiences=[first.name])
+
+        by_set = {int(row["KEYWORD_SET"]): row for _, row in df.iterrows()}
+        for ks, (keywords, _) in enumerate(ordered):
+            row = by_set[ks]
+            baselines[(*window_key, *keywords)] = {
+                "baseline_active_ids": int(row["BASELINE_ACTIVE_IDS"]),
+                "baseline_brand_shoppers": int(row["BASELINE_BRAND_SHOPPERS"]),
+                "baseline_brand_transactions": int(row["BASELINE_BRAND_TRANSACTIONS"]),
+                "baseline_brand_spend": float(row["BASELINE_BRAND_SPEND"]),
+            }
+    return baselines
+
+
+# Scan budget (pre-execution EXPLAIN)
+OVER_BUDGET_ACTIONS = {"refuse", "approx"}
+BUDGET_BLOCK_PCT = 10.0          # SAMPLE BLOCK percent for queries downgraded with over_budget="approx"
+
+# Prefixed to a rendered validation query: Snowflake compiles it (pruning
+# partitions from static filters) without executing anything
+EXPLAIN_PREFIX = "EXPLAIN USING TABULAR "
+
+
+@dataclass(frozen=True)
+class ScanBudget:
+    """Byte limits checked against EXPLAIN estimates before any validation query runs."""
+
+    max_query_bytes: Optional[int] = None   # per query; None = unlimited
+    max_run_bytes: Optional[int] = None     # all queries of the run together
+    over_budget: str = "refuse"             # or "approx": downgrade to a block-sampled preview if that fits
+    block_pct: float = BUDGET_BLOCK_PCT
+
+
+def explain_query(
+    conn: snowflake.connector.SnowflakeConnection,
+    sql: str,
+    bind_params: dict,
+) -> dict:
+    """Compile a query with EXPLAIN and return its GlobalStats estimate.
+
+    partitions_assigned and bytes_assigned are what the query would scan
+    after compile-time pruning, out of partitions_total. Nothing is executed.
+    """
+    plan = _run_query(conn, EXPLAIN_PREFIX + sql.strip().rstrip(";"), bind_params)
+    plan.columns = [str(col).lower() for col in plan.columns]
+    stats = plan[plan["operation"].astype(str).str.lower() == "globalstats"]
+    if stats.empty:
+        raise RuntimeError("EXPLAIN returned no GlobalStats row")
+    row = stats.iloc[0]
+    return {
+        "partitions_total": int(row["partitionstotal"] or 0),
+        "partitions_assigned": int(row["partitionsassigned"] or 0),
+        "bytes_assigned": int(row["bytesassigned"] or 0),
+    }
+
+
+def block_sampled(estimate: dict, block_pct: float) -> dict:
+    """Scale an EXPLAIN estimate for SAMPLE BLOCK (block_pct), which EXPLAIN does not reflect.
+
+    Blocks are sampled at execution, from the partitions left after
+    compile-time pruning, so about block_pct of those are read.
+    """
+    fraction = block_pct / 100
+    return {
+        **estimate,
+        "partitions_assigned": math.ceil(estimate["partitions_assigned"] * fraction),
+        "bytes_assigned": math.ceil(estimate["bytes_assigned"] * fraction),
+    }
+
+
+def over_budget(bytes_assigned: int, budget: ScanBudget, run_bytes: int = 0) -> Optional[str]:
+    """Why a query estimated at bytes_assigned breaks the budget, given run_bytes already admitted (None if it fits)."""
+    if budget.max_query_bytes is not None and bytes_assigned > budget.max_query_bytes:
+        return f"{_fmt_bytes(bytes_assigned)} exceeds the per-query budget of {_fmt_bytes(budget.max_query_bytes)}"
+    if budget.max_run_bytes is not None and run_bytes + bytes_assigned > budget.max_run_bytes:
+        return (f"{_fmt_bytes(bytes_assigned)} would take the run to {_fmt_bytes(run_bytes + bytes_assigned)}, "
+                f"over the per-run budget of {_fmt_bytes(budget.max_run_bytes)}")
+    return None
+
+
+def print_plan(plan: pd.DataFrame) -> None:
+    """Pretty-print the scan plan returned by validate_all(plan_only=True)."""
+    if plan.empty:
+        print("\n(nothing to run)\n")
+        return
+    print("\n  Scan plan (EXPLAIN estimates, nothing executed)")
+    print(f"  {'AUDIENCE_NAME':<40} {'QUERY':>5}  {'TABLE':<26} {'PARTITIONS':>19} {'BYTES':>10}  DECISION")
+    for _, row in plan.iterrows():
+        partitions = bytes_assigned = "—"
+        if pd.notna(row["BYTES_ASSIGNED"]):
+            partitions = f"{int(row['PARTITIONS_ASSIGNED']):,} / {int(row['PARTITIONS_TOTAL']):,}"
+            bytes_assigned = _fmt_bytes(float(row["BYTES_ASSIGNED"]))
+        query = "—" if pd.isna(row["QUERY"]) else int(row["QUERY"])
+        print(f"  {str(row['AUDIENCE_NAME'])[:40]:<40} {query:>5}  {row['TABLE'] or '—':<26} "
+              f"{partitions:>19} {bytes_assigned:>10}  {row['DECISION']}")
+        if row["REASON"]:
+            print(f"  {'':<40}        {row['REASON']}")
+    per_query = plan.dropna(subset=["QUERY"]).drop_duplicates("QUERY")
+    admitted = per_query[per_query["DECISION"].isin(["run", "approx", "unestimated"])]
+    print(f"\n  {len(admitted)} of {len(per_query)} quer(ies) admitted, "
+          f"~{_fmt_bytes(float(admitted['BYTES_ASSIGNED'].fillna(0).sum()))} to scan\n")
+
+
+def export_plan(plan: pd.DataFrame, output_dir: Path) -> Path:
+    """Write the scan plan (one row per audience) to CSV."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    csv_path = output_dir / "audience_validation_plan.csv"
+    plan.to_csv(csv_path, index=False)
+    log.info("Scan plan exported to %s", csv_path)
+    return csv_path
+
+
+def validate_all(
+    audiences: list[AudienceConfig],
+    batched: bool = False,
+    baseline_cache: Optional[BaselineCache] = None,
+    max_in_flight: int = 1,
+    query_timeout: Optional[int] = None,
+    result_store: Optional[ResultStore] = None,
+    force: bool = False,
+    pool: Optional[ConnectionPool] = None,
+    approx: Optional[ApproxSettings] = None,
+    rollup: bool = True,
+    budget: Optional[ScanBudget] = None,
+    plan_only: bool = False,
+    scan_plan: Optional[list[dict]] = None,
+    row_positions: Optional[list[int]] = None,
+) -> pd.DataFrame:
+    """Run validation for every audience and return the combined DataFrame.
+
+    With batched=True, audiences sharing a fact schema and date window are
+    validated in one query (see BATCH_VALIDATION_SQL_TEMPLATE). If a batch
+    fails, its audiences are retried one at a time so failures stay per audience.
+    Rows are returned in config order either way. When row_positions is
+    given, each returned row's position in audiences is appended to it, so
+    callers can line up later passes without relying on (possibly duplicate)
+    names.
+
+    With a baseline_cache, baseline metrics are resolved up front (computed once
+    per fact schema / window / keyword set) and bound into every query.
+
+    max_in_flight > 1 runs up to that many queries concurrently, each on its
+    own pooled connection; query_timeout (seconds) bounds every query. Ctrl-C
+    aborts the queries still running before re-raising.
+
+    With a result_store, audiences whose result key (version, keywords,
+    window, fact fingerprint) is unchanged are served from the store without
+    touching the fact table; force=True re-runs them anyway. Fresh results
+    are written back to the store.
+
+    A caller-owned pool (e.g. the service's warm connections) is used as-is
+    and left open; otherwise a pool of max_in_flight is opened and closed here.
+
+    approx (see ApproxSettings) runs a fast preview with *_ERR bounds; its
+    results are estimates, so the result store and baseline cache are bypassed.
+    The result store is likewise bypassed when baseline_cache uses sketches.
+
+    With rollup (and not approx), audiences resolve_monthly_routes() can serve
+    from FACT_BRAND_MONTH_SUMMARY are validated there, one query each, with
+    their baseline computed from the pre-aggregate; the rest use the detail
+    table as above.
+
+    With a budget (see ScanBudget), every query is compiled with EXPLAIN
+    before anything scans facts, baselines included. Queries are admitted in
+    config order; one over the per-query budget, or that would take the run
+    past the per-run budget, is refused (its audiences get no result) or, with
+    over_budget="approx", downgraded to an approx preview reading block_pct of
+    its micro-partitions (SAMPLE BLOCK, see block_sampled) if that estimate
+    fits. Downgraded results are not written to the result store.
+    Baselines missing from the cache are estimated inline in each query, an
+    upper bound on what computing them will scan. Queries EXPLAIN cannot
+    compile run anyway, with a warning.
+
+    plan_only=True does the same estimation but executes nothing: it returns
+    the plan (one row per audience: AUDIENCE_INDEX, QUERY, TABLE,
+    PARTITIONS_TOTAL, PARTITIONS_ASSIGNED, BYTES_ASSIGNED, DECISION, REASON)
+    instead of results. Otherwise the plan rows are appended to scan_plan, when
+    given, so later passes can leave out refused and downgraded audiences.
+    """
+    if approx:
+        if result_store is not None or baseline_cache is not None:
+            log.info("Approximate preview: bypassing the result store and baseline cache")
+        result_store = baseline_cache = None
+    if baseline_cache is not None and baseline_cache.sketches and result_store is not None:
+        log.info("Sketch baselines are estimates: bypassing the result store")
+        result_store = None
+    results: dict[int, pd.DataFrame] = {}
+    baselines: dict[tuple[str, ...], dict] = {}
+    pending: list[tuple[int, AudienceConfig]] = list(enumerate(audiences))
+    result_keys: list[Optional[dict]] = [None] * len(audiences)
+    routes: dict[int, list[int]] = {}
+    approximated: set[int] = set()
+    plan_rows: dict[int, dict] = {}
+
+    # Jobs are (label, run, query, members): query() renders the SQL run()
+    # executes, for EXPLAIN; members are the (index, audience) pairs served
+    def _monthly_job(idx: int, aud: AudienceConfig):
+        def run(conn) -> dict[int, pd.DataFrame]:
+            return {idx: validate_audience_monthly(conn, aud, routes[idx], timeout=query_timeout)}
+
+        def query() -> tuple[str, dict]:
+            return _monthly_query(aud, routes[idx])
+        return aud.name, run, query, [(idx, aud)]
+
+    def _single_job(idx: int, aud: AudienceConfig, job_approx: Optional[ApproxSettings] = approx):
+        def run(conn) -> dict[int, pd.DataFrame]:
+            return {idx: validate_audience(conn, aud, baselines.get(baseline_key(aud)),
+                                           timeout=query_timeout, approx=job_approx)}
+
+        def query() -> tuple[str, dict]:
+            return _validation_query(aud, baselines.get(baseline_key(aud)), job_approx)
+        return aud.name, run, query, [(idx, aud)]
+
+    def _batch_job(group: list[tuple[int, AudienceConfig]], job_approx: Optional[ApproxSettings] = approx):
+        def run(conn) -> dict[int, pd.DataFrame]:
+            try:
+                df = validate_batch(conn, [aud for _, aud in group], baselines,
+                                    timeout=query_timeout, approx=job_approx)
+            except Exception as exc:
+                log.warning("Batch failed (%s); retrying %d audience(s) individually",
+                            exc, len(group))
+                out: dict[int, pd.DataFrame] = {}
+                for idx, aud in group:
+                    try:
+                        out[idx] = validate_audience(
+                            conn, aud, baselines.get(baseline_key(aud)), timeout=query_timeout, approx=job_approx
+                        )
+                    except Exception as aud_exc:
+                        log.error("FAILED for audience '%s': %s", aud.name, aud_exc)
+                return out
+            return {idx: df.iloc[[pos]] for pos, (idx, _) in enumerate(group)}
+
+        def query() -> tuple[str, dict]:
+            sql, bind_params, _ = _batch_query([aud for _, aud in group], baselines, job_approx)
+            return sql, bind_params
+        return f"batch of {len(group)}", run, query, group
+
+    def _build_jobs() -> list:
+        jobs = [_monthly_job(idx, aud) for idx, aud in pending if idx in routes]
+        detail = [(idx, aud) for idx, aud in pending if idx not in routes]
+        if not batched:
+            return jobs + [_single_job(idx, aud) for idx, aud in detail]
+        return jobs + [
+            _single_job(*group[0]) if len(group) == 1 else _batch_job(group)
+            for group in group_audiences(detail).values()
+        ]
+
+    def _plan(jobs: list) -> list:
+        """EXPLAIN every job and apply the budget; returns the jobs to run (some downgraded)."""
+        admitted = []
+        run_bytes = 0
+        with pool.connection() as conn:
+            for number, job in enumerate(jobs, start=1):
+                label, _, query, members = job
+                estimate, decision, reason = None, "run", ""
+                try:
+                    estimate = explain_query(conn, *query())
+                except Exception as exc:
+                    decision, reason = "unestimated", f"EXPLAIN failed: {exc}"
+                    log.warning("Could not estimate '%s' (%s); running it unchecked", label, exc)
+                if estimate is not None and budget is not None:
+                    reason = over_budget(estimate["bytes_assigned"], budget, run_bytes) or ""
+                    if reason and budget.over_budget == "approx" and approx is None and members[0][0] not in routes:
+                        downgrade = ApproxSettings(block_pct=budget.block_pct)
+                        job = (_single_job(*members[0], job_approx=downgrade) if len(members) == 1
+                               else _batch_job(members, job_approx=downgrade))
+                        try:
+                            approx_estimate = block_sampled(explain_query(conn, *job[2]()), budget.block_pct)
+                        except Exception as exc:
+                            log.warning("Could not estimate the approx downgrade of '%s' (%s)", label, exc)
+                        else:
+                            if over_budget(approx_estimate["bytes_assigned"], budget, run_bytes) is None:
+                                estimate, decision = approx_estimate, "approx"
+                    if reason and decision != "approx":
+                        decision = "refused"
+                if decision == "refused":
+                    log.error("Refused '%s': %s", label, reason)
+                else:
+                    if decision == "approx":
+                        log.warning("Downgraded '%s' to an approx preview: %s", label, reason)
+                        approximated.update(idx for idx, _ in members)
+                    run_bytes += estimate["bytes_assigned"] if estimate else 0
+                    admitted.append(job)
+                if estimate is not None:
+                    log.info("Plan for '%s': %s of %s partition(s), %s -> %s",
+                             label, f"{estimate['partitions_assigned']:,}", f"{estimate['partitions_total']:,}",
+                             _fmt_bytes(estimate["bytes_assigned"]), decision)
+                for idx, aud in members:
+                    plan_rows[idx] = {
+                        "AUDIENCE_INDEX": idx,
+                        "AUDIENCE_NAME": aud.name,
+                        "QUERY": number,
+                        "TABLE": MONTHLY_TABLE if idx in routes else DETAIL_TABLE,
+                        "PARTITIONS_TOTAL": estimate["partitions_total"] if estimate else None,
+                        "PARTITIONS_ASSIGNED": estimate["partitions_assigned"] if estimate else None,
+                        "BYTES_ASSIGNED": estimate["bytes_assigned"] if estimate else None,
+                        "DECISION": decision,
+                        "REASON": reason,
+                    }
+        return admitted
+
+    def _collect(run):
+        return lambda conn: results.update(run(conn))
+
+    with _job_pool(max_in_flight, pool) as pool:
+        if any(aud.brand_match != "like" for aud in audiences):
+            with pool.connection() as conn:
+                audiences = resolve_brand_match(conn, audiences)
+            pending = list(enumerate(audiences))
+
+        if result_store is not None:
+            try:
+                with pool.connection() as conn:
+                    result_keys = result_store.result_keys(conn, audiences)
+            except Exception as exc:
+                log.warning("Result store check failed (%s); re-running every audience", exc)
+            if not force:
+                for idx, aud in pending:
+                    stored = result_store.get(result_keys[idx], aud) if result_keys[idx] else None
+                    if stored is not None:
+                        results[idx] = stored
+                pending = [(idx, aud) for idx, aud in pending if idx not in results]
+            log.info("Result store: %d audience(s) unchanged, %d to run%s",
+                     len(results), len(pending), " (forced)" if force else "")
+
+        if rollup and not approx and pending:
+            try:
+                with pool.connection() as conn:
+                    routes = resolve_monthly_routes(conn, pending)
+            except Exception as exc:
+                log.warning("Monthly routing check failed (%s); using %s for every audience", exc, DETAIL_TABLE)
+        jobs = _build_jobs()
+
+        planning = budget is not None or plan_only
+        detail = [aud for idx, aud in pending if idx not in routes]
+        if baseline_cache is not None and detail:
+            try:
+                with pool.connection() as conn:
+                    baselines = baseline_cache.resolve(conn, detail, compute=not planning)
+            except Exception as exc:
+                log.warning("Baseline cache unavailable (%s); computing baselines inline", exc)
+
+        if planning:
+            jobs = _plan(jobs)
+            if plan_only:
+                for idx in results:
+                    plan_rows[idx] = {"AUDIENCE_INDEX": idx, "AUDIENCE_NAME": audiences[idx].name,
+                                      "DECISION": "stored", "REASON": "unchanged since the last run (result store)"}
+                return pd.DataFrame([plan_rows[idx] for idx in sorted(plan_rows)], columns=[
+                    "AUDIENCE_INDEX", "AUDIENCE_NAME", "QUERY", "TABLE", "PARTITIONS_TOTAL",
+                    "PARTITIONS_ASSIGNED", "BYTES_ASSIGNED", "DECISION", "REASON",
+                ])
+            if scan_plan is not None:
+                scan_plan.extend(plan_rows[idx] for idx in sorted(plan_rows))
+            detail = [aud for job in jobs for idx, aud in job[3] if idx not in routes and idx not in approximated]
+            if baseline_cache is not None and detail:
+                try:
+                    with pool.connection() as conn:
+                        baselines = baseline_cache.resolve(conn, detail)
+                except Exception as exc:
+                    log.warning("Baseline cache unavailable (%s); computing baselines inline", exc)
+
+        if max_in_flight > 1:
+            log.info("Running %d quer(ies) with up to %d in flight", len(jobs), max_in_flight)
+        _run_jobs(pool, [(label, _collect(run)) for label, run, *_ in jobs], max_in_flight)
+
+    if result_store is not None:
+        for idx, _ in pending:
+            if idx in results and result_keys[idx] and idx not in approximated:
+                try:
+                    result_store.put(result_keys[idx], results[idx])
+                except sqlite3.Error as exc:
+                    log.warning("Could not store result for '%s': %s", audiences[idx].name, exc)
+
+    if not results:
+        log.warning("No results collected.")
+        return pd.DataFrame()
+
+    if row_positions is not None:
+        row_positions.extend(idx for idx in sorted(results) for _ in range(len(results[idx])))
+    combined = pd.concat([results[idx] for idx in sorted(results)], ignore_index=True)
+    return combined
+
+
+# Breakdowns
+BREAKDOWN_SQL_TEMPLATE = """
+WITH AUDIENCE AS (
+  SELECT DISTINCT AKKIO_ID
+  FROM __DB__.__SCHEMA__.AUDIENCE_LOOKUP
+  WHERE audience_id = %(audience_id)s
+    AND ver = (
+      SELECT MAX(ver)
+      FROM __DB__.__SCHEMA__.AUDIENCE_METADATA
+      WHERE audience_id = %(audience_id)s
+    )
+),
+-- One pass over the window: every fact row tagged with its breakdown cell,
+-- audience membership and brand match, so audience and baseline share a scan
+CELL_FACTS AS (
+  SELECT
+    __DIMENSION_SELECTS__,
+    F.AKKIO_ID,
+    F.TXID,
+    F.TRANS_AMOUNT,
+    CASE WHEN A.AKKIO_ID IS NOT NULL THEN 1 ELSE 0 END AS IN_AUDIENCE,
+    __KEYWORD_FLAGS__
+  FROM __FACT_DB__.__FACT_SCHEMA__.FACT_TRANSACTION_ENRICHED AS F
+  LEFT JOIN AUDIENCE AS A
+    ON A.AKKIO_ID = F.AKKIO_ID
+  __DEMOGRAPHIC_JOIN__
+  __KEYWORD_JOIN__
+  WHERE F.TRANS_DATE >= %(date_start)s
+    AND F.TRANS_DATE <  %(date_end)s
+),
+CELLS AS (
+  SELECT
+    __DIMENSIONS__,
+    COUNT(DISTINCT CASE WHEN IN_AUDIENCE = 1 THEN AKKIO_ID END)                AS ACTIVE_MATCHED_IDS,
+    COUNT(DISTINCT CASE WHEN IN_AUDIENCE = 1 AND KS_0 = 1 THEN AKKIO_ID END)   AS BRAND_SHOPPERS,
+    COUNT(CASE WHEN IN_AUDIENCE = 1 AND KS_0 = 1 THEN TXID END)                AS BRAND_TRANSACTIONS,
+    COALESCE(SUM(CASE WHEN IN_AUDIENCE = 1 AND KS_0 = 1 THEN TRANS_AMOUNT END), 0) AS BRAND_SPEND,
+    COUNT(DISTINCT AKKIO_ID)                                                   AS BASELINE_ACTIVE_IDS,
+    COUNT(DISTINCT CASE WHEN KS_0 = 1 THEN AKKIO_ID END)                       AS BASELINE_BRAND_SHOPPERS,
+    COALESCE(SUM(CASE WHEN KS_0 = 1 THEN TRANS_AMOUNT END), 0)                 AS BASELINE_BRAND_SPEND
+  FROM CELL_FACTS
+  GROUP BY __DIMENSIONS__
+)
+-- AUDIENCE_ID is carried by the Parquet partition directory, not the rows
+SELECT
+  %(audience_name)s              AS AUDIENCE_NAME,
+  __DIMENSIONS__,
+  ACTIVE_MATCHED_IDS,
+  BRAND_SHOPPERS,
+  BRAND_TRANSACTIONS,
+  BRAND_SPEND,
+  CASE WHEN ACTIVE_MATCHED_IDS > 0
+       THEN CAST(BRAND_SHOPPERS AS FLOAT) / ACTIVE_MATCHED_IDS
+       ELSE 0 END               AS SHOP_RATE,
+  CASE WHEN ACTIVE_MATCHED_IDS > 0
+       THEN CAST(BRAND_SPEND AS FLOAT) / ACTIVE_MATCHED_IDS
+       ELSE 0 END               AS SPEND_RATE,
+  BASELINE_ACTIVE_IDS,
+  BASELINE_BRAND_SHOPPERS,
+  CASE WHEN BASELINE_ACTIVE_IDS > 0
+       THEN CAST(BASELINE_BRAND_SHOPPERS AS FLOAT) / BASELINE_ACTIVE_IDS
+       ELSE 0 END               AS BASELINE_SHOP_RATE,
+  CASE WHEN BASELINE_ACTIVE_IDS > 0
+       THEN CAST(BASELINE_BRAND_SPEND AS FLOAT) / BASELINE_ACTIVE_IDS
+       ELSE 0 END               AS BASELINE_SPEND_RATE,
+  CASE WHEN ACTIVE_MATCHED_IDS > 0 AND BASELINE_BRAND_SHOPPERS > 0
+       THEN (CAST(BRAND_SHOPPERS AS FLOAT) / ACTIVE_MATCHED_IDS)
+          / (CAST(BASELINE_BRAND_SHOPPERS AS FLOAT) / BASELINE_ACTIVE_IDS)
+       ELSE NULL END            AS SHOP_RATE_LIFT,
+  CASE WHEN ACTIVE_MATCHED_IDS > 0 AND BASELINE_BRAND_SPEND > 0
+       THEN (CAST(BRAND_SPEND AS FLOAT) / ACTIVE_MATCHED_IDS)
+          / (CAST(BASELINE_BRAND_SPEND AS FLOAT) / BASELINE_ACTIVE_IDS)
+       ELSE NULL END            AS SPEND_RATE_LIFT
+FROM CELLS
+WHERE ACTIVE_MATCHED_IDS > 0;
+"""
+
+DEMOGRAPHIC_JOIN_SQL = """LEFT JOIN __FACT_DB__.__FACT_SCHEMA__.V_AKKIO_ATTRIBUTES_LATEST AS D
+    ON D.AKKIO_ID = F.AKKIO_ID"""
+
+
+def _breakdown_sql(audience: AudienceConfig) -> str:
+    """Render BREAKDOWN_SQL_TEMPLATE for the audience's breakdown dimensions."""
+    keyword_sets = {_keyword_set_key(audience.brand_keywords): 0}
+    exprs = [BREAKDOWN_DIMENSIONS[dim] for dim in audience.breakdown]
+    columns = [dim.upper() for dim in audience.breakdown]
+    template = (
+        BREAKDOWN_SQL_TEMPLATE
+        .replace("__DIMENSION_SELECTS__", ",\n    ".join(
+            f"{expr} AS {col}" for expr, col in zip(exprs, columns)))
+        .replace("__DIMENSIONS__", ", ".join(columns))
+        .replace("__DEMOGRAPHIC_JOIN__",
+                 DEMOGRAPHIC_JOIN_SQL if any(e.startswith("D.") for e in exprs) else "")
+        .replace("__KEYWORD_FLAGS__", _keyword_flags(keyword_sets, audience))
+        .replace("__KEYWORD_JOIN__", _keyword_join(keyword_sets, audience))
+    )
+    return _render_sql(template, audience)
+
+
+def breakdown_dir(audience: AudienceConfig, output_dir: Path = OUTPUT_DIR) -> Path:
+    """Hive-style partition directory for one audience's breakdown, grouped by dimension set."""
+    return output_dir / "breakdowns" / "__".join(audience.breakdown) / f"AUDIENCE_ID={audience.audience_id}"
+
+
+def write_breakdown(
+    conn: snowflake.connector.SnowflakeConnection,
+    audience: AudienceConfig,
+    output_dir: Path = OUTPUT_DIR,
+    timeout: Optional[int] = None,
+) -> int:
+    """Stream one audience's breakdown into Parquet and return the number of rows written.
+
+    Result batches go straight from the cursor to a ParquetWriter, so the full
+    breakdown is never held in memory. Any previous output for the audience
+    and dimension set is replaced.
+    """
+    import pyarrow.parquet as pq
+
+    part_dir = breakdown_dir(audience, output_dir)
+    part_dir.mkdir(parents=True, exist_ok=True)
+
+    bind_params = {
+        "audience_id": audience.audience_id,
+        "audience_name": audience.name,
+        "date_start": audience.date_start,
+        "date_end": audience.date_end,
+    }
+    log.info("Breaking down audience: %s  [%s] by %s",
+             audience.name, audience.audience_id, ", ".join(audience.breakdown))
+
+    path = part_dir / "part-00000.parquet"
+    tmp = part_dir / "part-00000.parquet.tmp"
+    writer = None
+    rows = 0
+    try:
+        for batch in _stream_query(conn, _breakdown_sql(audience), bind_params, timeout=timeout,
+                                   kind="breakdown", audiences=[audience.name]):
+            if batch.num_rows == 0:
+                continue
+            if writer is None:
+                writer = pq.ParquetWriter(tmp, batch.schema)
+            elif batch.schema != writer.schema:
+                batch = batch.cast(writer.schema)
+            writer.write_table(batch)
+            rows += batch.num_rows
+    except BaseException:
+        if writer is not None:
+            writer.close()
+        tmp.unlink(missing_ok=True)
+        raise
+
+    for old in part_dir.glob("*.parquet"):
+        old.unlink()
+    if writer is not None:
+        writer.close()
+        tmp.replace(path)
+
+    log.info("  -> %d breakdown row(s) written to %s", rows, part_dir)
+    return rows
+
+
+def run_breakdowns(
+    audiences: list[AudienceConfig],
+    output_dir: Path = OUTPUT_DIR,
+    max_in_flight: int = 1,
+    query_timeout: Optional[int] = None,
+) -> dict[str, int]:
+    """Write Parquet breakdowns for every audience with breakdown dimensions configured.
+
+    Returns rows written per audience name. Failures are logged and skipped,
+    like validate_all.
+    """
+    audiences = [aud for aud in audiences if aud.breakdown]
+    if not audiences:
+        return {}
+
+    written: dict[str, int] = {}
+
+    def _write(aud: AudienceConfig):
+        def run(conn) -> None:
+            written[aud.name] = write_breakdown(conn, aud, output_dir, timeout=query_timeout)
+        return aud.name, run
+
+    with _job_pool(max_in_flight) as pool:
+        if any(aud.brand_match != "like" for aud in audiences):
+            with pool.connection() as conn:
+                audiences = resolve_brand_match(conn, audiences)
+        _run_jobs(pool, [_write(aud) for aud in audiences], max_in_flight, "Breakdown")
+
+    return written
+
+
+# Query profiling
+POOR_PRUNING_RATIO = 0.5         # flag scans reading more than this share of partitions...
+POOR_PRUNING_MIN_PARTITIONS = 100  # ...of a table at least this large
+
+QUERY_PROFILE_SQL = """
+SELECT
+  QUERY_ID,
+  EXECUTION_STATUS,
+  WAREHOUSE_NAME,
+  WAREHOUSE_SIZE,
+  TOTAL_ELAPSED_TIME / 1000.0                            AS SERVER_ELAPSED_S,
+  COMPILATION_TIME / 1000.0                              AS COMPILATION_S,
+  EXECUTION_TIME / 1000.0                                AS EXECUTION_S,
+  (QUEUED_PROVISIONING_TIME + QUEUED_OVERLOAD_TIME) / 1000.0 AS QUEUED_S,
+  BYTES_SCANNED,
+  PARTITIONS_SCANNED,
+  PARTITIONS_TOTAL,
+  BYTES_SPILLED_TO_LOCAL_STORAGE                         AS BYTES_SPILLED_LOCAL,
+  BYTES_SPILLED_TO_REMOTE_STORAGE                        AS BYTES_SPILLED_REMOTE
+FROM TABLE(__FACT_DB__.INFORMATION_SCHEMA.QUERY_HISTORY(
+  END_TIME_RANGE_START => TO_TIMESTAMP_LTZ(%(since)s),
+  RESULT_LIMIT => 10000
+))
+WHERE QUERY_ID IN (__QUERY_IDS__);
+"""
+
+
+def profile_queries(
+    conn: snowflake.connector.SnowflakeConnection,
+    audience: AudienceConfig,
+    records: list[dict],
+    attempts: int = 5,
+    wait_seconds: float = 2.0,
+    poor_pruning_ratio: float = POOR_PRUNING_RATIO,
+) -> pd.DataFrame:
+    """Join recorded queries with server-side stats from INFORMATION_SCHEMA.QUERY_HISTORY.
+
+    Query history lags execution by a few seconds, so the lookup is retried
+    until every query ID is present (or attempts run out). Adds PRUNING_RATIO
+    (partitions scanned / total) and a POOR_PRUNING flag.
+    """
+    profile = pd.DataFrame(records)
+    if profile.empty:
+        return profile
+
+    query_ids = sorted({qid for qid in profile["QUERY_ID"] if qid})
+    stats = pd.DataFrame()
+    for attempt in range(attempts if query_ids else 0):
+        params = {f"qid_{i}": qid for i, qid in enumerate(query_ids)}
+        params["since"] = int(profile["STARTED_AT"].min()) - 60
+        sql = (
+            _render_sql(QUERY_PROFILE_SQL, audience)
+            .replace("__QUERY_IDS__", ", ".join(f"%(qid_{i})s" for i in range(len(query_ids))))
+        )
+        try:
+            stats = _run_query(conn, sql, params)
+        except Exception as exc:
+            log.warning("Query history unavailable (%s); profile has client-side timings only", exc)
+            break
+        if len(stats) >= len(query_ids):
+            break
+        if attempt < attempts - 1:
+            time.sleep(wait_seconds)
+        else:
+            log.warning("Server stats missing for %d of %d quer(ies)", len(query_ids) - len(stats), len(query_ids))
+
+    if not stats.empty:
+        profile = profile.merge(stats, on="QUERY_ID", how="left")
+        total = pd.to_numeric(profile["PARTITIONS_TOTAL"], errors="coerce")
+        scanned = pd.to_numeric(profile["PARTITIONS_SCANNED"], errors="coerce")
+        profile["PRUNING_RATIO"] = (scanned / total.where(total > 0)).round(4)
+        profile["POOR_PRUNING"] = (
+            (total >= POOR_PRUNING_MIN_PARTITIONS) & (profile["PRUNING_RATIO"] > poor_pruning_ratio)
+        )
+    else:
+        profile["POOR_PRUNING"] = False
+    return profile
+
+
+def export_profile(profile: pd.DataFrame, output_dir: Path, run_started: float) -> tuple[Path, Path]:
+    """Write the run's query profile as CSV (one row per query) and JSON (with run metadata)."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    csv_path = output_dir / "audience_validation_profile.csv"
+    json_path = output_dir / "audience_validation_profile.json"
+    profile.to_csv(csv_path, index=False)
+    records = profile.astype(object).where(pd.notna(profile), None).to_dict(orient="records")
+    with open(json_path, "w") as f:
+        json.dump({
+            "run_started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(run_started)),
+            "client_elapsed_s": round(time.time() - run_started, 3),
+            "queries": records,
+        }, f, indent=1, default=_json_scalar)
+    log.info("Query profile exported to %s and %s", csv_path, json_path)
+    return csv_path, json_path
+
+
+# Display / export helpers
+CURRENCY_COLS = {"BRAND_SPEND", "SPEND_RATE", "AVERAGE_TICKET", "BASELINE_SPEND_RATE"}
+PERCENT_COLS = {"SHOP_RATE", "BASELINE_SHOP_RATE"}
+INT_COLS = {
+    "TOTAL_LAL_IDS", "ACTIVE_MATCHED_IDS", "BRAND_SHOPPERS",
+    "BRAND_TRANSACTIONS", "BASELINE_ACTIVE_IDS", "BASELINE_BRAND_SHOPPERS",
+}
+LIFT_COLS = {
+    "SHOP_RATE_LIFT", "SPEND_RATE_LIFT",
+    "SHOP_RATE_LIFT_CI_LOW", "SHOP_RATE_LIFT_CI_HIGH",
+    "SPEND_RATE_LIFT_CI_LOW", "SPEND_RATE_LIFT_CI_HIGH",
+}
+P_VALUE_COLS = {"SHOP_RATE_LIFT_P_VALUE", "SPEND_RATE_LIFT_P_VALUE"}
+SECONDS_COLS = {"CLIENT_ELAPSED_S", "SERVER_ELAPSED_S"}
+BYTES_COLS = {"BYTES_SCANNED", "BYTES_SPILLED"}
+
+
+def _fmt_bytes(val: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(val) < 1024:
+            return f"{val:,.0f} {unit}" if unit == "B" else f"{val:,.1f} {unit}"
+        val /= 1024
+    return f"{val:,.1f} TB"
+
+
+def _fmt(val, col: str) -> str:
+    """Format a single value for display."""
+    if pd.isna(val):
+        return "—"
+    if col in INT_COLS:
+        return f"{int(val):,}"
+    if col in CURRENCY_COLS:
+        return f"${val:,.2f}"
+    if col in PERCENT_COLS:
+        return f"{val:.4%}"
+    if col in LIFT_COLS:
+        return f"{val:,.2f}x"
+    if col in P_VALUE_COLS:
+        return f"{val:.4f}"
+    if col in SECONDS_COLS:
+        return f"{val:,.1f}s"
+    if col in BYTES_COLS:
+        return _fmt_bytes(float(val))
+    if isinstance(val, float):
+        return f"{val:,.2f}"
+    return str(val)
+
+
+def print_summary(
+    df: pd.DataFrame,
+    profile: Optional[pd.DataFrame] = None,
+    approx: Optional[ApproxSettings] = None,
+) -> None:
+    """Pretty-print the validation results in two panels: audience metrics + baseline/lift.
+
+    Approximate results (see approx_error_bounds) show each metric's error
+    bound next to it, and the sampling used by approx is explained below
+    them. Bootstrap columns (see audience_significance), when present, get a
+    significance panel of their own. With a query profile (see
+    profile_queries), a third panel lists each query's timings, scan volume
+    and pruning, flagging scans that prune poorly.
+    """
+    if df.empty:
+        print("\n(no results)\n")
+        return
+
+    # Panel 1: Core audience metrics
+    core_cols = [
+        "AUDIENCE_NAME", "TOTAL_LAL_IDS", "ACTIVE_MATCHED_IDS",
+        "BRAND_SHOPPERS", "BRAND_TRANSACTIONS", "BRAND_SPEND",
+        "SHOP_RATE", "SPEND_RATE", "AVERAGE_TICKET", "AVG_TRANSACTIONS_PER_SHOPPER",
+    ]
+    core_cols = [c for c in core_cols if c in df.columns]
+
+    # Panel 2: Baseline and lift
+    lift_cols = [
+        "AUDIENCE_NAME",
+        "BASELINE_ACTIVE_IDS", "BASELINE_BRAND_SHOPPERS",
+        "BASELINE_SHOP_RATE", "BASELINE_SPEND_RATE",
+        "SHOP_RATE_LIFT", "SPEND_RATE_LIFT",
+    ]
+    lift_cols = [c for c in lift_cols if c in df.columns]
+
+    def _print_table(title: str, cols: list[str], frame: pd.DataFrame = df) -> None:
+        header = [c.replace("_", " ") for c in cols]
+        rows = []
+        for _, row in frame.iterrows():
+            rows.append([
+                _fmt(row[c], c) + (f" ±{row[c + '_ERR']:.1%}"
+                                   if c + "_ERR" in frame.columns and pd.notna(row[c + "_ERR"]) else "")
+                for c in cols
+            ])
+
+        widths = [max(len(h), *(len(r[i]) for r in rows)) for i, h in enumerate(header)]
+        sep = "+-" + "-+-".join("-" * w for w in widths) + "-+"
+        hdr_line = "| " + " | ".join(h.rjust(w) for h, w in zip(header, widths)) + " |"
+
+        print("\n" + "=" * len(sep))
+        print(f"  {title}")
+        print("=" * len(sep))
+        print(sep)
+        print(hdr_line)
+        print(sep)
+        for r in rows:
+            print("| " + " | ".join(v.rjust(w) for v, w in zip(r, widths)) + " |")
+        print(sep)
+        print()
+
+    approx_note = " (APPROXIMATE, ±~95% BOUNDS)" if any(c.endswith("_ERR") for c in df.columns) else ""
+    _print_table("AUDIENCE METRICS" + approx_note, core_cols)
+
+    if lift_cols and len(lift_cols) > 1:
+        _print_table("BASELINE COMPARISON & LIFT" + approx_note, lift_cols)
+
+    if approx is not None and approx.sample_pct:
+        print(f"  Sampled {approx.sample_pct:g}% of AKKIO_IDs by hash: every micro-partition of the window was "
+              "still scanned, so this saves aggregation time, not bytes read.\n")
+    if approx is not None and approx.block_pct:
+        print(f"  Read ~{approx.block_pct:g}% of micro-partitions (SAMPLE BLOCK): sums scale without bias, but ID "
+              "and shopper counts (and shop rates) run high, beyond the ± bounds.\n")
+
+    if "SHOP_RATE_LIFT_P_VALUE" in df.columns:
+        shown = df.copy()
+        for metric in ("SHOP_RATE_LIFT", "SPEND_RATE_LIFT"):
+            shown[f"{metric}_CI"] = [
+                "—" if pd.isna(low) else f"{_fmt(low, metric)} – {_fmt(high, metric)}"
+                for low, high in zip(df[f"{metric}_CI_LOW"], df[f"{metric}_CI_HIGH"])
+            ]
+        _print_table("LIFT SIGNIFICANCE (BOOTSTRAP)", [
+            "AUDIENCE_NAME",
+            "SHOP_RATE_LIFT", "SHOP_RATE_LIFT_CI", "SHOP_RATE_LIFT_P_VALUE",
+            "SPEND_RATE_LIFT", "SPEND_RATE_LIFT_CI", "SPEND_RATE_LIFT_P_VALUE",
+        ], shown)
+
+    if profile is not None and not profile.empty:
+        shown = profile.copy()
+        shown["AUDIENCES"] = shown["AUDIENCES"].str.slice(0, 48)
+        profile_cols = ["KIND", "AUDIENCES", "CLIENT_ELAPSED_S"]
+        if "PARTITIONS_TOTAL" in shown.columns:
+            shown["PARTITIONS"] = [
+                "—" if pd.isna(total) else
+                f"{int(scanned):,} / {int(total):,}" + (f" ({scanned / total:.0%})" if total else "")
+                for scanned, total in zip(shown["PARTITIONS_SCANNED"], shown["PARTITIONS_TOTAL"])
+            ]
+            shown["BYTES_SPILLED"] = (
+                shown["BYTES_SPILLED_LOCAL"].fillna(0) + shown["BYTES_SPILLED_REMOTE"].fillna(0)
+            )
+            shown["FLAG"] = ["POOR PRUNING" if flag else "" for flag in shown["POOR_PRUNING"]]
+            profile_cols += ["SERVER_ELAPSED_S", "BYTES_SCANNED", "PARTITIONS", "BYTES_SPILLED", "FLAG"]
+        _print_table("QUERY PROFILE", profile_cols, shown)
+
+        poor = profile[profile["POOR_PRUNING"].fillna(False).astype(bool)]
+        if not poor.empty:
+            print(f"  Poor pruning (> {POOR_PRUNING_RATIO:.0%} of partitions scanned) for:")
+            for audiences in sorted({name for names in poor["AUDIENCES"] for name in names.split("; ")}):
+                print(f"    - {audiences}")
+            print()
+
+
+def export_csv(df: pd.DataFrame, output_dir: Path) -> Path:
+    """Export the raw results to CSV in the output directory."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    csv_path = output_dir / "audience_validation_results.csv"
+    df.to_csv(csv_path, index=False)
+    log.info("Results exported to %s", csv_path)
+    return csv_path
+
+
+# Main
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    """Parse command-line options."""
+    from audience_significance import BOOTSTRAP_CONFIDENCE, BOOTSTRAP_REPLICATES
+
+    parser = argparse.ArgumentParser(description="Validate Akkio audiences against the holdout set.")
+    parser.add_argument(
+        "--batched", action="store_true",
+        help="Validate audiences sharing a fact schema and date window in one query.",
+    )
+    parser.add_argument(
+        "--brand-match", choices=sorted(BRAND_MATCH_MODES), default=None,
+        help="Override brand_match for every audience: 'like' scans substrings, "
+             "'dim' semi-joins DIM_BRAND_KEYWORD_MATCH, 'ids' uses keyword_preview.py --emit-ids.",
+    )
+    parser.add_argument(
+        "--breakdown", nargs="+", choices=sorted(BREAKDOWN_DIMENSIONS), default=None, metavar="DIM",
+        help="Also write per-audience breakdowns by these dimensions to output/breakdowns/ "
+             f"(overrides audiences.yml). Choices: {', '.join(sorted(BREAKDOWN_DIMENSIONS))}.",
+    )
+    parser.add_argument(
+        "--sweep", choices=sorted(SWEEP_MODES), default=None,
+        help="Also sweep every audience over rolling or expanding windows from its date_start, all "
+             "windows in one scan, to output/audience_validation_sweep.csv (overrides audiences.yml).",
+    )
+    parser.add_argument(
+        "--sweep-step-days", type=int, default=SweepSettings.step_days,
+        help="Days between sweep windows with --sweep (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--sweep-count", type=int, default=SweepSettings.count,
+        help="Number of sweep windows with --sweep (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--sweep-length-days", type=int, default=None,
+        help="Rolling window length with --sweep (default: the step, i.e. back-to-back windows).",
+    )
+    parser.add_argument(
+        "--no-baseline-cache", action="store_true",
+        help="Recompute baseline metrics inside every validation query.",
+    )
+    parser.add_argument(
+        "--baseline-cache-ttl-hours", type=float, default=BASELINE_CACHE_TTL_HOURS,
+        help="Maximum age of a cached baseline before it is recomputed (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--sketch-baselines", action="store_true",
+        help="Estimate baselines from the daily HLL sketches in FACT_BRAND_DAY_SKETCH where keywords "
+             "resolve to whole brands. Bypasses the result store.",
+    )
+    parser.add_argument(
+        "--force", action="store_true",
+        help="Re-run every audience even if its stored result is still current.",
+    )
+    parser.add_argument(
+        "--no-result-store", action="store_true",
+        help="Neither read nor write output/cache/results.sqlite.",
+    )
+    parser.add_argument(
+        "--no-rollup", action="store_true",
+        help="Always query FACT_TRANSACTION_ENRICHED, even for month-aligned windows "
+             "FACT_BRAND_MONTH_SUMMARY could serve.",
+    )
+    parser.add_argument(
+        "--approx", action="store_true",
+        help="Fast preview: APPROX_COUNT_DISTINCT (HLL) for every distinct count, with error bounds. "
+             "Bypasses the result store and baseline cache.",
+    )
+    parser.add_argument(
+        "--sample-pct", type=float, default=None,
+        help="With --approx, keep this percent of AKKIO_IDs (hash sample) and scale up. Unbiased, but every "
+             "micro-partition is still scanned: it saves aggregation work, not bytes read. Implies --approx.",
+    )
+    parser.add_argument(
+        "--sample-blocks", type=float, default=None, metavar="PCT",
+        help="With --approx, read only about this percent of FACT_TRANSACTION_ENRICHED micro-partitions "
+             "(SAMPLE BLOCK) and scale up, cutting bytes scanned; ID and shopper counts run high. "
+             "Combines with --sample-pct. Implies --approx.",
+    )
+    parser.add_argument(
+        "--plan-only", action="store_true",
+        help="EXPLAIN every validation query, print estimated partitions and bytes per audience "
+             "(and the budget decision), write audience_validation_plan.csv and exit without running anything.",
+    )
+    parser.add_argument(
+        "--max-query-gb", type=float, default=None,
+        help="Refuse (or downgrade, see --over-budget) validation queries EXPLAIN estimates to scan more than this.",
+    )
+    parser.add_argument(
+        "--max-run-gb", type=float, default=None,
+        help="Admit validation queries in config order until their estimated scans would exceed this in total.",
+    )
+    parser.add_argument(
+        "--over-budget", choices=sorted(OVER_BUDGET_ACTIONS), default="refuse",
+        help="What to do with over-budget queries: skip them, or run an approx preview on a block sample "
+             "if its estimate fits (default: %(default)s). Breakdowns, sweeps and significance are skipped "
+             "for either.",
+    )
+    parser.add_argument(
+        "--budget-sample-blocks", type=float, default=BUDGET_BLOCK_PCT, metavar="PCT",
+        help="Percent of micro-partitions read by approx previews from --over-budget approx "
+             "(SAMPLE BLOCK; default: %(default)s).",
+    )
+    parser.add_argument(
+        "--significance", action="store_true",
+        help="Add Poisson-bootstrap confidence intervals and p-values for the lift metrics.",
+    )
+    parser.add_argument(
+        "--replicates", type=int, default=BOOTSTRAP_REPLICATES,
+        help="Bootstrap replicates per audience with --significance (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--confidence", type=float, default=BOOTSTRAP_CONFIDENCE,
+        help="Confidence level of the bootstrap intervals (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="Look up server-side stats for every query and write audience_validation_profile.csv/.json.",
+    )
+    parser.add_argument(
+        "--max-in-flight", type=int, default=1,
+        help="Number of validation queries to run concurrently (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--query-timeout", type=int, default=None,
+        help="Cancel any validation query running longer than this many seconds.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None):
+    args = parse_args(argv)
+    run_started = time.time()
+
+    log.info("Loading config from %s", CONFIG_PATH)
+    audiences = load_audiences()
+    if args.brand_match:
+        audiences = [replace(aud, brand_match=args.brand_match) for aud in audiences]
+    if args.breakdown:
+        audiences = [replace(aud, breakdown=args.breakdown) for aud in audiences]
+    if args.sweep:
+        sweep = sweep_from_dict({
+            "mode": args.sweep, "step_days": args.sweep_step_days,
+            "count": args.sweep_count, "length_days": args.sweep_length_days,
+        })
+        audiences = [replace(aud, sweep=sweep) for aud in audiences]
+    log.info("Starting validation for %d audience(s)...", len(audiences))
+
+    if args.sketch_baselines and args.no_baseline_cache:
+        raise SystemExit("--sketch-baselines needs the baseline cache (drop --no-baseline-cache)")
+    baseline_cache = None
+    if not args.no_baseline_cache:
+        baseline_cache = BaselineCache(ttl_hours=args.baseline_cache_ttl_hours, sketches=args.sketch_baselines)
+
+    result_store = None
+    if not args.no_result_store:
+        result_store = ResultStore()
+
+    approx = None
+    if args.approx or args.sample_pct or args.sample_blocks:
+        if args.sample_pct is not None and not 0 < args.sample_pct <= 100:
+            raise SystemExit("--sample-pct must be in (0, 100]")
+        if args.sample_blocks is not None and not 0 < args.sample_blocks <= 100:
+            raise SystemExit("--sample-blocks must be in (0, 100]")
+        approx = ApproxSettings(sample_pct=args.sample_pct, block_pct=args.sample_blocks)
+
+    budget = None
+    if args.max_query_gb is not None or args.max_run_gb is not None:
+        if not 0 < args.budget_sample_blocks <= 100:
+            raise SystemExit("--budget-sample-blocks must be in (0, 100]")
+        budget = ScanBudget(
+            max_query_bytes=int(args.max_query_gb * 1024 ** 3) if args.max_query_gb is not None else None,
+            max_run_bytes=int(args.max_run_gb * 1024 ** 3) if args.max_run_gb is not None else None,
+            over_budget=args.over_budget,
+            block_pct=args.budget_sample_blocks,
+        )
+
+    scan_plan: list[dict] = []
+    row_positions: list[int] = []
+    df = validate_all(
+        audiences,
+        batched=args.batched,
+        baseline_cache=baseline_cache,
+        max_in_flight=args.max_in_flight,
+        query_timeout=args.query_timeout,
+        result_store=result_store,
+        force=args.force,
+        approx=approx,
+        rollup=not args.no_rollup,
+        budget=budget,
+        plan_only=args.plan_only,
+        scan_plan=scan_plan,
+        row_positions=row_positions,
+    )
+    if args.plan_only:
+        print_plan(df)
+        if not df.empty:
+            export_plan(df, OUTPUT_DIR)
+        return df
+
+    # Breakdowns, sweeps and significance scan each audience's full window
+    # exactly, so they are left out of approx previews and skipped for
+    # audiences the scan budget refused or downgraded
+    followup = list(enumerate(audiences))
+    if approx is not None:
+        followup = []
+        if args.significance or any(aud.breakdown or aud.sweep for aud in audiences):
+            log.warning("Approximate preview: skipping breakdowns, sweeps and significance")
+    elif scan_plan:
+        over = {row["AUDIENCE_INDEX"] for row in scan_plan if row["DECISION"] in ("refused", "approx")}
+        if over:
+            log.warning("Skipping breakdowns, sweeps and significance for %d audience(s) over the scan budget",
+                        len(over))
+        followup = [(idx, aud) for idx, aud in followup if idx not in over]
+    followup_audiences = [aud for _, aud in followup]
+
+    # Imported here: both modules import this one
+    from audience_significance import run_significance
+    from audience_sweep import export_sweep, run_sweeps
+
+    run_breakdowns(followup_audiences, OUTPUT_DIR, max_in_flight=args.max_in_flight,
+                   query_timeout=args.query_timeout)
+    sweep = run_sweeps(followup_audiences, max_in_flight=args.max_in_flight, query_timeout=args.query_timeout)
+    if not sweep.empty:
+        export_sweep(sweep, OUTPUT_DIR)
+
+    if args.significance and not df.empty and followup:
+        significance = run_significance(
+            followup_audiences,
+            replicates=args.replicates,
+            confidence=args.confidence,
+            max_in_flight=args.max_in_flight,
+            query_timeout=args.query_timeout,
+            positions=[idx for idx, _ in followup],
+        )
+        # Lined up on config position, not AUDIENCE_NAME: names may repeat
+        intervals = significance.set_index("AUDIENCE_INDEX").drop(columns="AUDIENCE_NAME")
+        df = pd.concat([df, intervals.reindex(row_positions).reset_index(drop=True)], axis=1)
+
+    profile = None
+    if args.profile and query_log(run_started):
+        conn = get_snowflake_connection()
+        try:
+            profile = profile_queries(conn, audiences[0], query_log(run_started))
+        finally:
+            conn.close()
+        export_profile(profile, OUTPUT_DIR, run_started)
 
-    df = validate_all(audiences)
-    print_summary(df)
+    print_summary(df, profile, approx)
 
     if not df.empty:
         export_csv(df, OUTPUT_DIR)
@@ -445,4 +3227,7 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    # Run the imported module, not __main__, so audience_sweep and
+    # audience_significance share its query log and in-flight cursors
+    import audience_validation
+    audience_validation.main()
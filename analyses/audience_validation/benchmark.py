@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+Audience Validation Benchmark
+=============================
+Measures validator performance without touching Snowflake. Synthetic
+FACT_TRANSACTION_ENRICHED, AUDIENCE_LOOKUP and AUDIENCE_METADATA tables are
+generated into a local DuckDB database (skewed brand and ID distributions,
+10^5 .. 10^9 fact rows), and validate_audience / validate_all run against it
+through a small connector adapter. Timings, peak memory and rows per second
+are written to a JSON results file meant to be diffed between commits.
+
+Usage:
+    python analyses/audience_validation/benchmark.py --rows 1e6
+    python benchmark.py --rows 1e8 --ids 1e7 --audiences 14 --repeat 5
+    python benchmark.py --rows 1e6 --scenarios single batched --out /tmp/before.json
+
+The generated database is kept under output/bench/ and reused while the
+generator parameters match (--regenerate forces a rebuild).
+
+Requires duckdb (pip install duckdb).
+"""
+
+import argparse
+import json
+import logging
+import re
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import replace
+from pathlib import Path
+from typing import Optional
+
+from audience_validation import (
+    CONFIG_PATH,
+    OUTPUT_DIR,
+    AudienceConfig,
+    BaselineCache,
+    ConnectionPool,
+    load_audiences,
+    log,
+    query_log,
+    validate_all,
+    validate_audience,
+)
+
+BENCH_DIR = OUTPUT_DIR / "bench"
+FACT_START = "2025-06-01"
+FACT_DAYS = 122                      # 2025-06-01 .. 2025-09-30
+WINDOW = ("2025-09-01", "2025-10-01")
+STORES_PER_BRAND = 5
+GENERATOR_VERSION = 2                # bump when generate() changes, so stale databases are rebuilt
+SCENARIOS = ("single", "sequential", "batched", "batched_cached", "concurrent", "dim", "rollup")
+
+
+# Connector adapter
+class DuckDBCursor:
+    """The slice of the snowflake.connector cursor API the validator uses, on DuckDB.
+
+    Translates pyformat binds (%(name)s -> $name, %% -> %) and Snowflake's
+    FLOAT (a double) to DuckDB's DOUBLE.
+    """
+
+    sfqid = None
+
+    def __init__(self, cur):
+        self._cur = cur
+        self.description = None
+
+    def execute(self, sql: str, params: Optional[dict] = None, timeout: Optional[int] = None):
+        params = params or {}
+        names = set(re.findall(r"%\((\w+)\)s", sql))
+        sql = re.sub(r"%\((\w+)\)s", r"$\1", sql).replace("%%", "%")
+        sql = re.sub(r"\bAS FLOAT\)", "AS DOUBLE)", sql)
+        self._cur.execute(sql, {name: params[name] for name in names})
+        self.description = self._cur.description
+        return self
+
+    def fetchall(self):
+        return self._cur.fetchall()
+
+    def fetchmany(self, size: int):
+        return self._cur.fetchmany(size)
+
+    def close(self) -> None:
+        self._cur.close()
+
+
+class DuckDBConnection:
+    """Connection stand-in; every cursor gets its own DuckDB connection, so threads are safe."""
+
+    def __init__(self, db):
+        self._db = db
+
+    def cursor(self) -> DuckDBCursor:
+        return DuckDBCursor(self._db.cursor())
+
+    def is_closed(self) -> bool:
+        return False
+
+    def close(self) -> None:
+        pass
+
+
+# Synthetic data
+def _keyword_sets(config_path: Path) -> list[list[str]]:
+    """Distinct brand keyword sets from audiences.yml, so synthetic audiences filter like real ones."""
+    seen, sets = set(), []
+    for aud in load_audiences(config_path):
+        key = tuple(sorted({kw.upper() for kw in aud.brand_keywords}))
+        if key not in seen:
+            seen.add(key)
+            sets.append(list(key))
+    return sets
+
+
+def _sql_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def generate(db, params: dict, keyword_sets: list[list[str]]) -> None:
+    """Create the DEMO.AFS_POC tables in db from params (rows, ids, brands, skews, audiences)."""
+    keywords = sorted({kw for ks in keyword_sets for kw in ks})
+    rows, ids, brands = params["rows"], params["ids"], params["brands"]
+    db.execute(f"SELECT setseed({params['seed']})")
+    db.execute("CREATE SCHEMA IF NOT EXISTS AFS_POC")
+
+    # Keyword brands are spread across the popularity ranks, each with a
+    # look-alike (e.g. ROSSMAN CPA for ROSS) to exercise substring matching
+    named = []
+    for i, kw in enumerate(keywords):
+        named.append(f"({(2 * i) * 7 % brands}, {_sql_literal(kw + ' STORES')})")
+        named.append(f"({(2 * i + 1) * 7 % brands}, {_sql_literal(kw + 'MAN CPA')})")
+    db.execute(f"""
+        CREATE OR REPLACE TABLE AFS_POC.BENCH_MERCHANTS AS
+        WITH NAMED(B, NAME) AS (VALUES {", ".join(named)})
+        SELECT
+          B.i AS B,
+          S.i AS S,
+          COALESCE(ANY_VALUE(N.NAME), 'MERCHANT ' || LPAD(CAST(B.i AS VARCHAR), 7, '0')) AS BRAND_NAME
+        FROM range({brands}) AS B(i)
+        CROSS JOIN range({STORES_PER_BRAND}) AS S(i)
+        LEFT JOIN NAMED AS N ON N.B = B.i
+        GROUP BY B.i, S.i
+    """)
+
+    log.warning("Generating %s fact rows (%s IDs, %s brands)...", f"{rows:,}", f"{ids:,}", f"{brands:,}")
+    started = time.perf_counter()
+    db.execute(f"""
+        CREATE OR REPLACE TABLE AFS_POC.FACT_TRANSACTION_ENRICHED AS
+        WITH R AS (
+          SELECT
+            i,
+            CAST(FLOOR(POW(random(), {params['brand_skew']}) * {brands}) AS BIGINT) AS B,
+            CAST(FLOOR(random() * {STORES_PER_BRAND}) AS BIGINT)                  AS S,
+            CAST(FLOOR(POW(random(), {params['id_skew']}) * {ids}) AS BIGINT)     AS A,
+            random() AS R1,
+            random() AS R2,
+            random() AS R3
+          FROM range({rows}) AS T(i)
+        )
+        SELECT
+          'T' || R.i                                                    AS TXID,
+          DATE '{FACT_START}' + CAST(FLOOR(R.R1 * {FACT_DAYS}) AS INTEGER) AS TRANS_DATE,
+          'ID' || R.A                                                   AS AKKIO_ID,
+          ROUND(2 + R.R2 * R.R2 * 250, 2)                               AS TRANS_AMOUNT,
+          M.BRAND_NAME                                                  AS BRAND_NAME,
+          M.BRAND_NAME || ' STORE ' || R.S                              AS STORE_NAME,
+          M.BRAND_NAME || ' #' || (R.B * {STORES_PER_BRAND} + R.S)      AS MERCHANT_DESCRIPTION,
+          CASE WHEN R.B % 50 = 49 THEN NULL ELSE R.B END                AS BRAND_ID,
+          CASE WHEN R.B % 50 = 49 THEN NULL ELSE R.B * {STORES_PER_BRAND} + R.S END AS STORE_ID,
+          'M' || (R.B * {STORES_PER_BRAND} + R.S)                       AS MTID,
+          CASE WHEN R.R3 < 0.3 THEN 'ONLINE' ELSE 'B&M' END             AS TRANSACTION_CHANNEL,
+          CASE WHEN R.R3 < 0.05 THEN 'CONTROL' WHEN R.R3 < 0.10 THEN 'EXPOSED' END AS EXPERIMENT_GROUP,
+          ['CA', 'TX', 'NY', 'FL', 'IL', 'PA'][1 + CAST(FLOOR(R.R2 * 6) AS INTEGER)] AS MERCHANT_STATE
+        FROM R
+        JOIN AFS_POC.BENCH_MERCHANTS AS M
+          ON M.B = R.B AND M.S = R.S
+    """)
+    log.warning("  fact table built in %.1fs", time.perf_counter() - started)
+
+    # Audiences: a hashed sample of IDs at the latest version, plus an older,
+    # smaller version that MAX(ver) must skip
+    db.execute("CREATE OR REPLACE TABLE AFS_POC.AUDIENCE_METADATA (AUDIENCE_ID VARCHAR, VER INTEGER)")
+    db.execute("CREATE OR REPLACE TABLE AFS_POC.AUDIENCE_LOOKUP (AUDIENCE_ID VARCHAR, VER INTEGER, AKKIO_ID VARCHAR)")
+    pct = params["audience_pct"]
+    for k in range(params["audiences"]):
+        aud_id = f"bench_audience_{k:03d}"
+        db.execute(f"INSERT INTO AFS_POC.AUDIENCE_METADATA VALUES ('{aud_id}', 1), ('{aud_id}', 2)")
+        db.execute(f"""
+            INSERT INTO AFS_POC.AUDIENCE_LOOKUP
+            SELECT '{aud_id}', CASE WHEN hash(i, {k}) % 1000 < {pct * 2.5} THEN 1 ELSE 2 END, 'ID' || i
+            FROM range({ids}) AS T(i)
+            WHERE hash(i, {k}) % 1000 < {pct * 10}
+        """)
+
+    # Brand keyword dimension (models/afs/dim_brand_keyword_match.sql) for brand_match: dim
+    db.execute(f"""
+        CREATE OR REPLACE TABLE AFS_POC.BRAND_KEYWORDS AS
+        SELECT * FROM (VALUES {", ".join(f"({_sql_literal(kw)})" for kw in keywords)}) AS K(KEYWORD)
+    """)
+    db.execute(f"""
+        CREATE OR REPLACE TABLE AFS_POC.DIM_BRAND_KEYWORD_MATCH AS
+        SELECT
+          K.KEYWORD,
+          'M' || (M.B * {STORES_PER_BRAND} + M.S)                                     AS MTID,
+          CASE WHEN M.B % 50 = 49 THEN NULL ELSE M.B * {STORES_PER_BRAND} + M.S END AS STORE_ID,
+          CASE WHEN M.B % 50 = 49 THEN NULL ELSE M.B END                            AS BRAND_ID,
+          CASE WHEN M.B % 50 = 49 THEN -1 ELSE M.B * {STORES_PER_BRAND} + M.S END   AS STORE_ID_KEY,
+          CASE WHEN M.B % 50 = 49 THEN -1 ELSE M.B END                              AS BRAND_ID_KEY,
+          TRUE                                                                      AS MATCHED_BRAND_NAME
+        FROM AFS_POC.BENCH_MERCHANTS AS M
+        CROSS JOIN AFS_POC.BRAND_KEYWORDS AS K
+        WHERE UPPER(M.BRAND_NAME) LIKE '%' || K.KEYWORD || '%'
+    """)
+
+    # Monthly pre-aggregate (models/afs/fact_brand_month_summary.sql) for routing
+    db.execute("""
+        CREATE OR REPLACE TABLE AFS_POC.FACT_BRAND_MONTH_SUMMARY AS
+        SELECT
+          CAST(DATE_TRUNC('MONTH', TRANS_DATE) AS DATE) AS TRANS_MONTH,
+          AKKIO_ID,
+          BRAND_ID,
+          COALESCE(BRAND_ID, -1)                        AS BRAND_ID_KEY,
+          EXPERIMENT_GROUP,
+          COUNT(TXID)                                   AS TRANSACTION_COUNT,
+          COALESCE(SUM(TRANS_AMOUNT), 0)                AS TOTAL_SPEND,
+          MIN(TRANS_DATE)                               AS FIRST_TRANS_DATE,
+          MAX(TRANS_DATE)                               AS LAST_TRANS_DATE
+        FROM AFS_POC.FACT_TRANSACTION_ENRICHED
+        GROUP BY ALL
+    """)
+
+    db.execute("CREATE OR REPLACE TABLE AFS_POC.BENCH_PARAMS AS SELECT ? AS PARAMS", [json.dumps(params, sort_keys=True)])
+
+
+def open_database(params: dict, keyword_sets: list[list[str]], regenerate: bool = False):
+    """Open (generating if needed) the DuckDB file for params. The catalog is named DEMO."""
+    import duckdb
+
+    tag = f"r{params['rows']}_i{params['ids']}_b{params['brands']}_a{params['audiences']}_s{params['seed']}"
+    path = BENCH_DIR / tag / "DEMO.duckdb"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if regenerate and path.exists():
+        path.unlink()
+    db = duckdb.connect(str(path))
+    try:
+        stored = db.execute("SELECT PARAMS FROM AFS_POC.BENCH_PARAMS").fetchone()[0]
+    except duckdb.Error:
+        stored = None
+    if stored != json.dumps(params, sort_keys=True):
+        generate(db, params, keyword_sets)
+    else:
+        log.warning("Reusing synthetic database %s", path)
+    return db
+
+
+# Scenarios
+def _audiences(params: dict, keyword_sets: list[list[str]]) -> list[AudienceConfig]:
+    return [
+        AudienceConfig(
+            audience_id=f"bench_audience_{k:03d}",
+            name=f"Bench {k:03d} ({'/'.join(keyword_sets[k % len(keyword_sets)][:2])})",
+            brand_keywords=keyword_sets[k % len(keyword_sets)],
+            date_start=WINDOW[0],
+            date_end=WINDOW[1],
+        )
+        for k in range(params["audiences"])
+    ]
+
+
+def _scenario(name: str, db, audiences: list[AudienceConfig], cache_dir: Path, concurrency: int):
+    """Return (setup, run) callables for a scenario; setup runs untimed before each repetition.
+
+    Every scenario but 'rollup' reads the detail table (rollup=False).
+    """
+    factory = lambda: DuckDBConnection(db)  # noqa: E731
+    state: dict = {}
+
+    if name == "single":
+        return (lambda: None), (lambda: validate_audience(factory(), audiences[0]))
+    if name == "sequential":
+        return (lambda: None), (lambda: validate_all(audiences, pool=ConnectionPool(1, factory), rollup=False))
+    if name == "batched":
+        return (lambda: None), (lambda: validate_all(
+            audiences, batched=True, pool=ConnectionPool(1, factory), rollup=False))
+    if name == "batched_cached":
+        def setup():
+            state["cache"] = BaselineCache(path=cache_dir / "baselines.json")
+            state["cache"].resolve(factory(), audiences)
+        return setup, (lambda: validate_all(
+            audiences, batched=True, baseline_cache=state["cache"], pool=ConnectionPool(1, factory), rollup=False))
+    if name == "concurrent":
+        return (lambda: None), (lambda: validate_all(
+            audiences, max_in_flight=concurrency, pool=ConnectionPool(concurrency, factory), rollup=False))
+    if name == "dim":
+        dim_audiences = [replace(aud, brand_match="dim") for aud in audiences]
+        return (lambda: None), (lambda: validate_all(
+            dim_audiences, batched=True, pool=ConnectionPool(1, factory), rollup=False))
+    if name == "rollup":
+        return (lambda: None), (lambda: validate_all(audiences, pool=ConnectionPool(1, factory)))
+    raise ValueError(f"Unknown scenario '{name}'")
+
+
+def run_scenario(name: str, setup, run, repeat: int, window_rows: int) -> dict:
+    """Time run() repeat times, then once more under tracemalloc for peak Python memory."""
+    timings = []
+    queries = 0
+    for _ in range(repeat):
+        setup()
+        since = time.time()
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+        queries = len(query_log(since))
+
+    setup()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    median = statistics.median(timings)
+    result = {
+        "runs_s": [round(t, 4) for t in timings],
+        "median_s": round(median, 4),
+        "min_s": round(min(timings), 4),
+        "queries": queries,
+        "window_rows_per_s": round(window_rows / median) if median else None,
+        "python_peak_mb": round(peak / 2**20, 2),
+    }
+    log.warning("%-15s median %8.3fs  min %8.3fs  %4d quer(ies)  %12s window rows/s  %7.1f MB peak",
+                name, result["median_s"], result["min_s"], queries,
+                f"{result['window_rows_per_s']:,}", result["python_peak_mb"])
+    return result
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=Path(__file__).resolve().parent, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Main
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    count = lambda v: int(float(v))  # noqa: E731  (accepts 1e6)
+    parser = argparse.ArgumentParser(description="Benchmark the audience validator on synthetic data in DuckDB.")
+    parser.add_argument("--rows", type=count, default=10**6, help="Fact rows (default: %(default)s).")
+    parser.add_argument("--ids", type=count, default=None, help="Distinct AKKIO_IDs (default: rows / 20).")
+    parser.add_argument("--brands", type=count, default=2000, help="Distinct brands (default: %(default)s).")
+    parser.add_argument("--brand-skew", type=float, default=3.0,
+                        help="Brand popularity skew; 1 = uniform (default: %(default)s).")
+    parser.add_argument("--id-skew", type=float, default=1.5,
+                        help="Transactions-per-ID skew; 1 = uniform (default: %(default)s).")
+    parser.add_argument("--audiences", type=int, default=14, help="Synthetic audiences (default: %(default)s).")
+    parser.add_argument("--audience-pct", type=float, default=10.0,
+                        help="Percent of IDs in each audience (default: %(default)s).")
+    parser.add_argument("--seed", type=float, default=0.42, help="Generator seed in [0, 1] (default: %(default)s).")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per scenario (default: %(default)s).")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="max_in_flight for the concurrent scenario (default: %(default)s).")
+    parser.add_argument("--config", type=Path, default=CONFIG_PATH, help="audiences.yml to take keyword sets from.")
+    parser.add_argument("--regenerate", action="store_true", help="Rebuild the synthetic database.")
+    parser.add_argument("--out", type=Path, default=BENCH_DIR / "benchmark_results.json", help="Results file.")
+    parser.add_argument("--verbose", action="store_true", help="Keep the validator's INFO logging.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None):
+    args = parse_args(argv)
+    if not args.verbose:
+        log.setLevel(logging.WARNING)
+
+    params = {
+        "generator": GENERATOR_VERSION,
+        "rows": args.rows,
+        "ids": args.ids or max(1, args.rows // 20),
+        "brands": args.brands,
+        "brand_skew": args.brand_skew,
+        "id_skew": args.id_skew,
+        "audiences": args.audiences,
+        "audience_pct": args.audience_pct,
+        "seed": args.seed,
+    }
+    keyword_sets = _keyword_sets(args.config)
+    db = open_database(params, keyword_sets, regenerate=args.regenerate)
+    window_rows = db.execute(
+        "SELECT COUNT(*) FROM AFS_POC.FACT_TRANSACTION_ENRICHED WHERE TRANS_DATE >= ? AND TRANS_DATE < ?",
+        list(WINDOW),
+    ).fetchone()[0]
+    audiences = _audiences(params, keyword_sets)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for name in args.scenarios:
+            setup, run = _scenario(name, db, audiences, Path(cache_dir), args.concurrency)
+            results[name] = run_scenario(name, setup, run, args.repeat, window_rows)
+
+    import duckdb
+    report = {
+        "commit": _git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "engine": f"duckdb {duckdb.__version__}",
+        "python": sys.version.split()[0],
+        "params": params,
+        "window": list(WINDOW),
+        "window_rows": window_rows,
+        "repeat": args.repeat,
+        "process_max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "scenarios": results,
+    }
+    args.out.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write("\n")
+    log.warning("Benchmark results written to %s", args.out)
+    db.close()
+    return report
+
+
+if __name__ == "__main__":
+    main()
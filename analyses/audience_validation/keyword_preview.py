@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Brand Keyword Preview
+=====================
+Shows what each brand keyword in audiences.yml actually matches, without
+running a validation. A compact snapshot of the distinct merchant strings
+(BRAND_NAME, STORE_NAME, MERCHANT_DESCRIPTION + mtid / store_id / brand_id)
+and their transaction counts is pulled from FACT_TRANSACTION_ENRICHED once and
+cached locally; every later preview runs offline against that snapshot.
+
+All keywords are matched in a single pass with an Aho-Corasick automaton,
+using the validator's rule (case-insensitive substring on any of the three
+columns). Partial-word hits — e.g. ROSS inside ROSSMAN — are flagged.
+
+Usage:
+    python analyses/audience_validation/keyword_preview.py
+    python keyword_preview.py ROSS TJMAXX          # ad-hoc keywords
+    python keyword_preview.py --refresh            # rebuild the snapshot
+    python keyword_preview.py --emit-ids           # write brand_keyword_ids.json
+
+--emit-ids writes the resolved (mtid, store_id, brand_id) keys per keyword to
+output/brand_keyword_ids.json; audiences with `brand_match: ids` then push
+them down as IN-lists instead of LIKE scans. The file carries the fact table
+fingerprint (MAX(TRANS_DATE), row count) the snapshot was built at; once the
+table changes, the validator falls back to LIKE until the snapshot is rebuilt
+with --refresh.
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from collections import deque
+from dataclasses import replace
+from pathlib import Path
+from typing import Iterator, Optional
+
+import pandas as pd
+
+from audience_validation import (
+    CONFIG_PATH,
+    OUTPUT_DIR,
+    BRAND_KEYWORD_IDS_PATH,
+    AudienceConfig,
+    _render_sql,
+    _run_query,
+    fact_fingerprint,
+    get_snowflake_connection,
+    load_audiences,
+    log,
+)
+
+SNAPSHOT_DIR = OUTPUT_DIR / "cache"
+MATCH_COLUMNS = ("BRAND_NAME", "STORE_NAME", "MERCHANT_DESCRIPTION")
+
+MERCHANT_SNAPSHOT_SQL = """
+SELECT
+  F.BRAND_NAME,
+  F.STORE_NAME,
+  F.MERCHANT_DESCRIPTION,
+  F.MTID,
+  F.STORE_ID,
+  F.BRAND_ID,
+  COUNT(*)                          AS TRANSACTIONS,
+  COALESCE(SUM(F.TRANS_AMOUNT), 0)  AS SPEND
+FROM __FACT_DB__.__FACT_SCHEMA__.FACT_TRANSACTION_ENRICHED AS F
+WHERE F.TRANS_DATE >= %(date_start)s
+  AND F.TRANS_DATE <  %(date_end)s
+GROUP BY F.BRAND_NAME, F.STORE_NAME, F.MERCHANT_DESCRIPTION, F.MTID, F.STORE_ID, F.BRAND_ID;
+"""
+
+
+# Multi-pattern matcher
+class KeywordAutomaton:
+    """Aho-Corasick automaton over upper-cased keywords.
+
+    iter_matches() reports every (keyword, start) occurrence in one left-to-right
+    pass, regardless of how many keywords are loaded.
+    """
+
+    def __init__(self, keywords: list[str]):
+        self.keywords = sorted({kw.upper() for kw in keywords if kw})
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[list[int]] = [[]]
+
+        for idx, kw in enumerate(self.keywords):
+            state = 0
+            for ch in kw:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                    self._goto[state][ch] = nxt
+                state = nxt
+            self._out[state].append(idx)
+
+        pending = deque(self._goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for ch, nxt in self._goto[state].items():
+                pending.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def iter_matches(self, text: str) -> Iterator[tuple[str, int]]:
+        state = 0
+        for pos, ch in enumerate(text.upper()):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            for idx in self._out[state]:
+                kw = self.keywords[idx]
+                yield kw, pos - len(kw) + 1
+
+
+def _is_whole_word(text: str, start: int, length: int) -> bool:
+    """True if the match is not glued to other letters/digits (ROSS in 'ROSS STORES', not 'ROSSMAN')."""
+    before = text[start - 1] if start > 0 else " "
+    after = text[start + length] if start + length < len(text) else " "
+    return not (before.isalnum() or after.isalnum())
+
+
+# Snapshot
+def snapshot_path(audience: AudienceConfig) -> Path:
+    name = "_".join(
+        re.sub(r"[^A-Za-z0-9-]", "", part)
+        for part in (audience.fact_database, audience.fact_schema, audience.date_start, audience.date_end)
+    )
+    return SNAPSHOT_DIR / f"merchant_snapshot_{name}.parquet"
+
+
+def load_snapshot(audience: AudienceConfig, refresh: bool = False) -> tuple[pd.DataFrame, Optional[list]]:
+    """Return the merchant-string snapshot for the audience's fact table and window, building it if needed.
+
+    Also returns the fact_fingerprint() taken when the snapshot was built
+    (kept beside it as JSON), or None for snapshots that predate it.
+    """
+    path = snapshot_path(audience)
+    meta_path = path.with_suffix(".json")
+    if path.exists() and not refresh:
+        log.info("Using merchant snapshot %s (built %s)", path,
+                 time.strftime("%Y-%m-%d %H:%M", time.localtime(path.stat().st_mtime)))
+        fingerprint = None
+        if meta_path.exists():
+            with open(meta_path) as f:
+                fingerprint = json.load(f).get("fact_fingerprint")
+        return pd.read_parquet(path), fingerprint
+
+    log.info("Building merchant snapshot from %s.%s.FACT_TRANSACTION_ENRICHED (%s to %s)...",
+             audience.fact_database, audience.fact_schema, audience.date_start, audience.date_end)
+    conn = get_snowflake_connection()
+    try:
+        # Taken first: rows loaded mid-build make it stale (safe), never too new
+        fingerprint = fact_fingerprint(conn, audience)
+        df = _run_query(
+            conn,
+            _render_sql(MERCHANT_SNAPSHOT_SQL, audience),
+            {"date_start": audience.date_start, "date_end": audience.date_end},
+        )
+    finally:
+        conn.close()
+
+    for col in MATCH_COLUMNS:
+        df[col] = df[col].astype("string")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    df.to_parquet(path, index=False)
+    with open(meta_path, "w") as f:
+        json.dump({"fact_fingerprint": fingerprint}, f)
+    log.info("Snapshot saved to %s (%d distinct merchant tuples)", path, len(df))
+    return df, fingerprint
+
+
+# Matching
+def match_keywords(snapshot: pd.DataFrame, keywords: list[str]) -> pd.DataFrame:
+    """Match every keyword against the snapshot in one pass.
+
+    Returns one row per (keyword, merchant tuple) with the columns that
+    matched, whether any match was a whole word, and the tuple's weights.
+    """
+    automaton = KeywordAutomaton(keywords)
+    records = []
+    for row in snapshot.itertuples(index=False):
+        hits: dict[str, dict] = {}
+        for col in MATCH_COLUMNS:
+            text = getattr(row, col)
+            if text is None or pd.isna(text):
+                continue
+            text = str(text).upper()
+            for kw, start in automaton.iter_matches(text):
+                hit = hits.setdefault(kw, {"columns": set(), "whole_word": False})
+                hit["columns"].add(col)
+                hit["whole_word"] = hit["whole_word"] or _is_whole_word(text, start, len(kw))
+        for kw, hit in hits.items():
+            records.append({
+                "KEYWORD": kw,
+                "BRAND_NAME": row.BRAND_NAME,
+                "STORE_NAME": row.STORE_NAME,
+                "MERCHANT_DESCRIPTION": row.MERCHANT_DESCRIPTION,
+                "MTID": row.MTID,
+                "STORE_ID": row.STORE_ID,
+                "BRAND_ID": row.BRAND_ID,
+                "MATCHED_ON": ",".join(c for c in MATCH_COLUMNS if c in hit["columns"]),
+                "WHOLE_WORD": hit["whole_word"],
+                "TRANSACTIONS": row.TRANSACTIONS,
+                "SPEND": row.SPEND,
+            })
+
+    columns = ["KEYWORD", *MATCH_COLUMNS, "MTID", "STORE_ID", "BRAND_ID",
+               "MATCHED_ON", "WHOLE_WORD", "TRANSACTIONS", "SPEND"]
+    matches = pd.DataFrame(records, columns=columns)
+    return matches.sort_values(["KEYWORD", "TRANSACTIONS"], ascending=[True, False], ignore_index=True)
+
+
+def print_preview(matches: pd.DataFrame, keywords: list[str], top: int) -> None:
+    """Print per-keyword totals and the heaviest matched merchants."""
+    for kw in sorted({k.upper() for k in keywords}):
+        kw_matches = matches[matches["KEYWORD"] == kw]
+        partial = kw_matches[~kw_matches["WHOLE_WORD"]]
+        print("\n" + "=" * 80)
+        print(f"  {kw}: {len(kw_matches):,} merchant tuple(s), "
+              f"{int(kw_matches['TRANSACTIONS'].sum()):,} transaction(s)")
+        if not partial.empty:
+            print(f"  ! {len(partial):,} partial-word match(es) covering "
+                  f"{int(partial['TRANSACTIONS'].sum()):,} transaction(s)")
+        print("=" * 80)
+        if kw_matches.empty:
+            print("  (no matches)")
+            continue
+        by_label = (
+            kw_matches
+            .assign(LABEL=kw_matches["BRAND_NAME"].fillna(kw_matches["MERCHANT_DESCRIPTION"]).fillna("—"))
+            .groupby(["LABEL", "WHOLE_WORD"], as_index=False)["TRANSACTIONS"].sum()
+            .sort_values("TRANSACTIONS", ascending=False)
+            .head(top)
+        )
+        for _, row in by_label.iterrows():
+            flag = "" if row["WHOLE_WORD"] else "  [partial]"
+            print(f"  {int(row['TRANSACTIONS']):>12,}  {row['LABEL']}{flag}")
+
+
+def emit_ids(matches: pd.DataFrame, keywords: list[str], audience: AudienceConfig,
+             fingerprint: Optional[list], path: Path = BRAND_KEYWORD_IDS_PATH) -> Path:
+    """Write the resolved merchant keys per keyword for brand_match: ids, stamped with the snapshot's fingerprint.
+
+    A keyword that matches merchant tuples without an MTID can't be expressed
+    as key IN-lists, so it is left out and its audiences fall back to LIKE.
+    """
+    resolved = {}
+    for kw in sorted({k.upper() for k in keywords}):
+        kw_matches = matches[matches["KEYWORD"] == kw]
+        unkeyed = kw_matches[kw_matches["MTID"].isna()]
+        if not unkeyed.empty:
+            log.warning("%s matches %d merchant tuple(s) (%d transaction(s)) without an MTID; "
+                        "not resolving it, so brand_match: ids uses LIKE for it",
+                        kw, len(unkeyed), int(unkeyed["TRANSACTIONS"].sum()))
+            continue
+        keys = {
+            (str(r.MTID), None if pd.isna(r.STORE_ID) else int(r.STORE_ID),
+             None if pd.isna(r.BRAND_ID) else int(r.BRAND_ID))
+            for r in kw_matches.itertuples(index=False)
+        }
+        resolved[kw] = sorted(keys, key=lambda k: (k[0], k[1] or -1, k[2] or -1))
+
+    payload = {
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "fact_database": audience.fact_database,
+        "fact_schema": audience.fact_schema,
+        "date_start": audience.date_start,
+        "date_end": audience.date_end,
+        "fact_fingerprint": fingerprint,
+        "keywords": resolved,
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=1)
+    log.info("Resolved merchant keys for %d keyword(s) written to %s", len(resolved), path)
+    return path
+
+
+# Main
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Preview what brand keywords match, offline.")
+    parser.add_argument("keywords", nargs="*",
+                        help="Keywords to preview (default: every brand_keyword in audiences.yml).")
+    parser.add_argument("--config", type=Path, default=CONFIG_PATH, help="Audience config file.")
+    parser.add_argument("--date-start", help="Snapshot window start (default: first audience's date_start).")
+    parser.add_argument("--date-end", help="Snapshot window end (default: first audience's date_end).")
+    parser.add_argument("--refresh", action="store_true", help="Rebuild the merchant snapshot.")
+    parser.add_argument("--top", type=int, default=15, help="Merchants to show per keyword.")
+    parser.add_argument("--emit-ids", action="store_true",
+                        help="Write resolved merchant keys for brand_match: ids.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None):
+    args = parse_args(argv)
+    audiences = load_audiences(args.config)
+    keywords = args.keywords or sorted({kw.upper() for aud in audiences for kw in aud.brand_keywords})
+
+    # Snapshot scope: the first audience's fact table / window unless overridden
+    scope = audiences[0]
+    if args.date_start or args.date_end:
+        scope = replace(scope, date_start=args.date_start or scope.date_start,
+                        date_end=args.date_end or scope.date_end)
+
+    snapshot, fingerprint = load_snapshot(scope, refresh=args.refresh)
+    started = time.perf_counter()
+    matches = match_keywords(snapshot, keywords)
+    log.info("Matched %d keyword(s) against %d merchant tuple(s) in %.2fs",
+             len(keywords), len(snapshot), time.perf_counter() - started)
+
+    print_preview(matches, keywords, args.top)
+
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    csv_path = OUTPUT_DIR / "keyword_preview.csv"
+    matches.to_csv(csv_path, index=False)
+    log.info("Matched merchants exported to %s", csv_path)
+
+    if args.emit_ids:
+        if fingerprint is None:
+            log.warning("Snapshot predates fact fingerprints; brand_match: ids will fall back to LIKE "
+                        "until it is rebuilt with --refresh")
+        emit_ids(matches, keywords, scope, fingerprint)
+
+    return matches
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() is not None else 1)
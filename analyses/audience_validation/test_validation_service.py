@@ -0,0 +1,129 @@
+"""Tests for validation_service.py against an in-process stand-in connection (--connection-factory)."""
+
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+import yaml
+
+import audience_validation
+import validation_service
+
+POOL_SIZE = 3
+AUDIENCES = [
+    {'audience_id': 'akkio_audience_ross', 'name': 'Ross', 'brand_keywords': ['ROSS']},
+    {'audience_id': 'akkio_audience_target', 'name': 'Target', 'brand_keywords': ['TARGET']},
+]
+CONNECTIONS = []
+
+
+class StandInCursor:
+    """Answers validation queries with one canned row; every other query returns no rows."""
+
+    def __init__(self):
+        self.description = [('VALUE',)]
+        self.rows = []
+
+    def execute(self, sql, params=None, timeout=None):
+        self.description, self.rows = [('VALUE',)], []
+        if 'TOTAL_LAL' in sql and params and 'audience_id' in params:
+            self.description = [('AUDIENCE_ID',), ('BRAND_SHOPPERS',), ('QUERY_TIMEOUT',)]
+            self.rows = [(params['audience_id'], 42, timeout)]
+        return self
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class StandInConnection:
+    def __init__(self):
+        self.closed = False
+
+    def cursor(self):
+        return StandInCursor()
+
+    def is_closed(self):
+        return self.closed
+
+    def close(self):
+        self.closed = True
+
+
+def connect():
+    conn = StandInConnection()
+    CONNECTIONS.append(conn)
+    return conn
+
+
+@pytest.fixture
+def service(tmp_path):
+    CONNECTIONS.clear()
+    config = tmp_path / 'audiences.yml'
+    config.write_text(yaml.safe_dump({
+        'defaults': {'date_start': '2025-09-01', 'date_end': '2025-10-01'},
+        'audiences': AUDIENCES,
+    }))
+    args = validation_service.parse_args(['--config', str(config), '--pool-size', str(POOL_SIZE),
+                                          '--connection-factory', f'{__name__}:connect'])
+    svc = validation_service.ValidationService(
+        args.config,
+        pool_size=args.pool_size,
+        connection_factory=validation_service._load_factory(args.connection_factory),
+        baseline_cache=audience_validation.BaselineCache(path=tmp_path / 'baseline_cache.json'),
+        result_store=audience_validation.ResultStore(tmp_path / 'results.sqlite'),
+    )
+    svc.pool.warm()
+    server = validation_service.make_server(svc, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_address[1]}'
+
+    def call(path, body=None):
+        data = None if body is None else json.dumps(body).encode()
+        try:
+            with urllib.request.urlopen(urllib.request.Request(base + path, data=data)) as resp:
+                return resp.status, json.load(resp)
+        except urllib.error.HTTPError as exc:
+            return exc.code, json.load(exc)
+    yield call
+    server.shutdown()
+    server.server_close()
+    svc.close()
+
+
+def test_pool_is_warm_before_the_first_request(service):
+    assert len(CONNECTIONS) == POOL_SIZE
+    status, body = service('/stats')
+    assert status == 200
+    assert body['pool'] == {'size': POOL_SIZE, 'open': POOL_SIZE, 'idle': POOL_SIZE}
+
+
+def test_validates_configured_audiences_on_pooled_connections(service):
+    status, body = service('/validate', {'audiences': ['Ross', 'akkio_audience_target'], 'query_timeout': 30})
+    assert status == 200
+    assert [row['AUDIENCE_ID'] for row in body['results']] == ['akkio_audience_ross', 'akkio_audience_target']
+    assert [row['QUERY_TIMEOUT'] for row in body['results']] == [30, 30]
+    assert len(CONNECTIONS) == POOL_SIZE
+
+
+@pytest.mark.parametrize('query_timeout', [0, -5, 'soon', True, [30]])
+def test_rejects_query_timeout_that_is_not_a_positive_number(service, query_timeout):
+    status, body = service('/validate', {'audiences': ['Ross'], 'query_timeout': query_timeout})
+    assert status == 400
+    assert 'query_timeout' in body['error']
+
+
+def test_brand_keyword_ids_reload_when_the_file_changes(tmp_path):
+    path = tmp_path / 'brand_keyword_ids.json'
+    assert audience_validation.load_brand_keyword_ids(path) is None
+    path.write_text(json.dumps({'keywords': {'ROSS': []}}))
+    assert set(audience_validation.load_brand_keyword_ids(path)['keywords']) == {'ROSS'}
+    path.write_text(json.dumps({'keywords': {'ROSS': [], 'TARGET': []}}))
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert set(audience_validation.load_brand_keyword_ids(path)['keywords']) == {'ROSS', 'TARGET'}
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Audience Validation Service
+===========================
+Long-running HTTP/JSON front end for audience_validation.py. Keeps a pool of
+keep-alive Snowflake connections, the parsed audiences.yml, the baseline cache
+and the result store warm between requests, so ad-hoc validations skip login,
+warehouse resume and cold metadata costs.
+
+Usage:
+    python analyses/audience_validation/validation_service.py --port 8765 --pool-size 4
+
+    # Configured audiences by name or audience_id
+    curl -s localhost:8765/validate -d '{"audiences": ["Ross Seed Audience Lookalike - Final"]}'
+
+    # Ad-hoc AudienceConfig payloads (merged over audiences.yml defaults)
+    curl -s localhost:8765/validate \\
+        -d '{"audiences": [{"audience_id": "akkio_audience_...", "name": "Adhoc", "brand_keywords": ["ROSS"]}],
+             "batched": true}'
+
+    curl -s localhost:8765/stats
+
+Endpoints:
+    GET  /health      liveness
+    GET  /audiences   configured audiences (audiences.yml is reloaded when it changes)
+    GET  /stats       request counts, p50 / p99 latency per endpoint, pool and cache sizes
+    POST /validate    {"audiences": [...], "batched": false, "force": false, "query_timeout": 300}
+
+All --pool-size connections are opened at startup, so the first requests
+don't pay for logins. The output/brand_keyword_ids.json merchant keys are
+reloaded whenever keyword_preview.py --emit-ids rewrites the file.
+
+--connection-factory module:callable swaps in any zero-argument connection
+factory (e.g. a local stand-in connector for testing; test_validation_service.py
+uses one: python -m pytest analyses/audience_validation).
+"""
+
+import argparse
+import importlib
+import json
+import math
+import threading
+import time
+from collections import deque
+from dataclasses import asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+import yaml
+
+from audience_validation import (
+    CONFIG_PATH,
+    AudienceConfig,
+    BaselineCache,
+    ConnectionPool,
+    ResultStore,
+    _json_scalar,
+    audience_from_dict,
+    cancel_in_flight,
+    get_snowflake_connection,
+    log,
+    validate_all,
+)
+
+LATENCY_WINDOW = 10_000  # most recent requests per endpoint kept for percentiles
+
+
+class LatencyStats:
+    """Per-endpoint request counts and latency percentiles over a sliding window."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples: dict[str, deque] = {}
+        self._counts: dict[str, dict[str, int]] = {}
+        self._window = window
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, seconds: float, ok: bool) -> None:
+        with self._lock:
+            self._samples.setdefault(endpoint, deque(maxlen=self._window)).append(seconds)
+            counts = self._counts.setdefault(endpoint, {"requests": 0, "errors": 0})
+            counts["requests"] += 1
+            counts["errors"] += 0 if ok else 1
+
+    @staticmethod
+    def _percentile(ordered: list[float], pct: float) -> float:
+        """Nearest-rank percentile of an already sorted, non-empty list."""
+        rank = max(1, math.ceil(pct / 100 * len(ordered)))
+        return ordered[rank - 1]
+
+    def summary(self) -> dict:
+        with self._lock:
+            out = {}
+            for endpoint, samples in self._samples.items():
+                ordered = sorted(samples)
+                out[endpoint] = {
+                    **self._counts[endpoint],
+                    "p50_ms": round(self._percentile(ordered, 50) * 1000, 1),
+                    "p99_ms": round(self._percentile(ordered, 99) * 1000, 1),
+                    "max_ms": round(ordered[-1] * 1000, 1),
+                }
+            return out
+
+
+class ValidationService:
+    """Warm state shared by every request: connection pool, config, caches and stats."""
+
+    def __init__(
+        self,
+        config_path: Path = CONFIG_PATH,
+        pool_size: int = 4,
+        connection_factory=None,
+        baseline_cache: Optional[BaselineCache] = None,
+        result_store: Optional[ResultStore] = None,
+    ):
+        self.config_path = config_path
+        self.pool = ConnectionPool(
+            pool_size,
+            factory=connection_factory or (lambda: get_snowflake_connection(client_session_keep_alive=True)),
+        )
+        self.baseline_cache = baseline_cache if baseline_cache is not None else BaselineCache()
+        self.result_store = result_store if result_store is not None else ResultStore()
+        self.stats = LatencyStats()
+        self.started_at = time.time()
+        self._config_lock = threading.Lock()
+        self._config_mtime: Optional[float] = None
+        self._defaults: dict = {}
+        self._audiences: list[AudienceConfig] = []
+
+    def configured(self) -> tuple[dict, list[AudienceConfig]]:
+        """Return (defaults, audiences) from audiences.yml, re-parsing only when the file changes."""
+        with self._config_lock:
+            mtime = self.config_path.stat().st_mtime if self.config_path.exists() else None
+            if mtime != self._config_mtime:
+                raw = {}
+                if mtime is not None:
+                    with open(self.config_path) as f:
+                        raw = yaml.safe_load(f) or {}
+                self._defaults = raw.get("defaults", {})
+                self._audiences = [audience_from_dict(e, self._defaults) for e in raw.get("audiences", [])]
+                self._config_mtime = mtime
+                log.info("Loaded %d audience(s) from %s", len(self._audiences), self.config_path)
+            return self._defaults, self._audiences
+
+    def resolve_audiences(self, entries: list) -> list[AudienceConfig]:
+        """Turn a payload's audiences (configured name / audience_id, or AudienceConfig dicts) into configs."""
+        if not isinstance(entries, list) or not entries:
+            raise ValueError("'audiences' must be a non-empty list")
+        defaults, configured = self.configured()
+        by_ref = {}
+        for aud in configured:
+            by_ref.setdefault(aud.name, aud)
+            by_ref.setdefault(aud.audience_id, aud)
+
+        audiences = []
+        for entry in entries:
+            if isinstance(entry, str):
+                if entry not in by_ref:
+                    raise ValueError(f"Unknown audience '{entry}' (not in {self.config_path.name})")
+                audiences.append(by_ref[entry])
+            elif isinstance(entry, dict):
+                missing = {"audience_id", "name", "brand_keywords"} - set(entry)
+                if missing:
+                    raise ValueError(f"Audience payload missing field(s): {sorted(missing)}")
+                audiences.append(audience_from_dict(entry, defaults))
+            else:
+                raise ValueError(f"Unsupported audience entry: {entry!r}")
+        return audiences
+
+    def validate(self, payload: dict) -> dict:
+        audiences = self.resolve_audiences(payload.get("audiences"))
+        query_timeout = payload.get("query_timeout")
+        if query_timeout is not None and (
+            isinstance(query_timeout, bool)
+            or not isinstance(query_timeout, (int, float))
+            or not 0 < query_timeout < math.inf
+        ):
+            raise ValueError(f"'query_timeout' must be a positive number of seconds, got {query_timeout!r}")
+        df = validate_all(
+            audiences,
+            batched=bool(payload.get("batched", False)),
+            baseline_cache=self.baseline_cache,
+            max_in_flight=self.pool.size,
+            query_timeout=query_timeout,
+            result_store=self.result_store,
+            force=bool(payload.get("force", False)),
+            pool=self.pool,
+        )
+        rows = df.astype(object).where(pd.notna(df), None).to_dict(orient="records")
+        return {"requested": len(audiences), "returned": len(rows), "results": rows}
+
+    def describe(self) -> dict:
+        _, audiences = self.configured()
+        return {"audiences": [asdict(aud) for aud in audiences]}
+
+    def status(self) -> dict:
+        return {
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "endpoints": self.stats.summary(),
+            "pool": self.pool.stats(),
+            "caches": {
+                "results_in_memory": len(self.result_store._memo),
+                "baselines_in_memory": len(self.baseline_cache._memo),
+            },
+        }
+
+    def close(self) -> None:
+        self.pool.close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "AudienceValidation/1.0"
+
+    @property
+    def service(self) -> ValidationService:
+        return self.server.service
+
+    def _send(self, status: int, body: dict) -> None:
+        data = json.dumps(body, default=_json_scalar).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _dispatch(self, handler) -> None:
+        endpoint = f"{self.command} {self.path.split('?')[0]}"
+        started = time.perf_counter()
+        ok = False
+        try:
+            status, body = handler()
+            ok = status < 400
+        except (ValueError, KeyError, TypeError) as exc:
+            status, body = 400, {"error": str(exc)}
+        except Exception as exc:
+            log.exception("%s failed", endpoint)
+            status, body = 500, {"error": str(exc)}
+        self.service.stats.record(endpoint, time.perf_counter() - started, ok)
+        self._send(status, body)
+
+    def do_GET(self) -> None:
+        routes = {
+            "/health": lambda: (200, {"status": "ok"}),
+            "/audiences": lambda: (200, self.service.describe()),
+            "/stats": lambda: (200, self.service.status()),
+        }
+        route = routes.get(self.path.split("?")[0])
+        self._dispatch(route or (lambda: (404, {"error": f"No route for GET {self.path}"})))
+
+    def do_POST(self) -> None:
+        if self.path.split("?")[0] != "/validate":
+            self._dispatch(lambda: (404, {"error": f"No route for POST {self.path}"}))
+            return
+
+        def _validate():
+            length = int(self.headers.get("Content-Length") or 0)
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(payload, dict):
+                raise ValueError("Request body must be a JSON object")
+            return 200, self.service.validate(payload)
+
+        self._dispatch(_validate)
+
+    def log_message(self, fmt: str, *args) -> None:
+        log.info("%s - %s", self.address_string(), fmt % args)
+
+
+def make_server(service: ValidationService, host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    """Bind the HTTP server for service (port 0 picks a free port)."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def _load_factory(spec: str):
+    module_name, _, attr = spec.partition(":")
+    if not attr:
+        raise ValueError(f"--connection-factory must look like module:callable, got '{spec}'")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+# Main
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Serve audience validations over HTTP/JSON.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind (default: %(default)s).")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on (default: %(default)s).")
+    parser.add_argument("--pool-size", type=int, default=4,
+                        help="Warm Snowflake connections to keep open (default: %(default)s).")
+    parser.add_argument("--config", type=Path, default=CONFIG_PATH, help="Audience config file.")
+    parser.add_argument("--connection-factory", default=None, metavar="MODULE:CALLABLE",
+                        help="Zero-argument connection factory to use instead of Snowflake.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None):
+    args = parse_args(argv)
+    factory = _load_factory(args.connection_factory) if args.connection_factory else None
+    service = ValidationService(args.config, pool_size=args.pool_size, connection_factory=factory)
+    service.configured()
+    log.info("Opened %d warm connection(s)", service.pool.warm())
+    server = make_server(service, args.host, args.port)
+    log.info("Audience validation service listening on http://%s:%d", *server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        log.info("Shutting down — cancelling %d running quer(ies)", cancel_in_flight())
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -38,3 +38,22 @@ FROM TABLE(INFORMATION_SCHEMA.COPY_HISTORY(
   TABLE_NAME => 'DEMO.AFS_POC.DEMOGRAPHICS_TRANSACTIONS',
   START_TIME => DATEADD(hours, -1, CURRENT_TIMESTAMP())
 ));
+
+-- Reconcile the spine load against the Parquet footer manifest
+-- (python3 profile_parquet_footers.py writes parquet_manifest.json without
+-- downloading the files): ROW_COUNT should equal
+-- prefixes["files_from_affinity/2025-11-13/individual_demographic_spine/"].total_rows,
+-- and ROWS_PER_FILE should match files[<key>].num_rows
+SELECT 'INDIVIDUAL_DEMOGRAPHIC_SPINE' AS table_name, COUNT(*) AS row_count
+FROM DEMO.AFS_POC.INDIVIDUAL_DEMOGRAPHIC_SPINE;
+
+SELECT
+  FILE_NAME,
+  ROW_COUNT AS ROWS_PER_FILE,
+  ROW_PARSED,
+  STATUS
+FROM TABLE(INFORMATION_SCHEMA.COPY_HISTORY(
+  TABLE_NAME => 'DEMO.AFS_POC.INDIVIDUAL_DEMOGRAPHIC_SPINE',
+  START_TIME => DATEADD(days, -14, CURRENT_TIMESTAMP())
+))
+ORDER BY FILE_NAME;
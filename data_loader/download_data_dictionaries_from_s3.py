@@ -3,10 +3,26 @@
 Download data dictionary files from s3.
 
 This script reads s3_file_list.csv and downloads files from the Data_dictionary
-folder (e.g., data dictionaries, documentation files).
+folder (e.g., data dictionaries, documentation files), or from any other
+prefix listed in the CSV with --prefix.
 
 Usage:
-    python3 download_non_table_files.py
+    python3 download_data_dictionaries_from_s3.py
+
+    # Unattended, 16 transfers at a time, a different prefix
+    python3 download_data_dictionaries_from_s3.py --yes --concurrency 16 \\
+        --prefix files_from_affinity/2025-11-13/individual_demographic_spine/
+
+    # Against a local S3 stand-in (MinIO, moto_server, ...)
+    python3 download_data_dictionaries_from_s3.py --yes --endpoint-url http://localhost:9000
+
+    # Incremental sync of any prefix from the live listing: only new or
+    # changed objects are transferred, and every download is ETag-verified
+    python3 download_data_dictionaries_from_s3.py --yes --sync --source listing \
+        --prefix files_from_affinity/2025-11-13/
+
+    # Regenerate s3_file_list.csv from the live listing
+    python3 download_data_dictionaries_from_s3.py --write-manifest --prefix files_from_affinity/
 
 Requirements:
     - boto3: pip install boto3
@@ -14,13 +30,52 @@ Requirements:
     - s3_file_list.csv in the same directory
 
 The script will:
-    1. Identify files in the Data_dictionary folder
-    2. Download them to the data_loader folder, preserving directory structure
+    1. Identify files under the prefix (Data_dictionary folder by default)
+    2. Skip files already downloaded at their S3 size
+    3. Download the rest to the data_loader folder, preserving directory structure
+
+Transfers:
+    - One thread pool (--concurrency) is shared by every file. Objects larger
+      than --multipart-threshold are split into --part-size byte ranges that
+      are fetched in parallel, so a single 6 GB spine part uses the whole pool.
+    - Each range is retried with exponential backoff (--retries). Range GETs
+      send If-Match with the object's ETag, so an object replaced mid-transfer
+      fails instead of mixing versions.
+    - Data is written to <file>.part, with completed ranges recorded in
+      <file>.part.json. An interrupted run resumes from the completed ranges
+      as long as the object's ETag and size are unchanged. The final file
+      only appears (renamed from .part) once every range is written and the
+      size checks out.
+    - Progress and throughput are printed every --progress-interval seconds.
+
+Sync mode (--sync):
+    - Objects come from the --csv manifest or, with --source listing, from
+      a paged ListObjectsV2 under --prefix.
+    - A SQLite index (<output-dir>/.s3_sync_state.sqlite) records the key,
+      size, ETag and last_modified of every verified local copy. Objects
+      whose size and ETag match the index (and are still on disk) are
+      skipped; files on disk but not yet indexed are adopted if they verify.
+    - Downloads are checked against their ETag: plain MD5, or for multipart
+      ETags such as ...-193 the MD5 of the part MD5s, recomputed for the
+      upload part sizes that give that part count. Mismatches are deleted
+      and reported as failures.
 """
 
+import argparse
 import csv
+import hashlib
+import json
+import math
 import os
+import random
+import sqlite3
+import threading
+import time
 import boto3
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timezone
+from email.utils import format_datetime
 from pathlib import Path
 from urllib.parse import urlparse
 import sys
@@ -31,118 +86,636 @@ AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID', 'YOUR_AWS_ACCESS_KEY_ID')
 AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY', 'YOUR_AWS_SECRET_ACCESS_KEY')
 S3_BUCKET = 'afs-akkio'
 
-# Only download files from the Data_dictionary folder
+# Only download files from the Data_dictionary folder (override with --prefix)
 DATA_DICTIONARY_PREFIX = 'files_from_affinity/Data_dictionary/'
 
+# Transfer defaults
+MB = 1024 * 1024
+DEFAULT_CONCURRENCY = 8
+DEFAULT_PART_SIZE_MB = 64
+DEFAULT_MULTIPART_THRESHOLD_MB = 128
+DEFAULT_RETRIES = 5
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 30
+READ_CHUNK_BYTES = MB
+PROGRESS_INTERVAL_SECONDS = 10
+
+# Sync mode: local index of what has been downloaded and verified
+SYNC_STATE_FILENAME = '.s3_sync_state.sqlite'
+MANIFEST_COLUMNS = ['name', 'size', 'md5', 'last_modified']
+# Part sizes common S3 uploaders use, tried when re-deriving a multipart ETag
+COMMON_UPLOAD_PART_SIZES_MB = [8, 5, 16, 32, 64, 100, 128, 256, 512]
 
-def is_data_dictionary_file(s3_path):
-    """Check if a file is in the Data_dictionary folder."""
+
+def is_data_dictionary_file(s3_path, prefix=DATA_DICTIONARY_PREFIX):
+    """Check if a file is in the Data_dictionary folder (or under prefix)."""
     # Remove s3://bucket/ prefix
     path = s3_path.replace(f's3://{S3_BUCKET}/', '')
     # Check if this file is in the Data_dictionary folder
-    return path.startswith(DATA_DICTIONARY_PREFIX)
+    return path.startswith(prefix)
 
 
-def get_files_to_download(csv_file):
-    """Read CSV and return list of files in Data_dictionary folder."""
+def get_files_to_download(csv_file, prefix=DATA_DICTIONARY_PREFIX):
+    """Read CSV and return list of files in Data_dictionary folder (or under prefix)."""
     files_to_download = []
-    
+
     with open(csv_file, 'r') as f:
         reader = csv.DictReader(f)
         for row in reader:
             s3_path = row['name']
-            if is_data_dictionary_file(s3_path):
+            if is_data_dictionary_file(s3_path, prefix):
                 files_to_download.append({
                     's3_path': s3_path,
                     'size': row.get('size', '0'),
                     'md5': row.get('md5', ''),
                 })
-    
+
     return files_to_download
 
 
-def download_file(s3_client, s3_path, local_path):
-    """Download a single file from S3."""
+def make_s3_client(endpoint_url=None, max_pool_connections=DEFAULT_CONCURRENCY):
+    """S3 client sized for the thread pool; endpoint_url points it at a local S3 stand-in."""
+    return boto3.client(
+        's3',
+        aws_access_key_id=AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+        endpoint_url=endpoint_url,
+        # Retries are handled per range below, with resumable state
+        config=Config(max_pool_connections=max_pool_connections, retries={'max_attempts': 1}),
+    )
+
+
+def _format_bytes(n):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(n) < 1024:
+            return f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} TB"
+
+
+class Progress:
+    """Thread-safe byte counter that prints progress and throughput at most every interval seconds."""
+
+    def __init__(self, total_bytes, total_files, interval=PROGRESS_INTERVAL_SECONDS):
+        self.total_bytes = total_bytes
+        self.total_files = total_files
+        self.interval = interval
+        self.bytes_done = 0
+        self.bytes_resumed = 0
+        self.files_done = 0
+        self.started = time.time()
+        self._last_report = self.started
+        self._lock = threading.Lock()
+
+    def add(self, n):
+        with self._lock:
+            self.bytes_done += n
+            now = time.time()
+            if now - self._last_report < self.interval:
+                return
+            self._last_report = now
+        self.report()
+
+    def resumed(self, n):
+        with self._lock:
+            self.bytes_done += n
+            self.bytes_resumed += n
+
+    def file_done(self):
+        with self._lock:
+            self.files_done += 1
+
+    def throughput(self):
+        """Bytes per second transferred in this run (resumed bytes excluded)."""
+        elapsed = max(time.time() - self.started, 1e-9)
+        return (self.bytes_done - self.bytes_resumed) / elapsed
+
+    def report(self):
+        with self._lock:
+            done, files_done = self.bytes_done, self.files_done
+        rate = self.throughput()
+        pct = 100 * done / self.total_bytes if self.total_bytes else 100
+        eta = (self.total_bytes - done) / rate if rate > 0 else float('inf')
+        eta_text = time.strftime('%H:%M:%S', time.gmtime(eta)) if eta != float('inf') else '--:--:--'
+        print(f"  {pct:5.1f}%  {_format_bytes(done)} / {_format_bytes(self.total_bytes)}  "
+              f"{files_done}/{self.total_files} files  {_format_bytes(rate)}/s  ETA {eta_text}")
+
+
+class FileTransfer:
+    """One object being downloaded: its byte ranges, .part file and resume state."""
+
+    def __init__(self, s3_path, local_path, size, etag, part_size):
+        self.s3_path = s3_path
+        self.key = s3_path.replace(f's3://{S3_BUCKET}/', '')
+        self.local_path = Path(local_path)
+        self.part_path = self.local_path.with_name(self.local_path.name + '.part')
+        self.state_path = self.local_path.with_name(self.local_path.name + '.part.json')
+        self.size = size
+        self.etag = etag
+        self.part_size = part_size
+        self.ranges = [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+        self.done = set()
+        self.failed = False
+        self._lock = threading.Lock()
+
+    def prepare(self):
+        """Create the .part file, reusing completed ranges from a previous run when still valid."""
+        self.local_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.part_path.exists() and self.state_path.exists():
+            try:
+                with open(self.state_path) as f:
+                    state = json.load(f)
+                if (state.get('etag'), state.get('size'), state.get('part_size')) == (
+                        self.etag, self.size, self.part_size) \
+                        and self.part_path.stat().st_size == self.size:
+                    self.done = {i for i in state.get('done', []) if 0 <= i < len(self.ranges)}
+            except (OSError, ValueError):
+                self.done = set()
+        if not self.done:
+            with open(self.part_path, 'wb') as f:
+                f.truncate(self.size)
+        self._save_state()
+
+    def resumed_bytes(self):
+        return sum(self.ranges[i][1] - self.ranges[i][0] + 1 for i in self.done)
+
+    def pending(self):
+        return [i for i in range(len(self.ranges)) if i not in self.done]
+
+    def _save_state(self):
+        tmp = self.state_path.with_name(self.state_path.name + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump({'etag': self.etag, 'size': self.size, 'part_size': self.part_size,
+                       'done': sorted(self.done)}, f)
+        os.replace(tmp, self.state_path)
+
+    def mark_done(self, index):
+        """Record a finished range; returns True when it was the last one."""
+        with self._lock:
+            self.done.add(index)
+            self._save_state()
+            return len(self.done) == len(self.ranges)
+
+    def finalize(self):
+        """Move the completed .part file into place."""
+        actual = self.part_path.stat().st_size
+        if actual != self.size:
+            raise IOError(f"{self.key}: expected {self.size} bytes, .part file has {actual}")
+        os.replace(self.part_path, self.local_path)
+        self.state_path.unlink(missing_ok=True)
+
+
+def _backoff(attempt):
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+def download_range(s3_client, transfer, index, progress, retries=DEFAULT_RETRIES):
+    """Fetch one byte range into the .part file, retrying with backoff; returns True when written."""
+    start, end = transfer.ranges[index]
+    for attempt in range(retries + 1):
+        written = 0
+        try:
+            kwargs = {'Bucket': S3_BUCKET, 'Key': transfer.key}
+            if transfer.etag:
+                kwargs['IfMatch'] = transfer.etag
+            if transfer.size:
+                kwargs['Range'] = f'bytes={start}-{end}'
+            body = s3_client.get_object(**kwargs)['Body']
+            with open(transfer.part_path, 'r+b') as f:
+                f.seek(start)
+                for chunk in iter(lambda: body.read(READ_CHUNK_BYTES), b''):
+                    f.write(chunk)
+                    written += len(chunk)
+                    progress.add(len(chunk))
+            expected = end - start + 1 if transfer.size else 0
+            if written != expected:
+                raise IOError(f"short read: got {written} of {expected} bytes")
+            return True
+        except Exception as e:
+            progress.add(-written)
+            if attempt == retries:
+                print(f"Error downloading {transfer.s3_path} bytes {start}-{end}: {e}", file=sys.stderr)
+                return False
+            delay = _backoff(attempt)
+            print(f"  Retrying {transfer.key} bytes {start}-{end} in {delay:.1f}s "
+                  f"(attempt {attempt + 1}/{retries}): {e}", file=sys.stderr)
+            time.sleep(delay)
+    return False
+
+
+def plan_transfers(s3_client, files, output_dir, part_size, multipart_threshold):
+    """HEAD every object and return (transfers, skipped, failed) for files that still need downloading."""
+    transfers, skipped, failed = [], [], []
+    for file_info in files:
+        s3_path = file_info['s3_path']
+        # Remove s3://bucket/ prefix and use as relative path
+        relative_path = s3_path.replace(f's3://{S3_BUCKET}/', '')
+        local_path = Path(output_dir) / relative_path
+        try:
+            head = s3_client.head_object(Bucket=S3_BUCKET, Key=relative_path)
+        except Exception as e:
+            print(f"Error reading {s3_path}: {e}", file=sys.stderr)
+            failed.append(s3_path)
+            continue
+        size = head['ContentLength']
+        if local_path.exists() and local_path.stat().st_size == size:
+            skipped.append(s3_path)
+            continue
+        ranged = size > multipart_threshold
+        transfers.append(FileTransfer(s3_path, local_path, size, head.get('ETag', ''),
+                                      part_size if ranged else max(size, 1)))
+    return transfers, skipped, failed
+
+
+def download_files(s3_client, transfers, concurrency=DEFAULT_CONCURRENCY, retries=DEFAULT_RETRIES,
+                   progress_interval=PROGRESS_INTERVAL_SECONDS):
+    """Download every transfer's pending ranges on one shared pool; returns (downloaded, failed, progress)."""
+    for transfer in transfers:
+        transfer.prepare()
+    progress = Progress(sum(t.size for t in transfers), len(transfers), progress_interval)
+    for transfer in transfers:
+        progress.resumed(transfer.resumed_bytes())
+        if transfer.resumed_bytes():
+            print(f"  Resuming {transfer.key}: {len(transfer.done)}/{len(transfer.ranges)} ranges already done")
+    # Counted after prepare(), so ranges finished by a previous run are left out
+    print(f"\nDownloading {len(transfers)} files "
+          f"({sum(len(t.pending()) for t in transfers)} ranges, {concurrency} at a time)...")
+
+    downloaded, failed = [], []
+
+    def finish(transfer):
+        try:
+            transfer.finalize()
+            downloaded.append(transfer.s3_path)
+            progress.file_done()
+        except Exception as e:
+            print(f"Error finalizing {transfer.s3_path}: {e}", file=sys.stderr)
+            failed.append(transfer.s3_path)
+
+    tasks = []
+    for transfer in transfers:
+        pending = transfer.pending()
+        if not pending:
+            finish(transfer)
+        tasks.extend((transfer, index) for index in pending)
+
+    def run(transfer, index):
+        if transfer.failed:
+            return
+        if not download_range(s3_client, transfer, index, progress, retries):
+            transfer.failed = True
+            return
+        if transfer.mark_done(index):
+            finish(transfer)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(run, transfer, index) for transfer, index in tasks]
+        for fut in as_completed(futures):
+            fut.result()
+
+    failed.extend(t.s3_path for t in transfers if t.failed)
+    progress.report()
+    return downloaded, failed, progress
+
+
+def download_file(s3_client, s3_path, local_path, part_size=DEFAULT_PART_SIZE_MB * MB,
+                  multipart_threshold=DEFAULT_MULTIPART_THRESHOLD_MB * MB, concurrency=DEFAULT_CONCURRENCY):
+    """Download a single file from S3 (ranged and resumable like the batch path)."""
     try:
-        # Extract key from s3://bucket/key format
         key = s3_path.replace(f's3://{S3_BUCKET}/', '')
-        
-        # Create local directory if it doesn't exist
-        local_dir = os.path.dirname(local_path)
-        if local_dir:
-            os.makedirs(local_dir, exist_ok=True)
-        
-        # Download file
-        s3_client.download_file(S3_BUCKET, key, local_path)
-        return True
+        head = s3_client.head_object(Bucket=S3_BUCKET, Key=key)
+        size = head['ContentLength']
+        transfer = FileTransfer(s3_path, local_path, size, head.get('ETag', ''),
+                                part_size if size > multipart_threshold else max(size, 1))
+        downloaded, _, _ = download_files(s3_client, [transfer], concurrency=concurrency)
+        return bool(downloaded)
     except Exception as e:
         print(f"Error downloading {s3_path}: {e}", file=sys.stderr)
         return False
 
 
-def main():
-    """Main function to download non-table files."""
-    # Get script directory
-    script_dir = Path(__file__).parent
-    csv_file = script_dir / 's3_file_list.csv'
-    output_dir = script_dir
-    
-    if not csv_file.exists():
-        print(f"Error: {csv_file} not found!", file=sys.stderr)
-        sys.exit(1)
-    
+# Sync mode
+def list_objects(s3_client, prefix):
+    """Page through the live listing under prefix; rows have the same shape as get_files_to_download()."""
+    objects = []
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=S3_BUCKET, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            if obj['Key'].endswith('/'):
+                continue  # folder placeholder
+            objects.append({
+                's3_path': f"s3://{S3_BUCKET}/{obj['Key']}",
+                'size': str(obj['Size']),
+                'md5': obj['ETag'].strip('"'),
+                'last_modified': format_datetime(obj['LastModified'].astimezone(timezone.utc), usegmt=True),
+            })
+    return objects
+
+
+def write_manifest(objects, csv_file):
+    """Write objects in s3_file_list.csv format (name, size, md5, last_modified)."""
+    csv_file = Path(csv_file)
+    tmp = csv_file.with_name(csv_file.name + '.tmp')
+    with open(tmp, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(MANIFEST_COLUMNS)
+        for obj in sorted(objects, key=lambda o: o['s3_path']):
+            writer.writerow([obj['s3_path'], obj['size'], obj['md5'], obj.get('last_modified', '')])
+    os.replace(tmp, csv_file)
+
+
+def _candidate_part_sizes(size, parts):
+    """Upload part sizes that would split size bytes into exactly parts parts, common sizes first."""
+    derived = math.ceil(math.ceil(size / parts) / MB) * MB
+    candidates = []
+    for part_size in [mb * MB for mb in COMMON_UPLOAD_PART_SIZES_MB] + [derived]:
+        if part_size not in candidates and math.ceil(size / part_size) == parts:
+            candidates.append(part_size)
+    return candidates
+
+
+def compute_etag(path, part_size=None):
+    """S3-style ETag of a local file: plain MD5, or MD5 of part MD5s plus '-N' for a multipart part_size."""
+    if part_size is None:
+        digest = hashlib.md5()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(8 * MB), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    part_digests = []
+    with open(path, 'rb') as f:
+        while True:
+            remaining, digest = part_size, hashlib.md5()
+            while remaining:
+                chunk = f.read(min(remaining, 8 * MB))
+                if not chunk:
+                    break
+                digest.update(chunk)
+                remaining -= len(chunk)
+            if remaining == part_size:
+                break
+            part_digests.append(digest.digest())
+            if remaining:
+                break
+    return f"{hashlib.md5(b''.join(part_digests)).hexdigest()}-{len(part_digests)}"
+
+
+def etag_matches(path, etag):
+    """Check a local file against an S3 ETag, re-deriving the upload part size for multipart ETags."""
+    etag = etag.strip('"')
+    if not etag:
+        return False
+    if '-' not in etag:
+        return compute_etag(path) == etag
+    parts = int(etag.rsplit('-', 1)[1])
+    size = Path(path).stat().st_size
+    return any(compute_etag(path, part_size) == etag for part_size in _candidate_part_sizes(size, parts))
+
+
+class SyncState:
+    """SQLite index of objects held locally: key -> size, etag, last_modified, local path, verification time."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS objects (
+                key           TEXT PRIMARY KEY,
+                size          INTEGER NOT NULL,
+                etag          TEXT NOT NULL,
+                last_modified TEXT,
+                local_path    TEXT NOT NULL,
+                verified_at   REAL NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def get(self, key):
+        row = self.conn.execute(
+            "SELECT size, etag, last_modified, local_path FROM objects WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {'size': row[0], 'etag': row[1], 'last_modified': row[2], 'local_path': row[3]}
+
+    def put(self, key, size, etag, last_modified, local_path):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?, ?, ?)",
+            (key, size, etag, last_modified, str(local_path), time.time()),
+        )
+        self.conn.commit()
+
+    def keys(self, prefix=''):
+        rows = self.conn.execute("SELECT key FROM objects WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+        return {row[0] for row in rows}
+
+    def close(self):
+        self.conn.close()
+
+
+def plan_sync(files, output_dir, state, part_size, multipart_threshold):
+    """Split files into (transfers, unchanged, unindexed) against the state index.
+
+    unchanged: indexed at the same size and ETag and still on disk.
+    unindexed: on disk at the right size but not indexed yet; adopted if the ETag verifies.
+    Everything else (new, changed, missing locally) becomes a FileTransfer.
+    """
+    transfers, unchanged, unindexed = [], [], []
+    for file_info in files:
+        key = file_info['s3_path'].replace(f's3://{S3_BUCKET}/', '')
+        size, etag = int(file_info['size'] or 0), file_info['md5'].strip('"')
+        local_path = Path(output_dir) / key
+        on_disk = local_path.exists() and local_path.stat().st_size == size
+        held = state.get(key)
+        if held and on_disk and (held['size'], held['etag']) == (size, etag):
+            unchanged.append(file_info)
+        elif on_disk and held is None:
+            unindexed.append(file_info)
+        else:
+            transfers.append(sync_transfer(file_info, output_dir, part_size, multipart_threshold))
+    return transfers, unchanged, unindexed
+
+
+def sync_transfer(file_info, output_dir, part_size, multipart_threshold):
+    """FileTransfer for a listing / manifest row, pinned to the row's ETag."""
+    key = file_info['s3_path'].replace(f's3://{S3_BUCKET}/', '')
+    size, etag = int(file_info['size'] or 0), file_info['md5'].strip('"')
+    return FileTransfer(file_info['s3_path'], Path(output_dir) / key, size, f'"{etag}"' if etag else '',
+                        part_size if size > multipart_threshold else max(size, 1))
+
+
+def verify_and_index(files, output_dir, state, concurrency=DEFAULT_CONCURRENCY, discard_mismatches=True):
+    """Verify local copies against their ETags in parallel and index the ones that match.
+
+    Returns (verified, mismatched) s3 paths. Mismatched downloads are deleted
+    (discard_mismatches) so the next sync fetches them again.
+    """
+    def check(file_info):
+        key = file_info['s3_path'].replace(f's3://{S3_BUCKET}/', '')
+        local_path = Path(output_dir) / key
+        return file_info, local_path, etag_matches(local_path, file_info['md5'])
+
+    verified, mismatched = [], []
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for fut in as_completed([executor.submit(check, f) for f in files]):
+            file_info, local_path, ok = fut.result()
+            key = file_info['s3_path'].replace(f's3://{S3_BUCKET}/', '')
+            if ok:
+                state.put(key, int(file_info['size'] or 0), file_info['md5'].strip('"'),
+                          file_info.get('last_modified', ''), local_path)
+                verified.append(file_info['s3_path'])
+                continue
+            print(f"Error: ETag mismatch for {file_info['s3_path']} (expected {file_info['md5']})", file=sys.stderr)
+            if discard_mismatches:
+                local_path.unlink(missing_ok=True)
+            mismatched.append(file_info['s3_path'])
+    return verified, mismatched
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Download files listed in s3_file_list.csv from S3.')
+    parser.add_argument('--csv', type=Path, default=Path(__file__).parent / 's3_file_list.csv',
+                        help='File list to read (default: s3_file_list.csv next to this script).')
+    parser.add_argument('--prefix', default=DATA_DICTIONARY_PREFIX,
+                        help='Only download keys under this prefix (default: %(default)s).')
+    parser.add_argument('--output-dir', type=Path, default=Path(__file__).parent,
+                        help='Download root; keys keep their directory structure (default: this folder).')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help='Byte ranges / files transferred at once (default: %(default)s).')
+    parser.add_argument('--part-size-mb', type=int, default=DEFAULT_PART_SIZE_MB,
+                        help='Byte-range size for large objects (default: %(default)s).')
+    parser.add_argument('--multipart-threshold-mb', type=int, default=DEFAULT_MULTIPART_THRESHOLD_MB,
+                        help='Objects larger than this are split into ranges (default: %(default)s).')
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES,
+                        help='Retries per range, with exponential backoff (default: %(default)s).')
+    parser.add_argument('--progress-interval', type=float, default=PROGRESS_INTERVAL_SECONDS,
+                        help='Seconds between progress lines (default: %(default)s).')
+    parser.add_argument('--endpoint-url', default=os.getenv('AWS_ENDPOINT_URL'),
+                        help='S3 endpoint, e.g. a local stand-in such as MinIO (default: $AWS_ENDPOINT_URL or AWS).')
+    parser.add_argument('--yes', '-y', action='store_true',
+                        help='Do not ask for confirmation before downloading.')
+    parser.add_argument('--sync', action='store_true',
+                        help='Only transfer objects that are new or changed since the last sync, verifying '
+                             'every download against its ETag and recording it in the state index.')
+    parser.add_argument('--source', choices=['csv', 'listing'], default='csv',
+                        help='Where the object list comes from: the --csv manifest or the live S3 '
+                             'listing under --prefix (default: %(default)s).')
+    parser.add_argument('--state-db', type=Path, default=None,
+                        help=f'Sync state index (default: <output-dir>/{SYNC_STATE_FILENAME}).')
+    parser.add_argument('--write-manifest', type=Path, nargs='?', const=Path(__file__).parent / 's3_file_list.csv',
+                        default=None, metavar='CSV',
+                        help='Regenerate the manifest (default: s3_file_list.csv) from the live listing under '
+                             '--prefix, e.g. --prefix files_from_affinity/ for the full list. Exits after '
+                             'writing unless --sync is also given.')
+    args = parser.parse_args(argv)
+    if args.concurrency < 1 or args.part_size_mb < 1 or args.retries < 0:
+        parser.error('--concurrency and --part-size-mb must be >= 1, --retries >= 0')
+    return args
+
+
+def main(argv=None):
+    """Main function to download data dictionary files."""
+    args = parse_args(argv)
+    csv_file = args.csv
+    output_dir = args.output_dir
+
     # Initialize S3 client
-    s3_client = boto3.client(
-        's3',
-        aws_access_key_id=AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=AWS_SECRET_ACCESS_KEY
-    )
-    
+    s3_client = make_s3_client(args.endpoint_url, max_pool_connections=args.concurrency)
+
     # Get list of files to download
-    print("Reading s3_file_list.csv...")
-    files_to_download = get_files_to_download(csv_file)
-    
+    if args.source == 'listing' or args.write_manifest:
+        print(f"Listing s3://{S3_BUCKET}/{args.prefix}...")
+        files_to_download = list_objects(s3_client, args.prefix)
+        if args.write_manifest:
+            write_manifest(files_to_download, args.write_manifest)
+            print(f"Wrote {len(files_to_download)} objects to {args.write_manifest}")
+            if not args.sync:
+                return
+    else:
+        if not csv_file.exists():
+            print(f"Error: {csv_file} not found!", file=sys.stderr)
+            sys.exit(1)
+        print(f"Reading {csv_file.name}...")
+        files_to_download = get_files_to_download(csv_file, args.prefix)
+
     if not files_to_download:
         print("No files to download.")
         return
-    
-    print(f"\nFound {len(files_to_download)} files to download from Data_dictionary folder")
+
+    print(f"\nFound {len(files_to_download)} files to download under {args.prefix}")
     print("\nFiles to download:")
     for f in files_to_download[:10]:  # Show first 10
         print(f"  - {f['s3_path']}")
     if len(files_to_download) > 10:
         print(f"  ... and {len(files_to_download) - 10} more files")
-    
+
+    total = sum(int(f['size'] or 0) for f in files_to_download)
     # Ask for confirmation
-    response = input(f"\nDownload {len(files_to_download)} files? (y/n): ")
-    if response.lower() != 'y':
-        print("Download cancelled.")
-        return
-    
+    if not args.yes:
+        response = input(f"\nDownload {len(files_to_download)} files ({_format_bytes(total)})? (y/n): ")
+        if response.lower() != 'y':
+            print("Download cancelled.")
+            return
+
+    part_size = args.part_size_mb * MB
+    multipart_threshold = args.multipart_threshold_mb * MB
+    state = None
+    failed = []
+    if args.sync:
+        state = SyncState(args.state_db or output_dir / SYNC_STATE_FILENAME)
+        transfers, skipped, unindexed = plan_sync(files_to_download, output_dir, state, part_size, multipart_threshold)
+        if unindexed:
+            print(f"\nVerifying {len(unindexed)} files already on disk but not in the state index...")
+            adopted, mismatched = verify_and_index(unindexed, output_dir, state, args.concurrency,
+                                                   discard_mismatches=False)
+            skipped += [f for f in unindexed if f['s3_path'] in set(adopted)]
+            transfers += [sync_transfer(f, output_dir, part_size, multipart_threshold)
+                          for f in unindexed if f['s3_path'] in set(mismatched)]
+        gone = state.keys(args.prefix) - {f['s3_path'].replace(f's3://{S3_BUCKET}/', '') for f in files_to_download}
+        if gone:
+            print(f"\n{len(gone)} indexed objects are no longer listed (local copies kept)")
+        if skipped:
+            print(f"\nSkipping {len(skipped)} files unchanged since the last sync")
+    else:
+        transfers, skipped, failed = plan_transfers(
+            s3_client, files_to_download, output_dir,
+            part_size=part_size,
+            multipart_threshold=multipart_threshold,
+        )
+        if skipped:
+            print(f"\nSkipping {len(skipped)} files already downloaded")
+
     # Download files
-    print("\nDownloading files...")
-    downloaded = 0
-    failed = 0
-    
-    for file_info in files_to_download:
-        s3_path = file_info['s3_path']
-        # Convert S3 path to local path
-        # Remove s3://bucket/ prefix and use as relative path
-        relative_path = s3_path.replace(f's3://{S3_BUCKET}/', '')
-        local_path = output_dir / relative_path
-        
-        print(f"Downloading: {relative_path}")
-        if download_file(s3_client, s3_path, str(local_path)):
-            downloaded += 1
-        else:
-            failed += 1
-    
+    downloaded, download_failed, progress = download_files(
+        s3_client, transfers,
+        concurrency=args.concurrency,
+        retries=args.retries,
+        progress_interval=args.progress_interval,
+    )
+    failed += download_failed
+
+    if state is not None:
+        by_path = {f['s3_path']: f for f in files_to_download}
+        print(f"\nVerifying ETags of {len(downloaded)} downloaded files...")
+        downloaded, mismatched = verify_and_index([by_path[p] for p in downloaded], output_dir, state,
+                                                  args.concurrency)
+        failed += mismatched
+        state.close()
+
+    elapsed = time.time() - progress.started
     print(f"\nDownload complete!")
-    print(f"  Successfully downloaded: {downloaded} files")
-    if failed > 0:
-        print(f"  Failed: {failed} files", file=sys.stderr)
+    print(f"  Successfully downloaded: {len(downloaded)} files")
+    print(f"  {'Unchanged' if args.sync else 'Already present'}: {len(skipped)} files")
+    print(f"  Transferred {_format_bytes(progress.bytes_done - progress.bytes_resumed)} in {elapsed:.1f}s "
+          f"({_format_bytes(progress.throughput())}/s)")
+    if failed:
+        print(f"  Failed: {len(failed)} files (re-run to resume)", file=sys.stderr)
+        for s3_path in failed:
+            print(f"    - {s3_path}", file=sys.stderr)
+        sys.exit(1)
 
 
 if __name__ == '__main__':
     main()
-
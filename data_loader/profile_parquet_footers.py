@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Profile Parquet files on s3 from their footers only.
+
+Reads just the Parquet footer of every .parquet object (a suffix range GET of
+the last bytes of the object, never the data pages) and records per-file row
+counts, row-group sizes, a schema fingerprint and column min/max/null stats to
+a local manifest. Run it before 03a_load_data_spine.sql to know what a load
+should produce, and compare 04_verify.sql row counts against the manifest
+without downloading anything.
+
+Usage:
+    python3 profile_parquet_footers.py
+
+    # Any prefix, from the live listing, 32 footers at a time
+    python3 profile_parquet_footers.py --source listing --concurrency 32 \\
+        --prefix files_from_affinity/2025-11-13/individual_demographic_spine/
+
+Requirements:
+    - boto3, pyarrow: pip install boto3 pyarrow
+    - AWS credentials (see download_data_dictionaries_from_s3.py)
+    - s3_file_list.csv in the same directory (unless --source listing)
+
+The script will:
+    1. List the .parquet objects under the prefix (s3_file_list.csv or live listing)
+    2. Skip objects whose size and ETag match the existing manifest entry (--force re-reads them)
+    3. Fetch and parse the footers of the rest in parallel
+    4. Write parquet_manifest.json and print per-prefix totals and schema drift
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import pyarrow.parquet as pq
+
+from download_data_dictionaries_from_s3 import (
+    DEFAULT_RETRIES,
+    S3_BUCKET,
+    _backoff,
+    _format_bytes,
+    get_files_to_download,
+    list_objects,
+    make_s3_client,
+)
+
+SPINE_PREFIX = 'files_from_affinity/2025-11-13/individual_demographic_spine/'
+MANIFEST_PATH = Path(__file__).parent / 'parquet_manifest.json'
+DEFAULT_CONCURRENCY = 16
+
+# One suffix GET of this size covers the footer of most files; larger footers take a second GET
+FOOTER_PROBE_BYTES = 64 * 1024
+PARQUET_MAGIC = b'PAR1'
+
+
+def fetch_footer(s3_client, key, retries=DEFAULT_RETRIES):
+    """Return (footer bytes, bytes fetched) for key using suffix range GETs only."""
+    fetched = 0
+
+    def tail(n):
+        nonlocal fetched
+        for attempt in range(retries + 1):
+            try:
+                data = s3_client.get_object(Bucket=S3_BUCKET, Key=key, Range=f'bytes=-{n}')['Body'].read()
+                fetched += len(data)
+                return data
+            except Exception:
+                if attempt == retries:
+                    raise
+                time.sleep(_backoff(attempt))
+
+    data = tail(FOOTER_PROBE_BYTES)
+    if len(data) < 8 or data[-4:] != PARQUET_MAGIC:
+        raise ValueError(f"{key} is not a Parquet file (no trailing {PARQUET_MAGIC!r})")
+    footer_length = int.from_bytes(data[-8:-4], 'little')
+    if footer_length + 8 > len(data):
+        data = tail(footer_length + 8)
+    return data[-(footer_length + 8):-8], fetched
+
+
+def _json_value(value):
+    """Statistics values as JSON scalars (bytes decoded, dates / decimals as strings)."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    return str(value)
+
+
+def profile_footer(footer):
+    """Parse a raw footer (FileMetaData) into the manifest's per-file profile."""
+    # read_metadata only looks at the footer, so the data pages can be absent
+    metadata = pq.read_metadata(io.BytesIO(PARQUET_MAGIC + footer + len(footer).to_bytes(4, 'little') + PARQUET_MAGIC))
+    schema = metadata.schema
+    columns = [
+        {'name': schema.column(i).path, 'physical_type': schema.column(i).physical_type,
+         'logical_type': str(schema.column(i).logical_type)}
+        for i in range(metadata.num_columns)
+    ]
+    fingerprint = hashlib.sha256(json.dumps(columns, sort_keys=True).encode()).hexdigest()[:16]
+
+    stats = {c['name']: {'min': None, 'max': None, 'null_count': 0, 'has_stats': True} for c in columns}
+    row_groups = []
+    for rg in range(metadata.num_row_groups):
+        group = metadata.row_group(rg)
+        row_groups.append({'num_rows': group.num_rows, 'total_byte_size': group.total_byte_size})
+        for i in range(group.num_columns):
+            chunk = group.column(i)
+            column = stats[chunk.path_in_schema]
+            s = chunk.statistics
+            if s is None or not s.has_min_max:
+                column['has_stats'] = False
+            else:
+                lo, hi = s.min, s.max
+                column['min'] = lo if column['min'] is None else min(column['min'], lo)
+                column['max'] = hi if column['max'] is None else max(column['max'], hi)
+            if s is not None and s.has_null_count:
+                column['null_count'] += s.null_count
+    for column in stats.values():
+        if not column.pop('has_stats'):
+            column['min'] = column['max'] = None
+        column['min'], column['max'] = _json_value(column['min']), _json_value(column['max'])
+
+    return {
+        'num_rows': metadata.num_rows,
+        'num_row_groups': metadata.num_row_groups,
+        'row_groups': row_groups,
+        'created_by': metadata.created_by,
+        'schema_fingerprint': fingerprint,
+        'columns': columns,
+        'column_stats': stats,
+    }
+
+
+def load_manifest(path=MANIFEST_PATH):
+    if not Path(path).exists():
+        return {'files': {}, 'schemas': {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_manifest(manifest, path=MANIFEST_PATH):
+    path = Path(path)
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def summarize(manifest):
+    """Per-prefix file / row / byte totals and the files whose schema differs from the prefix majority."""
+    prefixes = {}
+    for key, entry in manifest['files'].items():
+        prefix = key.rsplit('/', 1)[0] + '/'
+        summary = prefixes.setdefault(prefix, {'files': 0, 'total_rows': 0, 'total_bytes': 0,
+                                               'schema_fingerprints': {}, 'drifted_files': []})
+        summary['files'] += 1
+        summary['total_rows'] += entry['num_rows']
+        summary['total_bytes'] += entry['size']
+        fps = summary['schema_fingerprints']
+        fps[entry['schema_fingerprint']] = fps.get(entry['schema_fingerprint'], 0) + 1
+    for prefix, summary in prefixes.items():
+        majority = max(summary['schema_fingerprints'], key=summary['schema_fingerprints'].get)
+        summary['drifted_files'] = sorted(
+            key for key, entry in manifest['files'].items()
+            if key.startswith(prefix) and '/' not in key[len(prefix):]
+            and entry['schema_fingerprint'] != majority
+        )
+    return prefixes
+
+
+def profile_files(s3_client, files, manifest, concurrency=DEFAULT_CONCURRENCY, force=False):
+    """Profile the footers of new or changed files into manifest; returns (profiled, unchanged, failed, bytes fetched)."""
+    todo, unchanged = [], []
+    for file_info in files:
+        key = file_info['s3_path'].replace(f's3://{S3_BUCKET}/', '')
+        held = manifest['files'].get(key)
+        if not force and held and (held['size'], held['etag']) == (int(file_info['size'] or 0), file_info['md5']):
+            unchanged.append(key)
+        else:
+            todo.append((key, file_info))
+
+    def run(key, file_info):
+        footer, fetched = fetch_footer(s3_client, key)
+        return key, file_info, profile_footer(footer), fetched
+
+    profiled, failed, fetched_total = [], [], 0
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {executor.submit(run, key, f): key for key, f in todo}
+        for fut in as_completed(futures):
+            try:
+                key, file_info, profile, fetched = fut.result()
+            except Exception as e:
+                print(f"Error profiling {futures[fut]}: {e}", file=sys.stderr)
+                failed.append(futures[fut])
+                continue
+            manifest['schemas'][profile['schema_fingerprint']] = profile.pop('columns')
+            manifest['files'][key] = {
+                'size': int(file_info['size'] or 0),
+                'etag': file_info['md5'],
+                'last_modified': file_info.get('last_modified', ''),
+                'footer_bytes_fetched': fetched,
+                'profiled_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                **profile,
+            }
+            profiled.append(key)
+            fetched_total += fetched
+    return profiled, unchanged, failed, fetched_total
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Profile Parquet files on s3 from their footers only.')
+    parser.add_argument('--csv', type=Path, default=Path(__file__).parent / 's3_file_list.csv',
+                        help='File list to read (default: s3_file_list.csv next to this script).')
+    parser.add_argument('--source', choices=['csv', 'listing'], default='csv',
+                        help='Read the object list from --csv or the live listing (default: %(default)s).')
+    parser.add_argument('--prefix', default=SPINE_PREFIX, help='Only profile keys under this prefix (default: %(default)s).')
+    parser.add_argument('--manifest', type=Path, default=MANIFEST_PATH, help='Manifest to update (default: %(default)s).')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help='Footers fetched at once (default: %(default)s).')
+    parser.add_argument('--force', action='store_true', help='Re-profile files even if their size and ETag are unchanged.')
+    parser.add_argument('--endpoint-url', default=os.getenv('AWS_ENDPOINT_URL'),
+                        help='S3 endpoint, e.g. a local stand-in such as MinIO (default: $AWS_ENDPOINT_URL or AWS).')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    s3_client = make_s3_client(args.endpoint_url, max_pool_connections=args.concurrency)
+
+    if args.source == 'listing':
+        files = list_objects(s3_client, args.prefix)
+    else:
+        if not args.csv.exists():
+            print(f"Error: {args.csv} not found!", file=sys.stderr)
+            sys.exit(1)
+        files = get_files_to_download(args.csv, args.prefix)
+    files = [f for f in files if f['s3_path'].endswith('.parquet')]
+    if not files:
+        print(f"No .parquet files under {args.prefix}.")
+        return
+
+    manifest = load_manifest(args.manifest)
+    started = time.time()
+    profiled, unchanged, failed, fetched = profile_files(
+        s3_client, files, manifest, concurrency=args.concurrency, force=args.force
+    )
+    manifest['prefixes'] = summarize(manifest)
+    write_manifest(manifest, args.manifest)
+
+    total_size = sum(manifest['files'][k]['size'] for k in profiled)
+    print(f"Profiled {len(profiled)} files ({_format_bytes(total_size)} of Parquet) from "
+          f"{_format_bytes(fetched)} of footers in {time.time() - started:.1f}s; "
+          f"{len(unchanged)} unchanged")
+    for prefix, summary in sorted(manifest['prefixes'].items()):
+        if not prefix.startswith(args.prefix) and not args.prefix.startswith(prefix):
+            continue
+        print(f"  {prefix}: {summary['files']} files, {summary['total_rows']:,} rows, "
+              f"{len(summary['schema_fingerprints'])} schema(s)")
+        for key in summary['drifted_files']:
+            print(f"    Schema drift: {key} ({manifest['files'][key]['schema_fingerprint']})")
+    print(f"Manifest written to {args.manifest}")
+    if failed:
+        print(f"  Failed: {len(failed)} files", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
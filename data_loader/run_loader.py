@@ -0,0 +1,530 @@
+#!/usr/bin/env python3
+"""
+Run the data_loader SQL pipeline (01_setup.sql through 04_verify.sql).
+
+The scripts run as a dependency graph instead of by hand:
+
+    01_setup.sql
+      ├── 02a_create_spine_table.sql ─────── 03a: INDIVIDUAL_DEMOGRAPHIC_SPINE ──┐
+      └── 02b_create_transaction_tables.sql ─ 03b: one node per COPY INTO ──────┴── 04_verify.sql
+
+Every COPY INTO in the 03 scripts becomes its own node, so independent table
+loads run concurrently. A load's prefix is split into file batches (COPY INTO
+... FILES = (...)) sized from the byte counts in s3_file_list.csv. Files
+already recorded in the table's COPY_HISTORY are skipped, unless the run
+also recreates the tables (the 'create' step). At the end a
+per-table report lists files loaded / skipped, rows loaded / rejected and
+throughput (also written to load_report.json).
+
+Usage:
+    python3 run_loader.py --concurrency 8
+
+    # Only the loads (tables already exist), only two tables, 4 GB batches
+    python3 run_loader.py --steps load --tables TRANSACTION CARD --batch-mb 4096
+
+    # Print the plan (nodes and batches) without connecting
+    python3 run_loader.py --dry-run
+
+Requirements:
+    - snowflake-connector-python: pip install snowflake-connector-python
+    - SNOWFLAKE_ACCOUNT, SNOWFLAKE_USER, SNOWFLAKE_PASSWORD (and optionally
+      SNOWFLAKE_WAREHOUSE, SNOWFLAKE_ROLE, SNOWFLAKE_DATABASE) in the environment
+    - s3_file_list.csv in the same directory (for batching)
+
+--connection-factory module:callable swaps in any zero-argument DB-API
+connection factory (e.g. a local SQL stand-in for testing).
+"""
+
+import argparse
+import importlib
+import json
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from download_data_dictionaries_from_s3 import MB, _format_bytes, get_files_to_download
+
+SCRIPT_DIR = Path(__file__).parent
+MANIFEST_CSV = SCRIPT_DIR / 's3_file_list.csv'
+REPORT_PATH = SCRIPT_DIR / 'load_report.json'
+
+SETUP_SCRIPT = '01_setup.sql'
+CREATE_SCRIPTS = {'02a_create_spine_table.sql': ['03a_load_data_spine.sql'],
+                  '02b_create_transaction_tables.sql': ['03b_load_data_transactions.sql']}
+VERIFY_SCRIPT = '04_verify.sql'
+STEPS = ['setup', 'create', 'load', 'verify']
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_BATCH_MB = 8 * 1024
+MAX_FILES_PER_BATCH = 1000  # Snowflake's limit for COPY INTO ... FILES
+DEFAULT_HISTORY_DAYS = 14   # COPY_HISTORY retention
+
+COPY_RE = re.compile(
+    r"COPY\s+INTO\s+(?P<table>[\w.$\"]+).*?\bFROM\s+@(?P<stage>[\w.$]+)/(?P<path>\S*)",
+    re.IGNORECASE | re.DOTALL,
+)
+PATTERN_RE = re.compile(r"\bPATTERN\s*=\s*'(?P<pattern>(?:[^']|'')*)'", re.IGNORECASE)
+STAGE_RE = re.compile(r"CREATE\s+(?:OR\s+REPLACE\s+)?STAGE\s+(?P<stage>[\w.$]+)\s+URL\s*=\s*'s3://(?P<bucket>[^/']+)/(?P<prefix>[^']*)'",
+                      re.IGNORECASE)
+SESSION_RE = re.compile(r"^\s*USE\s+", re.IGNORECASE)
+
+COPY_HISTORY_SQL = """
+SELECT FILE_NAME, STATUS
+FROM TABLE(INFORMATION_SCHEMA.COPY_HISTORY(
+  TABLE_NAME => %(table)s,
+  START_TIME => DATEADD(days, -%(days)s, CURRENT_TIMESTAMP())
+))
+"""
+LOADED_STATUSES = {'LOADED', 'PARTIALLY_LOADED'}
+
+
+def split_statements(sql):
+    """Split a script on semicolons outside quotes and comments; comment-only statements are dropped."""
+    statements, current, i, n = [], [], 0, len(sql)
+    in_quote = False
+    while i < n:
+        ch = sql[i]
+        if in_quote:
+            current.append(ch)
+            if ch == "'" and sql[i + 1:i + 2] == "'":
+                current.append("'")
+                i += 1
+            elif ch == "'":
+                in_quote = False
+        elif ch == "'":
+            in_quote = True
+            current.append(ch)
+        elif sql.startswith('--', i):
+            end = sql.find('\n', i)
+            i = n if end == -1 else end
+            continue
+        elif ch == ';':
+            statements.append(''.join(current))
+            current = []
+        else:
+            current.append(ch)
+        i += 1
+    statements.append(''.join(current))
+    return [s.strip() for s in statements if s.strip()]
+
+
+def stage_locations(setup_sql):
+    """{stage name: (bucket, key prefix)} from the CREATE STAGE statements in 01_setup.sql."""
+    return {m['stage'].upper(): (m['bucket'], m['prefix']) for m in STAGE_RE.finditer(setup_sql)}
+
+
+def _sql_literal(value):
+    return "'" + value.replace("'", "''") + "'"
+
+
+class Node:
+    """One step of the graph: a list of tasks (statement batches) run after deps succeed."""
+
+    def __init__(self, name, deps, tasks, table=None, critical=True):
+        self.name = name
+        self.deps = deps
+        self.tasks = tasks
+        self.table = table
+        self.critical = critical  # failures block dependents
+        self.status = 'pending'
+        self.errors = []
+
+
+class LoadStats:
+    """Per-table counters, updated from every batch's COPY INTO result rows."""
+
+    def __init__(self):
+        self.tables = {}
+        self._lock = threading.Lock()
+
+    def table(self, name):
+        with self._lock:
+            return self.tables.setdefault(name, {
+                'files_planned': 0, 'files_skipped_history': 0, 'files_loaded': 0, 'files_partially_loaded': 0,
+                'files_failed': 0, 'rows_parsed': 0, 'rows_loaded': 0, 'rows_rejected': 0, 'bytes': 0,
+                'batches': 0, 'batches_failed': 0, 'started': None, 'finished': None, 'seconds': 0.0,
+                'first_errors': [],
+            })
+
+    def record(self, name, rows, nbytes, started, finished):
+        stats = self.table(name)
+        with self._lock:
+            stats['batches'] += 1
+            stats['bytes'] += nbytes
+            # Wall-clock span of the table's batches, which overlap
+            stats['started'] = started if stats['started'] is None else min(stats['started'], started)
+            stats['finished'] = finished if stats['finished'] is None else max(stats['finished'], finished)
+            stats['seconds'] = round(stats['finished'] - stats['started'], 3)
+            for row in rows:
+                status = str(row.get('status', '')).upper().replace(' ', '_')
+                if 'rows_loaded' not in row:
+                    continue  # "Copy executed with 0 files processed."
+                stats['files_loaded'] += status == 'LOADED'
+                stats['files_partially_loaded'] += status == 'PARTIALLY_LOADED'
+                stats['files_failed'] += status == 'LOAD_FAILED'
+                parsed, loaded = int(row.get('rows_parsed') or 0), int(row.get('rows_loaded') or 0)
+                stats['rows_parsed'] += parsed
+                stats['rows_loaded'] += loaded
+                stats['rows_rejected'] += int(row.get('errors_seen') or 0) or max(parsed - loaded, 0)
+                if row.get('first_error') and len(stats['first_errors']) < 3:
+                    stats['first_errors'].append(f"{row.get('file')}: {row['first_error']}")
+
+    def batch_failed(self, name):
+        stats = self.table(name)
+        with self._lock:
+            stats['batches_failed'] += 1
+
+
+class Connections:
+    """Fixed-size pool of connections from factory, opened lazily."""
+
+    def __init__(self, factory, size):
+        self.factory = factory
+        self._idle = queue.Queue()
+        self._all = []
+        self._lock = threading.Lock()
+        self.size = size
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if len(self._all) < self.size:
+                    conn = self.factory()
+                    self._all.append(conn)
+                    return conn
+            return self._idle.get()
+
+    def release(self, conn):
+        self._idle.put(conn)
+
+    def close(self):
+        for conn in self._all:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+def _execute(conn, sql, params=None):
+    """Run one statement; return its result rows as dicts with lower-case keys."""
+    cur = conn.cursor()
+    try:
+        cur.execute(sql, params) if params else cur.execute(sql)
+        if not cur.description:
+            return []
+        names = [d[0].lower() for d in cur.description]
+        return [dict(zip(names, row)) for row in cur.fetchall()]
+    finally:
+        cur.close()
+
+
+def loaded_files(conn, session, table, days):
+    """File names COPY_HISTORY reports as loaded (fully or partially) into table within days."""
+    for statement in session:
+        _execute(conn, statement)
+    rows = _execute(conn, COPY_HISTORY_SQL, {'table': table, 'days': days})
+    return {
+        row['file_name'] for row in rows
+        if str(row.get('status', '')).upper().replace(' ', '_') in LOADED_STATUSES
+    }
+
+
+def plan_batches(files, batch_bytes, max_files=MAX_FILES_PER_BATCH):
+    """Greedy batches of (relative path, size) files: at most batch_bytes (one oversized file per batch) / max_files."""
+    batches, current, current_bytes = [], [], 0
+    for rel, size in files:
+        if current and (current_bytes + size > batch_bytes or len(current) >= max_files):
+            batches.append(current)
+            current, current_bytes = [], 0
+        current.append((rel, size))
+        current_bytes += size
+    if current:
+        batches.append(current)
+    return batches
+
+
+def copy_batch_sql(statement, rel_paths):
+    """Rewrite a COPY INTO to load exactly rel_paths (relative to its FROM location)."""
+    files_clause = 'FILES = (' + ', '.join(_sql_literal(p) for p in rel_paths) + ')'
+    if PATTERN_RE.search(statement):
+        return PATTERN_RE.sub(files_clause, statement, count=1)
+    return re.sub(r'(\bFILE_FORMAT\b)', files_clause + r'\n\1', statement, count=1, flags=re.IGNORECASE)
+
+
+def build_graph(script_dir, manifest_rows, batch_bytes, steps, tables=None, history=None):
+    """Build the nodes. history(table, session) -> set of loaded S3 paths; None skips the history check.
+
+    The history check is also skipped when 'create' is in steps: the 02 scripts
+    CREATE OR REPLACE every table, so files loaded before are gone with them.
+    """
+    if 'create' in steps:
+        history = None
+    stats = LoadStats()
+    setup_sql = (script_dir / SETUP_SCRIPT).read_text()
+    stages = stage_locations(setup_sql)
+    nodes = {}
+
+    def script_node(name, script, deps):
+        statements = split_statements((script_dir / script).read_text())
+        nodes[name] = Node(name, deps, [(statements, 0)])
+
+    if 'setup' in steps:
+        script_node(SETUP_SCRIPT, SETUP_SCRIPT, [])
+    load_nodes = []
+    for create_script, load_scripts in CREATE_SCRIPTS.items():
+        if 'create' in steps:
+            script_node(create_script, create_script, [SETUP_SCRIPT])
+        if 'load' not in steps:
+            continue
+        for load_script in load_scripts:
+            statements = split_statements((script_dir / load_script).read_text())
+            session = [s for s in statements if SESSION_RE.match(s)]
+            for statement in statements:
+                m = COPY_RE.search(statement)
+                if not m:
+                    continue
+                table = m['table'].upper()
+                short = table.split('.')[-1]
+                if tables and short not in tables and table not in tables:
+                    continue
+                bucket, stage_prefix = stages.get(m['stage'].upper(), (None, ''))
+                key_prefix = stage_prefix + m['path']
+                pattern = PATTERN_RE.search(statement)
+                regex = re.compile(pattern['pattern'].replace("''", "'")) if pattern else None
+                files = []
+                for row in manifest_rows:
+                    key = row['s3_path'].split('/', 3)[3] if row['s3_path'].startswith('s3://') else row['s3_path']
+                    if not key.startswith(key_prefix) or key.endswith('/'):
+                        continue
+                    rel = key[len(key_prefix):]
+                    if regex and not regex.fullmatch(rel):
+                        continue
+                    files.append((rel, int(row['size'] or 0), f"s3://{bucket}/{key}"))
+
+                table_stats = stats.table(table)
+                table_stats['files_planned'] = len(files)
+                if history is not None and files:
+                    # COPY_HISTORY names files by full URL or by path; match either form
+                    done = {name.replace(f's3://{bucket}/', '') for name in history(table, session)}
+                    pending = [f for f in files
+                               if f[2].replace(f's3://{bucket}/', '') not in done and f[0] not in done]
+                    table_stats['files_skipped_history'] = len(files) - len(pending)
+                    files = pending
+
+                if files:
+                    batches = plan_batches([(rel, size) for rel, size, _ in files], batch_bytes)
+                    tasks = [(session + [copy_batch_sql(statement, [rel for rel, _ in batch])],
+                              sum(size for _, size in batch)) for batch in batches]
+                elif manifest_rows and history is not None:
+                    tasks = []  # everything already loaded
+                else:
+                    tasks = [(session + [statement], 0)]  # no manifest entries: run the COPY as written
+                name = f"{load_script}: {table}"
+                nodes[name] = Node(name, [create_script] if 'create' in steps else [], tasks,
+                                   table=table, critical=False)
+                load_nodes.append(name)
+
+    if 'verify' in steps:
+        script_node(VERIFY_SCRIPT, VERIFY_SCRIPT, load_nodes)
+    # Deps on steps that are not part of this run are already satisfied
+    for node in nodes.values():
+        node.deps = [d for d in node.deps if d in nodes]
+    return nodes, stats
+
+
+def run_graph(nodes, stats, connections, concurrency):
+    """Run ready nodes' tasks concurrently (dependency order); returns the nodes with statuses set."""
+    started = time.time()
+    outstanding = {name: len(node.tasks) for name, node in nodes.items()}
+
+    def run_task(node, statements, nbytes):
+        conn = connections.acquire()
+        t0 = time.time()
+        try:
+            rows = []
+            for statement in statements:
+                rows = _execute(conn, statement)
+            if node.table:
+                stats.record(node.table, rows, nbytes, t0, time.time())
+        finally:
+            connections.release(conn)
+
+    def blocked(node):
+        return any(nodes[d].status in ('failed', 'blocked') and nodes[d].critical for d in node.deps)
+
+    # Non-critical (load) nodes that failed or were blocked still let their dependents (verify) run
+    terminal = ('done', 'failed', 'blocked')
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {}
+        while True:
+            for name, node in nodes.items():
+                if node.status != 'pending':
+                    continue
+                if blocked(node):
+                    node.status = 'blocked'
+                    print(f"  Skipping {name}: a dependency failed", file=sys.stderr)
+                elif all(nodes[d].status in terminal for d in node.deps):
+                    node.status = 'running'
+                    print(f"  Starting {name} ({len(node.tasks)} batch(es))")
+                    if not node.tasks:
+                        node.status = 'done'
+                    for statements, nbytes in node.tasks:
+                        futures[executor.submit(run_task, node, statements, nbytes)] = node
+            if not futures:
+                if any(n.status == 'pending' for n in nodes.values()):
+                    continue  # nodes unblocked by the pass above
+                break
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                node = futures.pop(fut)
+                exc = fut.exception()
+                if exc is not None:
+                    node.errors.append(str(exc))
+                    print(f"Error in {node.name}: {exc}", file=sys.stderr)
+                    if node.table:
+                        stats.batch_failed(node.table)
+                outstanding[node.name] -= 1
+                if outstanding[node.name] == 0:
+                    node.status = 'failed' if node.errors else 'done'
+                    print(f"  Finished {node.name}: {node.status} ({time.time() - started:.1f}s elapsed)")
+    return nodes
+
+
+def print_report(nodes, stats, elapsed):
+    print("\nLoad report")
+    header = f"  {'TABLE':<40} {'FILES':>7} {'SKIPPED':>8} {'FAILED':>7} {'ROWS LOADED':>14} {'REJECTED':>10} {'SIZE':>10} {'MB/s':>8}"
+    print(header)
+    for table, s in sorted(stats.tables.items()):
+        rate = s['bytes'] / MB / s['seconds'] if s['seconds'] else 0
+        print(f"  {table:<40} {s['files_loaded'] + s['files_partially_loaded']:>7} {s['files_skipped_history']:>8} "
+              f"{s['files_failed']:>7} {s['rows_loaded']:>14,} {s['rows_rejected']:>10,} "
+              f"{_format_bytes(s['bytes']):>10} {rate:>8.1f}")
+        for error in s['first_errors']:
+            print(f"      first error: {error}")
+    total_bytes = sum(s['bytes'] for s in stats.tables.values())
+    print(f"\n  {sum(s['rows_loaded'] for s in stats.tables.values()):,} rows loaded, "
+          f"{sum(s['rows_rejected'] for s in stats.tables.values()):,} rejected, "
+          f"{_format_bytes(total_bytes)} in {elapsed:.1f}s ({_format_bytes(total_bytes / elapsed if elapsed else 0)}/s)")
+    for node in nodes.values():
+        if node.status in ('failed', 'blocked'):
+            print(f"  {node.status.upper()}: {node.name}" + (f" - {node.errors[0]}" if node.errors else ''),
+                  file=sys.stderr)
+
+
+
+def get_snowflake_connection():
+    import snowflake.connector
+
+    params = {
+        'account': os.environ['SNOWFLAKE_ACCOUNT'],
+        'user': os.environ['SNOWFLAKE_USER'],
+        'password': os.environ['SNOWFLAKE_PASSWORD'],
+        'warehouse': os.getenv('SNOWFLAKE_WAREHOUSE'),
+        'role': os.getenv('SNOWFLAKE_ROLE'),
+        'database': os.getenv('SNOWFLAKE_DATABASE', 'DEMO'),
+    }
+    return snowflake.connector.connect(**{k: v for k, v in params.items() if v})
+
+
+def _load_factory(spec):
+    module_name, _, attr = spec.partition(':')
+    if not attr:
+        raise ValueError(f"--connection-factory must look like module:callable, got '{spec}'")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Run the data_loader SQL scripts as a parallel dependency graph.')
+    parser.add_argument('--steps', nargs='+', choices=STEPS, default=STEPS,
+                        help='Steps to run (default: all). Dependencies on steps left out are assumed done.')
+    parser.add_argument('--tables', nargs='+', default=None, type=str.upper,
+                        help='Only load these tables (e.g. TRANSACTION CARD).')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help='Statements / COPY batches run at once, one connection each (default: %(default)s).')
+    parser.add_argument('--batch-mb', type=int, default=DEFAULT_BATCH_MB,
+                        help='Target size of one COPY INTO file batch, from manifest byte counts (default: %(default)s).')
+    parser.add_argument('--csv', type=Path, default=MANIFEST_CSV,
+                        help='Manifest with file sizes (default: s3_file_list.csv).')
+    parser.add_argument('--history-days', type=int, default=DEFAULT_HISTORY_DAYS,
+                        help='Skip files COPY_HISTORY shows loaded within this many days (default: %(default)s; '
+                             '0 disables). Off when --steps includes create.')
+    parser.add_argument('--report', type=Path, default=REPORT_PATH, help='JSON report path (default: %(default)s).')
+    parser.add_argument('--connection-factory', default=None, metavar='MODULE:CALLABLE',
+                        help='Zero-argument connection factory to use instead of Snowflake.')
+    parser.add_argument('--dry-run', action='store_true', help='Print the nodes and batches without connecting.')
+    args = parser.parse_args(argv)
+    if args.concurrency < 1 or args.batch_mb < 1:
+        parser.error('--concurrency and --batch-mb must be >= 1')
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    manifest_rows = get_files_to_download(args.csv, prefix='') if args.csv.exists() else []
+    if not manifest_rows:
+        print(f"Warning: no manifest at {args.csv}; COPY statements run unbatched", file=sys.stderr)
+
+    factory = _load_factory(args.connection_factory) if args.connection_factory else get_snowflake_connection
+    connections = Connections(factory, args.concurrency)
+    history = None
+    if 'create' in args.steps and 'load' in args.steps and args.history_days > 0:
+        print("Note: 'create' recreates the tables, so every file is loaded (COPY_HISTORY skip is off)")
+    elif not args.dry_run and args.history_days > 0 and 'load' in args.steps:
+        def history(table, session):
+            conn = connections.acquire()
+            try:
+                return loaded_files(conn, session, table, args.history_days)
+            except Exception as e:
+                print(f"Warning: could not read COPY_HISTORY for {table} ({e}); loading every file",
+                      file=sys.stderr)
+                return set()
+            finally:
+                connections.release(conn)
+
+    started = time.time()
+    try:
+        nodes, stats = build_graph(SCRIPT_DIR, manifest_rows, args.batch_mb * MB, args.steps,
+                                   tables=args.tables, history=history)
+        print(f"Plan: {len(nodes)} node(s), {sum(len(n.tasks) for n in nodes.values())} batch(es)")
+        for name, node in nodes.items():
+            deps = ''
+            if node.deps:
+                deps = f" after {', '.join(node.deps)}" if len(node.deps) <= 2 else f" after {len(node.deps)} nodes"
+            extra = ''
+            if node.table:
+                s = stats.table(node.table)
+                extra = (f" - {s['files_planned']} file(s), {s['files_skipped_history']} already loaded, "
+                         f"{_format_bytes(sum(nbytes for _, nbytes in node.tasks))}")
+            print(f"  {name}: {len(node.tasks)} batch(es){extra}{deps}")
+        if args.dry_run:
+            return
+
+        run_graph(nodes, stats, connections, args.concurrency)
+    finally:
+        connections.close()
+
+    elapsed = time.time() - started
+    print_report(nodes, stats, elapsed)
+    report = {
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(started)),
+        'elapsed_seconds': round(elapsed, 1),
+        'nodes': {name: {'status': n.status, 'batches': len(n.tasks), 'errors': n.errors} for name, n in nodes.items()},
+        'tables': stats.tables,
+    }
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=1, default=str)
+    print(f"\nReport written to {args.report}")
+    if any(n.status in ('failed', 'blocked') for n in nodes.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
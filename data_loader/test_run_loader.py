@@ -0,0 +1,169 @@
+"""Tests for run_loader.py against an in-process stand-in connection (--connection-factory)."""
+
+import csv
+import json
+import re
+import threading
+import time
+
+import pytest
+
+import run_loader
+
+PREFIX = 's3://afs-akkio/files_from_affinity/purchase_intelligence/eval/2025-11-10/'
+CARD_FILES = [f'{PREFIX}card/{i:04d}_part_00.gz' for i in range(3)]
+MERCHANT_FILES = [f'{PREFIX}merchant/{i:04d}_part_00.gz' for i in range(2)]
+ROWS_PER_FILE = 10
+COPY_SECONDS = 0.05  # long enough for concurrent batches to overlap
+
+
+class Warehouse:
+    """Tables, rows and COPY_HISTORY shared by every stand-in connection.
+
+    Like Snowflake's COPY_HISTORY lookup by table name, history outlives
+    CREATE OR REPLACE TABLE.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rows = {}
+        self.history = {}
+        self.history_lookups = []
+        self.copies = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+
+WAREHOUSE = Warehouse()
+
+
+class StandInCursor:
+    def __init__(self, warehouse):
+        self.warehouse = warehouse
+        self.description = None
+        self.rows = []
+
+    def execute(self, sql, params=None):
+        wh = self.warehouse
+        self.description, self.rows = None, []
+        copy = re.match(r'\s*COPY\s+INTO', sql, re.IGNORECASE)
+        if copy:
+            with wh.lock:
+                wh.in_flight += 1
+                wh.max_in_flight = max(wh.max_in_flight, wh.in_flight)
+            time.sleep(COPY_SECONDS)
+        with wh.lock:
+            if copy:
+                wh.in_flight -= 1
+            created = re.match(r'\s*CREATE\s+OR\s+REPLACE\s+TABLE\s+([\w.]+)', sql, re.IGNORECASE)
+            if created:
+                wh.rows[created[1].upper()] = 0
+            elif 'COPY_HISTORY' in sql and params:  # run_loader's skip check, not 04_verify.sql
+                wh.history_lookups.append(params['table'])
+                self.description = [('FILE_NAME',), ('STATUS',)]
+                self.rows = [(name, 'Loaded') for name in wh.history.get(params['table'], [])]
+            elif copy:
+                table = run_loader.COPY_RE.search(sql)['table'].upper()
+                files = re.findall(r"'([^']+)'", re.search(r'FILES = \((.*?)\)', sql, re.DOTALL)[1])
+                wh.copies.append((table, files, sql))
+                wh.rows[table] = wh.rows.get(table, 0) + ROWS_PER_FILE * len(files)
+                wh.history.setdefault(table, []).extend(files)
+                self.description = [(c,) for c in ('file', 'status', 'rows_parsed', 'rows_loaded', 'errors_seen')]
+                self.rows = [(f, 'LOADED', ROWS_PER_FILE, ROWS_PER_FILE, 0) for f in files]
+        return self
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class StandInConnection:
+    def cursor(self):
+        return StandInCursor(WAREHOUSE)
+
+    def close(self):
+        pass
+
+
+def connect():
+    return StandInConnection()
+
+
+@pytest.fixture
+def loader(tmp_path):
+    global WAREHOUSE
+    WAREHOUSE = Warehouse()
+    manifest = tmp_path / 's3_file_list.csv'
+    report = tmp_path / 'load_report.json'
+
+    def run(*args, sizes=None):
+        """Run the loader over a manifest of sizes ({s3 path: bytes}; default 1 KiB per test file)."""
+        sizes = sizes or {name: 1024 for name in CARD_FILES + MERCHANT_FILES}
+        with open(manifest, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['name', 'size', 'md5', 'last_modified'])
+            for name, size in sizes.items():
+                writer.writerow([name, size, '', ''])
+        run_loader.main(['--connection-factory', f'{__name__}:connect', '--csv', str(manifest),
+                         '--report', str(report), '--tables', 'CARD', 'MERCHANT', *args])
+        return json.loads(report.read_text())
+    return run
+
+
+def test_loads_every_manifest_file(loader):
+    report = loader()
+    assert report['tables']['DEMO.AFS_POC.CARD']['files_loaded'] == len(CARD_FILES)
+    assert report['tables']['DEMO.AFS_POC.MERCHANT']['rows_loaded'] == ROWS_PER_FILE * len(MERCHANT_FILES)
+    assert all(node['status'] == 'done' for node in report['nodes'].values())
+
+
+def test_load_only_rerun_skips_files_in_copy_history(loader):
+    loader()
+    report = loader('--steps', 'load')
+    card = report['tables']['DEMO.AFS_POC.CARD']
+    assert card['files_skipped_history'] == len(CARD_FILES)
+    assert card['files_loaded'] == 0
+    assert WAREHOUSE.rows['DEMO.AFS_POC.CARD'] == ROWS_PER_FILE * len(CARD_FILES)
+
+
+def test_rerun_with_create_reloads_recreated_tables(loader):
+    loader()
+    report = loader()
+    card = report['tables']['DEMO.AFS_POC.CARD']
+    assert card['files_skipped_history'] == 0
+    assert card['files_loaded'] == len(CARD_FILES)
+    assert WAREHOUSE.rows['DEMO.AFS_POC.CARD'] == ROWS_PER_FILE * len(CARD_FILES)
+    assert WAREHOUSE.rows['DEMO.AFS_POC.MERCHANT'] == ROWS_PER_FILE * len(MERCHANT_FILES)
+    assert not WAREHOUSE.history_lookups
+
+
+def test_splits_tables_into_batches_by_manifest_size_and_file_cap(loader):
+    # CARD: five 400 MiB files against a 1000 MiB target -> 2 + 2 + 1 files.
+    # MERCHANT: 2,500 small files -> capped at MAX_FILES_PER_BATCH per COPY.
+    card = [f'{PREFIX}card/{i:04d}_part_00.gz' for i in range(5)]
+    merchant = [f'{PREFIX}merchant/{i:05d}_part_00.gz' for i in range(2500)]
+    sizes = {**{name: 400 * run_loader.MB for name in card}, **{name: 1024 for name in merchant}}
+    report = loader('--batch-mb', '1000', '--concurrency', '4', sizes=sizes)
+
+    batches = {node.split(': ')[-1]: n['batches'] for node, n in report['nodes'].items() if ': ' in node}
+    assert batches == {'DEMO.AFS_POC.CARD': 3, 'DEMO.AFS_POC.MERCHANT': 3}
+
+    def rel(names):
+        return [name.rsplit('/', 1)[-1] for name in names]
+    copied = {}
+    for table, files, sql in WAREHOUSE.copies:
+        assert 'PATTERN' not in sql.upper()
+        copied.setdefault(table, []).append(files)
+    assert sorted(copied['DEMO.AFS_POC.CARD']) == [rel(card[0:2]), rel(card[2:4]), rel(card[4:5])]
+    cap = run_loader.MAX_FILES_PER_BATCH
+    assert sorted(copied['DEMO.AFS_POC.MERCHANT']) == [rel(merchant[0:cap]), rel(merchant[cap:2 * cap]),
+                                                       rel(merchant[2 * cap:])]
+
+    card_stats = report['tables']['DEMO.AFS_POC.CARD']
+    merchant_stats = report['tables']['DEMO.AFS_POC.MERCHANT']
+    assert (card_stats['files_loaded'], card_stats['rows_loaded']) == (5, 5 * ROWS_PER_FILE)
+    assert (merchant_stats['files_loaded'], merchant_stats['rows_loaded']) == (2500, 2500 * ROWS_PER_FILE)
+    assert WAREHOUSE.rows['DEMO.AFS_POC.MERCHANT'] == 2500 * ROWS_PER_FILE
+    assert WAREHOUSE.max_in_flight > 1
@@ -0,0 +1,44 @@
+{% macro fte_rebuild_filter(column, deliveries, delivery_column, latest_day='trans_date', watermark='latest_delivery_date', grain='day') %}
+    {#-
+        Incremental filter on column for fact_transaction_enriched and the
+        models built from it: the days (months with grain='month') to rebuild.
+          - the latest day {{ this }} holds (MAX(latest_day)) and the
+            fte_lookback_days before it: a partial latest day, late arrivals
+          - every day with rows in deliveries whose delivery_column is past
+            the newest delivery {{ this }} has processed (MAX(watermark))
+        The delivery watermark is strict, so a run with no new delivery only
+        rebuilds the lookback window.
+    -#}
+    (
+        {% if grain == 'month' -%}
+        {{ column }} >= DATE_TRUNC('MONTH', {{ _fte_lookback_start(latest_day) }})
+        OR DATE_TRUNC('MONTH', {{ column }}) IN (
+            SELECT DISTINCT DATE_TRUNC('MONTH', trans_date)
+        {%- else -%}
+        {{ column }} >= {{ _fte_lookback_start(latest_day) }}
+        OR {{ column }} IN (
+            SELECT DISTINCT trans_date
+        {%- endif %}
+            FROM {{ deliveries }}
+            WHERE {{ delivery_column }} > (SELECT MAX({{ watermark }}) FROM {{ this }})
+        )
+    )
+{%- endmacro %}
+
+
+{% macro fte_rebuild_start(deliveries, delivery_column, latest_day='trans_date', watermark='latest_delivery_date') %}
+    {#- Earliest day fte_rebuild_filter() selects with the same arguments (grain='day') -#}
+    (
+        SELECT LEAST(
+            {{ _fte_lookback_start(latest_day) }},
+            COALESCE(MIN(trans_date), {{ _fte_lookback_start(latest_day) }})
+        )
+        FROM {{ deliveries }}
+        WHERE {{ delivery_column }} > (SELECT MAX({{ watermark }}) FROM {{ this }})
+    )
+{%- endmacro %}
+
+
+{% macro _fte_lookback_start(latest_day) -%}
+    (SELECT DATEADD(day, -{{ var('fte_lookback_days') }}, MAX({{ latest_day }})) FROM {{ this }})
+{%- endmacro %}
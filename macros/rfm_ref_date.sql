@@ -0,0 +1,8 @@
+{% macro rfm_ref_date() %}
+    {#- Reference date for rfm_features: the rfm_ref_date var, else MAX(TRANS_DATE) -#}
+    {%- if var('rfm_ref_date', none) is not none -%}
+        '{{ var("rfm_ref_date") }}'::DATE
+    {%- else -%}
+        (SELECT MAX(TRANS_DATE) FROM {{ ref('fact_transaction_enriched') }})
+    {%- endif -%}
+{% endmacro %}
@@ -0,0 +1,109 @@
+{{ config(
+    alias='DIM_BRAND_KEYWORD_MATCH',
+    materialized='incremental',
+    unique_key=['match_id'],
+    incremental_strategy='merge',
+    post_hook=[
+        "alter table {{this}} cluster by (keyword)"
+    ]
+)}}
+
+-- ============================================================================
+-- DIM_BRAND_KEYWORD_MATCH: Brand Keyword -> Merchant Resolution
+-- Resolves every audience brand keyword (seed: brand_keywords) to the merchant
+-- keys whose BRAND_NAME, STORE_NAME or MERCHANT_DESCRIPTION contain it, using
+-- the same UPPER(col) LIKE '%KEYWORD%' rule as the audience validator.
+-- Grain: One row per (keyword, mtid, store_id, brand_id)
+--
+-- The validator semi-joins FACT_TRANSACTION_ENRICHED to this table on
+-- (mtid, store_id_key, brand_id_key) instead of evaluating LIKE predicates
+-- row by row over the fact window, so brand filtering cost no longer grows
+-- with the number of keywords.
+--
+-- Keys mirror the columns FACT_TRANSACTION_ENRICHED carries: the
+-- transaction's mtid, store_id / brand_id from BRAND_TAGGING. Merchant keys
+-- come from MERCHANT and BRAND_TAGGING alike, because a transaction whose mtid
+-- has tagging but no MERCHANT row still LIKE-matches on brand / store name.
+-- store_id_key and brand_id_key replace NULL with -1 so merchants without
+-- brand tagging still join with plain equality.
+--
+-- INCREMENTAL LOGIC:
+--   Only re-evaluates merchants loaded since the last run, plus every merchant
+--   for keywords that have not matched anything yet (e.g. newly added to the
+--   seed). Run with --full-refresh after removing keywords or if merchant names
+--   are restated. Tables built before tagging-only merchants were included
+--   (and FACT_TRANSACTION_ENRICHED before it carried the transaction's mtid)
+--   need one --full-refresh of both.
+-- ============================================================================
+
+WITH keywords AS (
+    SELECT DISTINCT UPPER(TRIM(keyword)) AS keyword
+    FROM {{ ref('brand_keywords') }}
+    WHERE keyword IS NOT NULL
+),
+
+merchant_keys AS (
+    SELECT mtid FROM {{ source('afs_poc', 'MERCHANT') }} WHERE mtid IS NOT NULL
+    UNION
+    SELECT mtid FROM {{ source('afs_poc', 'BRAND_TAGGING') }} WHERE mtid IS NOT NULL
+),
+
+merchants AS (
+    SELECT DISTINCT
+        k.mtid,
+        bt.store_id,
+        bt.brand_id,
+        btax.brand_name,
+        btax.store_name,
+        m.MERCH_DESC AS merchant_description,
+        GREATEST(
+            COALESCE(m.load_timestamp, bt.load_timestamp),
+            COALESCE(bt.load_timestamp, m.load_timestamp),
+            COALESCE(btax.load_timestamp, m.load_timestamp, bt.load_timestamp)
+        ) AS source_loaded_at
+    FROM merchant_keys k
+    LEFT JOIN {{ source('afs_poc', 'MERCHANT') }} m
+        ON k.mtid = m.mtid
+    LEFT JOIN {{ source('afs_poc', 'BRAND_TAGGING') }} bt
+        ON k.mtid = bt.mtid
+    LEFT JOIN {{ source('afs_poc', 'BRAND_TAXONOMY') }} btax
+        ON bt.store_id = btax.store_id
+        AND bt.brand_id = btax.brand_id
+),
+
+candidates AS (
+    SELECT
+        k.keyword,
+        mr.*
+    FROM merchants mr
+    CROSS JOIN keywords k
+    {% if is_incremental() %}
+    WHERE mr.source_loaded_at > (SELECT COALESCE(MAX(source_loaded_at), '1900-01-01'::TIMESTAMP_NTZ) FROM {{ this }})
+       OR k.keyword NOT IN (SELECT DISTINCT keyword FROM {{ this }})
+    {% endif %}
+)
+
+SELECT
+    MD5(CONCAT_WS('|',
+        keyword,
+        mtid,
+        COALESCE(store_id::VARCHAR, ''),
+        COALESCE(brand_id::VARCHAR, '')
+    )) AS match_id,
+    keyword,
+    mtid,
+    store_id,
+    brand_id,
+    COALESCE(store_id, -1) AS store_id_key,
+    COALESCE(brand_id, -1) AS brand_id_key,
+    brand_name,
+    store_name,
+    merchant_description,
+    UPPER(brand_name) LIKE '%' || keyword || '%' AS matched_brand_name,
+    UPPER(store_name) LIKE '%' || keyword || '%' AS matched_store_name,
+    UPPER(merchant_description) LIKE '%' || keyword || '%' AS matched_merchant_description,
+    source_loaded_at
+FROM candidates
+WHERE UPPER(brand_name) LIKE '%' || keyword || '%'
+   OR UPPER(store_name) LIKE '%' || keyword || '%'
+   OR UPPER(merchant_description) LIKE '%' || keyword || '%'
@@ -0,0 +1,75 @@
+{{ config(
+    alias='FACT_BRAND_MONTH_SUMMARY',
+    materialized='incremental',
+    unique_key=['trans_month'],
+    incremental_strategy='delete+insert',
+    post_hook=[
+        "alter table {{this}} cluster by (trans_month, brand_id_key)"
+    ]
+)}}
+
+-- ============================================================================
+-- FACT_BRAND_MONTH_SUMMARY: Monthly Brand Activity per Individual
+-- Aggregates transaction detail by month, AKKIO_ID, brand_id and experiment
+-- group, with transaction count and spend split by channel (ONLINE / B&M).
+-- Source: fact_transaction_enriched (detail table)
+--
+-- FACT_TRANSACTION_SUMMARY drops brand, so brand metrics otherwise need the
+-- detail table. The audience validator routes audiences whose holdout window
+-- starts and ends on month boundaries, and whose brand keywords resolve to
+-- whole brands (DIM_BRAND_KEYWORD_MATCH matched on brand name), to this table
+-- instead of scanning FACT_TRANSACTION_ENRICHED.
+--
+-- Every detail row is kept, so the table reconciles with the detail table:
+--   - untagged transactions land under brand_id NULL (brand_id_key = -1)
+--   - transactions without an AKKIO_ID land under AKKIO_ID NULL
+--
+-- INCREMENTAL LOGIC:
+--   Rebuilds the months holding days fact_transaction_enriched rebuilt,
+--   chosen the same way (fte_rebuild_filter, grain='month'): the latest
+--   loaded month (it may have been partial), the month the
+--   fte_lookback_days window reaches back into and any newer months, plus
+--   every month with rows in a delivery newer than the newest one this table
+--   has processed (latest_delivery_date). delete+insert on trans_month
+--   replaces whole months, so NULL AKKIO_ID / brand_id groups never
+--   duplicate. latest_delivery_date was added after the first release; run
+--   once with --full-refresh to add it. Range restatements of
+--   FACT_TRANSACTION_ENRICHED (start_date / end_date) need a full refresh.
+--
+--   Every detail row is counted, so MAX(last_trans_date) and
+--   SUM(transaction_count) match FACT_TRANSACTION_ENRICHED's MAX(trans_date)
+--   and row count when the table is current; the audience validator checks
+--   exactly that before routing to it.
+-- ============================================================================
+
+SELECT
+    DATE_TRUNC('MONTH', trans_date)::DATE AS trans_month,
+    AKKIO_ID,
+    brand_id,
+    COALESCE(brand_id, -1) AS brand_id_key,
+    EXPERIMENT_GROUP,
+
+    -- All channels
+    COUNT(txid) AS transaction_count,
+    COALESCE(SUM(trans_amount), 0) AS total_spend,
+
+    -- Channel split (transactions with no channel only count in the totals)
+    COUNT_IF(transaction_channel = 'ONLINE') AS online_transaction_count,
+    COALESCE(SUM(IFF(transaction_channel = 'ONLINE', trans_amount, NULL)), 0) AS online_spend,
+    COUNT_IF(transaction_channel = 'B&M') AS bm_transaction_count,
+    COALESCE(SUM(IFF(transaction_channel = 'B&M', trans_amount, NULL)), 0) AS bm_spend,
+
+    MIN(trans_date) AS first_trans_date,
+    MAX(trans_date) AS last_trans_date,
+    MAX(transaction_delivery_date) AS latest_delivery_date
+FROM {{ ref('fact_transaction_enriched') }}
+WHERE trans_date IS NOT NULL
+    {% if is_incremental() %}
+        AND {{ fte_rebuild_filter('trans_date', ref('fact_transaction_enriched'), 'transaction_delivery_date',
+                                  latest_day='last_trans_date', grain='month') }}
+    {% endif %}
+GROUP BY
+    DATE_TRUNC('MONTH', trans_date)::DATE,
+    AKKIO_ID,
+    brand_id,
+    EXPERIMENT_GROUP
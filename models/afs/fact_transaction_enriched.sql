@@ -1,10 +1,19 @@
 {{ config(
     alias='FACT_TRANSACTION_ENRICHED',
     materialized='incremental',
-    unique_key=['txid'],
-    post_hook=[
-        "alter table {{this}} cluster by (trans_date, AKKIO_ID)"
-    ]
+    unique_key='trans_date',
+    incremental_strategy='delete+insert',
+    pre_hook=[
+        "{% if is_incremental() and not (var('start_date', None) and var('end_date', None)) %}
+         SET fte_rebuild_start = {{ fte_rebuild_start(source('afs_poc', 'TRANSACTION'), 'delivery_date', watermark='transaction_delivery_date') }}
+         {% endif %}"
+    ],
+    incremental_predicates=[
+        "trans_date BETWEEN '" ~ var('start_date') ~ "' AND '" ~ var('end_date') ~ "'"
+        if var('start_date', None) and var('end_date', None)
+        else "trans_date >= $fte_rebuild_start"
+    ],
+    cluster_by=['trans_date', 'AKKIO_ID']
 )}}
 
 -- ============================================================================
@@ -42,8 +51,9 @@ SELECT
     c.card_zip,
     c.areaid,
     
-    -- Merchant Attributes
-    m.mtid,
+    -- Merchant Attributes (mtid is the transaction's, so it is set even when
+    -- MERCHANT has no row for it; brand tagging joins on it the same way)
+    t.mtid,
     m.MERCH_DESC AS merchant_description,
     m.mcc AS merchant_category_code,
     m.merch_city AS merchant_city,
@@ -104,23 +114,56 @@ LEFT JOIN exposed_group exp
     ON c.afs_individual_id = exp.AKKIO_ID
 
 -- ============================================================================
--- INCREMENTAL LOGIC: Process only new transactions
--- Supports both incremental mode and batch processing via vars
+-- INCREMENTAL LOGIC: Replace whole trans_date days, chosen from the data
+--   Each run rebuilds (delete+insert on trans_date) every day that:
+--     - is the latest loaded TRANS_DATE or one of the var('fte_lookback_days')
+--       days before it (partial latest day, late arrivals for recent days), or
+--     - received rows in a delivery_date newer than the newest one already
+--       loaded (MAX(transaction_delivery_date), the processed-delivery
+--       watermark), so a delivery carrying transactions for older days
+--       restates those days.
+--   Both anchors are read from this table, not the run date, so a feed that
+--   trails or a static snapshot still loads everything it delivers (see the
+--   fte_rebuild_filter macro). The watermark is strict: a run with no new
+--   delivery rebuilds only the lookback window, and rows landing later under
+--   an already loaded delivery_date are picked up only inside that window
+--   (restate older days with the start_date / end_date vars below). Touched
+--   days are re-read in full from TRANSACTION, so replacing them is exact and
+--   re-running is idempotent.
+--
+--   The delete is bounded with incremental_predicates on trans_date: the
+--   pre-hook stores the earliest day being rebuilt in the session variable
+--   fte_rebuild_start, so the delete prunes to the rebuilt days instead of
+--   scanning the whole table. unique_key is a single column so the delete
+--   takes the IN form and the predicate's trans_date is unambiguous.
+--   Clustering is declared once via cluster_by instead of a post-hook that
+--   re-clustered on every run.
+--
+--   Downstream incremental models (fact_transaction_summary, rfm_daily_state,
+--   fact_brand_day_sketch, fact_brand_month_summary) choose the days to
+--   rebuild with the same fte_rebuild_filter(), against the
+--   latest_delivery_date they carry, and rfm_features recomputes the
+--   individuals on rfm_daily_state days delivered after its own, so days a
+--   delivery restates reach them on their next run. A range restatement (below) moves no delivery
+--   watermark; run them with --full-refresh after one.
+--
+--   Backfill / restate a range of days. Disjoint ranges can run as separate
+--   invocations at the same time (each builds its own temporary table and
+--   deletes only its own range), which stands in for dbt microbatch's
+--   concurrent batches: microbatch anchors its lookback on the run date,
+--   which misses deliveries that trail trans_date.
+--     dbt run --select fact_transaction_enriched --vars '{"start_date": "2024-01-01", "end_date": "2024-01-31"}'
+--     dbt run --select fact_transaction_enriched --vars '{"start_date": "2024-02-01", "end_date": "2024-02-29"}'
+--   Full refresh starts at var('fte_begin_date'):
+--     dbt run --select fact_transaction_enriched --full-refresh
 -- ============================================================================
 WHERE t.trans_date IS NOT NULL
     {% if var('start_date', None) and var('end_date', None) %}
-        -- Batch processing mode: use --vars '{"start_date": "2024-01-01", "end_date": "2024-01-31"}'
+        -- Batch processing mode: replaces exactly the days in the range
         AND t.trans_date BETWEEN '{{ var("start_date") }}' AND '{{ var("end_date") }}'
     {% elif is_incremental() %}
-        -- Normal incremental mode: process only new data
-        AND t.trans_date > (SELECT MAX(trans_date) FROM {{ this }})
+        AND {{ fte_rebuild_filter('t.trans_date', source('afs_poc', 'TRANSACTION'), 'delivery_date',
+                                  watermark='transaction_delivery_date') }}
     {% else %}
-        -- Full refresh: Last 6 months of data based on trans_date
-        -- AND t.trans_date >= DATEADD(month, -6, CURRENT_DATE())
+        AND t.trans_date >= '{{ var("fte_begin_date") }}'
     {% endif %}
-
--- To change the date range, modify the DATEADD function above:
---   - For 12 months: Change -6 to -12
---   - For 18 months: Change -6 to -18
---   - For full data: Comment out or remove the WHERE clause entirely
-
@@ -0,0 +1,53 @@
+{{ config(
+    alias='RFM_DAILY_STATE',
+    materialized='incremental',
+    unique_key=['trans_date'],
+    incremental_strategy='delete+insert',
+    post_hook=[
+        "alter table {{this}} cluster by (trans_date, AKKIO_ID)"
+    ]
+)}}
+
+-- ============================================================================
+-- RFM_DAILY_STATE: Per-Individual Daily RFM State
+-- One row per AKKIO_ID and trans_date with that day's transaction count,
+-- spend, online splits and the distinct brands transacted with.
+-- Source: fact_transaction_enriched (detail table)
+--
+-- rfm_features maintains its windows incrementally from this table: when
+-- rfm_ref_date advances it adds the days entering each window and subtracts
+-- the days leaving it, for the AKKIO_IDs active on those days only, and
+-- recomputes the IDs active in the fte_lookback_days this model rebuilds.
+-- brands holds distinct BRAND_NAMEs (ARRAY_UNIQUE_AGG, NULLs dropped), so
+-- ARRAY_SIZE(ARRAY_UNION_AGG(brands)) over any set of days gives
+-- COUNT(DISTINCT BRAND_NAME) for them.
+--
+-- INCREMENTAL LOGIC:
+--   Rebuilds the days fact_transaction_enriched rebuilt, chosen the same
+--   way (fte_rebuild_filter): the latest loaded day (it may have been
+--   partial), the fte_lookback_days before it and any newer days, plus every
+--   day with rows in a delivery newer than the newest one this table has
+--   processed (latest_delivery_date). delete+insert on trans_date replaces
+--   whole days. latest_delivery_date was added after the first release;
+--   run once with --full-refresh to add it. Range restatements of
+--   FACT_TRANSACTION_ENRICHED (start_date / end_date) need a full refresh.
+-- ============================================================================
+
+SELECT
+    AKKIO_ID,
+    TRANS_DATE AS trans_date,
+    COUNT(*) AS trans_count,
+    COALESCE(SUM(TRANS_AMOUNT), 0) AS spend,
+    COUNT(CASE WHEN TRANSACTION_CHANNEL = 'ONLINE' THEN 1 END) AS online_trans_count,
+    COALESCE(SUM(CASE WHEN TRANSACTION_CHANNEL = 'ONLINE' THEN TRANS_AMOUNT END), 0) AS online_spend,
+    ARRAY_UNIQUE_AGG(BRAND_NAME) AS brands,
+    MAX(TRANSACTION_DELIVERY_DATE) AS latest_delivery_date
+FROM {{ ref('fact_transaction_enriched') }}
+WHERE AKKIO_ID IS NOT NULL
+  AND TRANS_DATE IS NOT NULL
+    {% if is_incremental() %}
+        AND {{ fte_rebuild_filter('TRANS_DATE', ref('fact_transaction_enriched'), 'transaction_delivery_date') }}
+    {% endif %}
+GROUP BY
+    AKKIO_ID,
+    TRANS_DATE
@@ -1,11 +1,21 @@
 {{ config(
     alias='RFM_FEATURES',
-    materialized='table',
+    materialized='incremental',
+    unique_key='AKKIO_ID',
+    incremental_strategy='merge',
     post_hook=[
-        "ALTER TABLE {{this}} CLUSTER BY (AKKIO_ID)"
+        "ALTER TABLE {{this}} CLUSTER BY (AKKIO_ID)",
+        "DELETE FROM {{this}} WHERE tot_trans_12mo = 0",
+        "UPDATE {{this}} t
+         SET rfm_ref_date = r.ref_date,
+             days_since_last_txn = DATEDIFF(DAY, t.last_txn_date, r.ref_date)
+         FROM (SELECT {{ rfm_ref_date() }} AS ref_date) r
+         WHERE t.rfm_ref_date <> r.ref_date"
     ]
 ) }}
 
+-- depends_on: {{ ref('rfm_daily_state') }}
+
 -- ============================================================================
 -- RFM_FEATURES: Pre-materialized RFM (Recency, Frequency, Monetary) features
 -- Mirrors the Affinity Solutions data mart feature set with 5 time windows.
@@ -35,17 +45,186 @@
 --   last_txn_date                - Most recent transaction date
 --   days_since_last_txn          - Days from last txn to reference date
 --   online_ratio_12mo            - Online transaction ratio (12mo)
+--
+-- INCREMENTAL LOGIC (sliding windows over rfm_daily_state):
+--   When rfm_ref_date moves (forward or back), each window gains the days it
+--   now covers and loses the days it no longer covers. Only AKKIO_IDs with
+--   state rows on those days are recomputed and merged:
+--   - counts and spend: prior value + entering days - expiring days
+--   - brand_diversity and the cadence start date are not subtractable, so
+--     they are re-aggregated from the ID's daily state within the window
+--   - IDs left with no 12mo activity are deleted
+--   The previous build's newest day may have been partial, and
+--   FACT_TRANSACTION_ENRICHED restates the fte_lookback_days before it, as
+--   well as older days a new delivery carries rows for. Those days sit
+--   inside both the old and the new windows, so no delta covers them: every
+--   AKKIO_ID with state rows in
+--   [prior rfm_ref_date - fte_lookback_days, prior rfm_ref_date], whose
+--   last_txn_date falls there, or with state rows in either window from a
+--   delivery newer than this table's latest_delivery_date, is recomputed
+--   from its daily state instead.
+--   Post-hooks move every other row to the new rfm_ref_date and recompute
+--   its days_since_last_txn. Running again with the same rfm_ref_date only
+--   recomputes the IDs active in that lookback.
+--
+--   Exact full recompute from fact_transaction_enriched (the original
+--   query below) remains the verification path:
+--     dbt run -s rfm_features --full-refresh
+--   Range restatements (a start_date / end_date backfill of
+--   FACT_TRANSACTION_ENRICHED and rfm_daily_state) need a full refresh, as
+--   does the first run after latest_delivery_date was added.
 -- ============================================================================
 
+{% set windows = [12, 9, 6, 3, 1] %}
+
 WITH ref AS (
-    {% if var('rfm_ref_date', none) is not none %}
-    SELECT '{{ var("rfm_ref_date") }}'::DATE AS ref_date
-    {% else %}
-    SELECT MAX(TRANS_DATE) AS ref_date
-    FROM {{ ref('fact_transaction_enriched') }}
-    {% endif %}
+    SELECT {{ rfm_ref_date() }} AS ref_date
 )
 
+{% if is_incremental() %}
+
+, bounds AS (
+    SELECT
+        (SELECT MAX(rfm_ref_date) FROM {{ this }}) AS prior_ref,
+        (SELECT MAX(latest_delivery_date) FROM {{ this }}) AS prior_delivery,
+        (SELECT ref_date FROM ref) AS ref_date
+),
+
+-- Per-ID deltas: +1 for days a window now covers, -1 for days it no longer covers
+deltas AS (
+    SELECT
+        s.AKKIO_ID
+        {%- for m in windows %}
+        {%- set sign -%}
+        (IFF(s.trans_date >= DATEADD(MONTH, -{{ m }}, b.ref_date) AND s.trans_date <= b.ref_date, 1, 0)
+           - IFF(s.trans_date >= DATEADD(MONTH, -{{ m }}, b.prior_ref) AND s.trans_date <= b.prior_ref, 1, 0))
+        {%- endset %}
+        , SUM({{ sign }} * s.trans_count) AS d_trans_{{ m }}mo
+        , SUM({{ sign }} * s.spend) AS d_spend_{{ m }}mo
+        , SUM({{ sign }} * s.online_trans_count) AS d_online_trans_{{ m }}mo
+        , SUM({{ sign }} * s.online_spend) AS d_online_spend_{{ m }}mo
+        {%- endfor %}
+    FROM {{ ref('rfm_daily_state') }} s
+    CROSS JOIN bounds b
+    WHERE s.trans_date >= DATEADD(MONTH, -12, LEAST(b.prior_ref, b.ref_date))
+      AND s.trans_date <= GREATEST(b.prior_ref, b.ref_date)
+      AND (
+        {%- for m in windows %}
+        {% if not loop.first %}OR {% endif -%}
+        (s.trans_date >= DATEADD(MONTH, -{{ m }}, b.ref_date) AND s.trans_date <= b.ref_date)
+            <> (s.trans_date >= DATEADD(MONTH, -{{ m }}, b.prior_ref) AND s.trans_date <= b.prior_ref)
+        {%- endfor %}
+      )
+    GROUP BY s.AKKIO_ID
+),
+
+-- IDs active on the prior build's newest days, which FACT_TRANSACTION_ENRICHED
+-- may since have completed or restated, or on any day of either window that a
+-- newer delivery restated; recomputed in full below
+restated AS (
+    SELECT s.AKKIO_ID
+    FROM {{ ref('rfm_daily_state') }} s
+    CROSS JOIN bounds b
+    WHERE s.trans_date >= DATEADD(day, -{{ var('fte_lookback_days') }}, b.prior_ref)
+      AND s.trans_date <= b.prior_ref
+    UNION
+    SELECT p.AKKIO_ID
+    FROM {{ this }} p
+    CROSS JOIN bounds b
+    WHERE p.last_txn_date >= DATEADD(day, -{{ var('fte_lookback_days') }}, b.prior_ref)
+    UNION
+    SELECT s.AKKIO_ID
+    FROM {{ ref('rfm_daily_state') }} s
+    CROSS JOIN bounds b
+    WHERE s.latest_delivery_date > b.prior_delivery
+      AND s.trans_date >= DATEADD(MONTH, -12, LEAST(b.prior_ref, b.ref_date))
+      AND s.trans_date <= GREATEST(b.prior_ref, b.ref_date)
+),
+
+touched AS (
+    SELECT AKKIO_ID FROM deltas
+    UNION
+    SELECT AKKIO_ID FROM restated
+),
+
+-- Touched IDs' state within the new windows: non-additive features for all,
+-- full sums for the restated ones
+windowed AS (
+    SELECT
+        s.AKKIO_ID,
+        MAX(s.trans_date) AS last_txn_date,
+        MAX(s.latest_delivery_date) AS latest_delivery_date
+        {%- for m in windows %}
+        {%- set in_window = 's.trans_date >= DATEADD(MONTH, -' ~ m ~ ', b.ref_date)' %}
+        , SUM(IFF({{ in_window }}, s.trans_count, 0)) AS trans_{{ m }}mo
+        , SUM(IFF({{ in_window }}, s.spend, 0)) AS spend_{{ m }}mo
+        , SUM(IFF({{ in_window }}, s.online_trans_count, 0)) AS online_trans_{{ m }}mo
+        , SUM(IFF({{ in_window }}, s.online_spend, 0)) AS online_spend_{{ m }}mo
+        {%- endfor %}
+        {%- for m in windows %}
+        , MIN(CASE WHEN s.trans_date >= DATEADD(MONTH, -{{ m }}, b.ref_date) THEN s.trans_date END) AS first_txn_date_{{ m }}mo
+        , COALESCE(ARRAY_SIZE(ARRAY_UNION_AGG(
+            CASE WHEN s.trans_date >= DATEADD(MONTH, -{{ m }}, b.ref_date) THEN s.brands END
+          )), 0) AS brand_diversity_{{ m }}mo
+        {%- endfor %}
+    FROM {{ ref('rfm_daily_state') }} s
+    INNER JOIN touched t ON s.AKKIO_ID = t.AKKIO_ID
+    CROSS JOIN bounds b
+    WHERE s.trans_date >= DATEADD(MONTH, -12, b.ref_date)
+      AND s.trans_date <= b.ref_date
+    GROUP BY s.AKKIO_ID
+),
+
+totals AS (
+    SELECT
+        t.AKKIO_ID,
+        b.ref_date AS rfm_ref_date,
+        w.last_txn_date,
+        w.latest_delivery_date
+        {%- for m in windows %}
+        {%- for col in ['trans', 'spend', 'online_trans', 'online_spend'] %}
+        , IFF(r.AKKIO_ID IS NOT NULL,
+              COALESCE(w.{{ col }}_{{ m }}mo, 0),
+              COALESCE(p.tot_{{ col }}_{{ m }}mo, 0) + d.d_{{ col }}_{{ m }}mo) AS tot_{{ col }}_{{ m }}mo
+        {%- endfor %}
+        , w.first_txn_date_{{ m }}mo
+        , COALESCE(w.brand_diversity_{{ m }}mo, 0) AS brand_diversity_{{ m }}mo
+        {%- endfor %}
+    FROM touched t
+    CROSS JOIN bounds b
+    LEFT JOIN restated r ON r.AKKIO_ID = t.AKKIO_ID
+    LEFT JOIN deltas d ON d.AKKIO_ID = t.AKKIO_ID
+    LEFT JOIN {{ this }} p ON p.AKKIO_ID = t.AKKIO_ID
+    LEFT JOIN windowed w ON w.AKKIO_ID = t.AKKIO_ID
+)
+
+SELECT
+    AKKIO_ID,
+    rfm_ref_date,
+    last_txn_date,
+    DATEDIFF(DAY, last_txn_date, rfm_ref_date) AS days_since_last_txn,
+    latest_delivery_date,
+    {%- for m in windows %}
+    tot_trans_{{ m }}mo,
+    tot_spend_{{ m }}mo,
+    tot_online_trans_{{ m }}mo,
+    tot_online_spend_{{ m }}mo,
+    CASE
+        WHEN tot_trans_{{ m }}mo > 1
+        THEN DATEDIFF(DAY, first_txn_date_{{ m }}mo, last_txn_date)::FLOAT / (tot_trans_{{ m }}mo - 1)
+        ELSE NULL
+    END AS avg_days_btwn_trans_{{ m }}mo,
+    brand_diversity_{{ m }}mo,
+    {%- endfor %}
+    CASE
+        WHEN tot_trans_12mo > 0
+        THEN tot_online_trans_12mo::FLOAT / tot_trans_12mo
+        ELSE NULL
+    END AS online_ratio_12mo
+FROM totals
+
+{% else %}
+
 SELECT
     f.AKKIO_ID,
 
@@ -56,6 +235,9 @@ SELECT
     MAX(f.TRANS_DATE) AS last_txn_date,
     DATEDIFF(DAY, MAX(f.TRANS_DATE), (SELECT ref_date FROM ref)) AS days_since_last_txn,
 
+    -- Newest delivery_date read, so later runs can spot restated days
+    MAX(f.TRANSACTION_DELIVERY_DATE) AS latest_delivery_date,
+
     -- =========================================================================
     -- 12-MONTH WINDOW (full scan range — no CASE WHEN needed)
     -- =========================================================================
@@ -203,3 +385,5 @@ WHERE f.AKKIO_ID IS NOT NULL
   AND f.TRANS_DATE >= DATEADD(MONTH, -12, (SELECT ref_date FROM ref))
   AND f.TRANS_DATE <= (SELECT ref_date FROM ref)
 GROUP BY f.AKKIO_ID
+
+{% endif %}